@@ -990,6 +990,11 @@ function App() {
           // URL de la vidéo finale assemblée (stockée dans Supabase Storage)
           final_video_url: finalVideoUrl,
           video_url: finalVideoUrl, // Alias pour compatibilité
+          // Aperçus légers (affiche, bande de vignettes) : l'historique n'a pas à charger le MP4
+          poster_url: generatedContent?.poster_url || generatedContent?.result?.poster_url,
+          sprite_url: generatedContent?.sprite_url || generatedContent?.result?.sprite_url,
+          // Playlist HLS adaptative (si le packaging HLS est activé côté serveur)
+          hls_url: generatedContent?.hls_url || generatedContent?.result?.hls_url,
           duration: duration,
           style: selectedStyle || 'cartoon'
         };
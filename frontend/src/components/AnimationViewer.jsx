@@ -14,6 +14,9 @@ const AnimationViewer = ({ animationResult, onClose }) => {
     animationResult.data?.video_url ||
     (animationResult.video_urls && animationResult.video_urls[0]);
 
+  // Affiche (première image) affichée avant le début de la lecture
+  const posterUrl = animationResult.poster_url || animationResult.data?.poster_url;
+
   const videoDuration = animationResult.duration || 
                         animationResult.duration_seconds || 
                         animationResult.total_duration ||
@@ -85,6 +88,7 @@ const AnimationViewer = ({ animationResult, onClose }) => {
               }}>
                           <video 
                   src={finalVideoUrl}
+                  poster={posterUrl}
                             controls
                             autoPlay
                             loop
@@ -28,10 +28,88 @@ WAN25_DEFAULT_ASPECT_RATIO = os.getenv("WAN25_DEFAULT_ASPECT_RATIO", "9:16")  #
 WAN25_CLIP_DURATION = int(os.getenv("WAN25_CLIP_DURATION", "5"))  # 5 secondes par clip
 WAN25_MAX_DURATION = int(os.getenv("WAN25_MAX_DURATION", "120"))  # Max 2 minutes total
 WAN25_MAX_CONCURRENT = int(os.getenv("WAN25_MAX_CONCURRENT", "5"))  # Max clips en parallèle
+# Quota WaveSpeed : soumissions par seconde et prédictions en cours (toutes animations confondues)
+WAN25_MAX_OUTSTANDING_PREDICTIONS = int(os.getenv("WAN25_MAX_OUTSTANDING_PREDICTIONS", "24"))
+WAN25_SUBMIT_RATE_PER_SECOND = float(os.getenv("WAN25_SUBMIT_RATE_PER_SECOND", "2"))
+WAN25_SUBMIT_BURST = int(os.getenv("WAN25_SUBMIT_BURST", "5"))
+# Places de génération réparties entre animations ; à égalité, priorité à la plus proche de la fin
+WAN25_FAVOR_NEAR_COMPLETION = os.getenv("WAN25_FAVOR_NEAR_COMPLETION", "true").lower() == "true"
+# Nouvelles tentatives par scène (erreurs passagères uniquement, délai exponentiel entre passes)
+WAN25_CLIP_MAX_ATTEMPTS = int(os.getenv("WAN25_CLIP_MAX_ATTEMPTS", "3"))
+WAN25_CLIP_RETRY_BASE_DELAY_SECONDS = float(os.getenv("WAN25_CLIP_RETRY_BASE_DELAY_SECONDS", "4"))
+WAN25_CLIP_RETRY_MAX_DELAY_SECONDS = float(os.getenv("WAN25_CLIP_RETRY_MAX_DELAY_SECONDS", "60"))
+# Téléchargements de clips simultanés (tous pipelines confondus, écriture en streaming sur disque)
+WAN25_DOWNLOAD_CONCURRENCY = int(os.getenv("WAN25_DOWNLOAD_CONCURRENCY", "4"))
+# Suivi des prédictions WaveSpeed (un seul poller partagé, intervalle adaptatif)
+WAN25_EXPECTED_CLIP_SECONDS = float(os.getenv("WAN25_EXPECTED_CLIP_SECONDS", "120"))  # Estimation initiale, affinée ensuite
+WAN25_POLL_MIN_INTERVAL_SECONDS = float(os.getenv("WAN25_POLL_MIN_INTERVAL_SECONDS", "2"))
+WAN25_POLL_MAX_INTERVAL_SECONDS = float(os.getenv("WAN25_POLL_MAX_INTERVAL_SECONDS", "20"))
+WAN25_POLL_CONCURRENCY = int(os.getenv("WAN25_POLL_CONCURRENCY", "10"))  # Requêtes de suivi simultanées
+# Mode webhook : URL publique de POST /webhooks/wavespeed (le polling devient un filet de sécurité)
+WAVESPEED_WEBHOOK_URL = os.getenv("WAVESPEED_WEBHOOK_URL")
+WAVESPEED_WEBHOOK_SECRET = os.getenv("WAVESPEED_WEBHOOK_SECRET")  # Paramètre token ajouté à l'URL du webhook (obligatoire)
+# Hôtes acceptés pour l'URL vidéo d'un callback (domaine exact ou sous-domaine ; sinon le polling confirme)
+WAVESPEED_OUTPUT_HOSTS = [
+    host.strip().lower() for host in
+    os.getenv("WAVESPEED_OUTPUT_HOSTS", "d1q70pf5vjeyhc.cloudfront.net,wavespeed.ai").split(",")
+    if host.strip()
+]
+WAN25_WEBHOOK_SAFETY_POLL_SECONDS = float(os.getenv("WAN25_WEBHOOK_SAFETY_POLL_SECONDS", "60"))
 
 # --- FAL AI (pour assemblage vidéo) ---
 FAL_API_KEY = os.getenv("FAL_API_KEY")
 
+# --- Supabase Auth (vérification des JWT) ---
+SUPABASE_URL = os.getenv("SUPABASE_URL", "https://xfbmdeuzuyixpmouhqcv.supabase.co")
+SUPABASE_AUTH_API_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")  # Secret HS256 du projet (Settings > API > JWT Secret)
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+SUPABASE_JWT_VERIFICATION = os.getenv("SUPABASE_JWT_VERIFICATION", "local").lower()  # local | remote | local_only
+SUPABASE_JWKS_CACHE_SECONDS = int(os.getenv("SUPABASE_JWKS_CACHE_SECONDS", "600"))  # Durée de cache du JWKS
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))  # Tokens résolus gardés en mémoire
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))  # Plafonné à l'expiration du token
+AUTH_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_NEGATIVE_TTL_SECONDS", "30"))  # Tokens invalides
+ADMIN_ROLE_CACHE_TTL_SECONDS = float(os.getenv("ADMIN_ROLE_CACHE_TTL_SECONDS", "60"))  # Cache des rôles (profiles)
+ADMIN_ROLE_CACHE_MAX_ENTRIES = int(os.getenv("ADMIN_ROLE_CACHE_MAX_ENTRIES", "1000"))
+SUPABASE_WEBHOOK_SECRET = os.getenv("SUPABASE_WEBHOOK_SECRET")  # Header x-webhook-secret des Database Webhooks
+
+# --- Stockage des tâches de génération ---
+TASK_STORE_BACKEND = os.getenv("TASK_STORE_BACKEND", "memory").lower()  # memory | sqlite | redis
+TASK_STORE_SQLITE_PATH = os.getenv("TASK_STORE_SQLITE_PATH", "data/tasks.db")
+TASK_STORE_REDIS_URL = os.getenv("TASK_STORE_REDIS_URL") or os.getenv("REDIS_URL")
+TASK_RETENTION_SECONDS = float(os.getenv("TASK_RETENTION_SECONDS", "3600"))  # Conservation après la fin de la tâche
+TASK_ACTIVE_TTL_SECONDS = float(os.getenv("TASK_ACTIVE_TTL_SECONDS", "86400"))  # Tâches jamais terminées
+TASK_STORE_MAX_RECORDS = int(os.getenv("TASK_STORE_MAX_RECORDS", "2000"))
+TASK_STORE_MAX_BYTES = int(os.getenv("TASK_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+TASK_STORE_PURGE_INTERVAL_SECONDS = float(os.getenv("TASK_STORE_PURGE_INTERVAL_SECONDS", "60"))
+# Reprise des animations interrompues au démarrage (task store sqlite/redis) : seules les animations
+# dont le bail n'est plus renouvelé par leur worker (heartbeat plus vieux que PIPELINE_LEASE_SECONDS) sont reprises
+PIPELINE_RESUME_ON_STARTUP = os.getenv("PIPELINE_RESUME_ON_STARTUP", "true").lower() == "true"
+PIPELINE_LEASE_SECONDS = float(os.getenv("PIPELINE_LEASE_SECONDS", "120"))  # Renouvelé tous les tiers de bail
+
+# --- File d'attente des générations longues (animations, BD) ---
+JOB_QUEUE_ANIMATION_WORKERS = int(os.getenv("JOB_QUEUE_ANIMATION_WORKERS", "2"))  # Animations simultanées
+JOB_QUEUE_ANIMATION_MAX_DEPTH = int(os.getenv("JOB_QUEUE_ANIMATION_MAX_DEPTH", "20"))  # Au-delà: 429
+JOB_QUEUE_COMIC_WORKERS = int(os.getenv("JOB_QUEUE_COMIC_WORKERS", "4"))  # BD simultanées
+JOB_QUEUE_COMIC_MAX_DEPTH = int(os.getenv("JOB_QUEUE_COMIC_MAX_DEPTH", "50"))
+JOB_QUEUE_ANIMATION_USER_MAX_RUNNING = int(os.getenv("JOB_QUEUE_ANIMATION_USER_MAX_RUNNING", "1"))  # Par utilisateur
+JOB_QUEUE_COMIC_USER_MAX_RUNNING = int(os.getenv("JOB_QUEUE_COMIC_USER_MAX_RUNNING", "2"))
+JOB_QUEUE_USER_MAX_PENDING = int(os.getenv("JOB_QUEUE_USER_MAX_PENDING", "5"))  # Jobs en attente par utilisateur et par type
+JOB_QUEUE_PRIORITY_WEIGHT = float(os.getenv("JOB_QUEUE_PRIORITY_WEIGHT", "4"))  # Abonnés actifs
+JOB_QUEUE_STANDARD_WEIGHT = float(os.getenv("JOB_QUEUE_STANDARD_WEIGHT", "1"))  # Gratuit / anonyme
+SUBSCRIPTION_TIER_CACHE_TTL_SECONDS = float(os.getenv("SUBSCRIPTION_TIER_CACHE_TTL_SECONDS", "300"))
+
+# --- Idempotence des endpoints de génération ---
+IDEMPOTENCY_CACHE_SECONDS = float(os.getenv("IDEMPOTENCY_CACHE_SECONDS", "30"))  # Cache local des réponses avec Idempotency-Key
+IDEMPOTENCY_CACHE_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_CACHE_MAX_ENTRIES", "10000"))
+
+# --- Media worker (images et vidéos traitées hors du processus web) ---
+MEDIA_WORKER_PROCESSES = int(os.getenv("MEDIA_WORKER_PROCESSES", "2"))  # Traitements média simultanés
+ENCODE_CPU_BUDGET = int(os.getenv("ENCODE_CPU_BUDGET", "0"))  # Cœurs pour les encodages ffmpeg (0 = détection automatique)
+ENCODE_MIN_THREADS = int(os.getenv("ENCODE_MIN_THREADS", "2"))  # Threads minimum d'un réencodage
+ANIMATION_HLS_ENABLED = os.getenv("ANIMATION_HLS_ENABLED", "false").lower() == "true"  # Diffusion HLS adaptative
+ANIMATION_HLS_SEGMENT_SECONDS = float(os.getenv("ANIMATION_HLS_SEGMENT_SECONDS", "4"))
+
 # Export all variables
 __all__ = [
     'TEXT_MODEL', 'IMAGE_MODEL', 'TTS_MODEL', 'STT_MODEL',
@@ -41,6 +119,32 @@ __all__ = [
     'WAVESPEED_API_KEY', 'WAN25_MODEL', 'WAN25_BASE_URL', 'WAN25_ENDPOINT',
     'WAN25_DEFAULT_RESOLUTION', 'WAN25_DEFAULT_ASPECT_RATIO',
     'WAN25_CLIP_DURATION', 'WAN25_MAX_DURATION', 'WAN25_MAX_CONCURRENT',
+    'WAN25_MAX_OUTSTANDING_PREDICTIONS', 'WAN25_SUBMIT_RATE_PER_SECOND', 'WAN25_SUBMIT_BURST',
+    'WAN25_FAVOR_NEAR_COMPLETION',
+    'WAN25_DOWNLOAD_CONCURRENCY',
+    'WAN25_CLIP_MAX_ATTEMPTS', 'WAN25_CLIP_RETRY_BASE_DELAY_SECONDS', 'WAN25_CLIP_RETRY_MAX_DELAY_SECONDS',
+    'WAN25_EXPECTED_CLIP_SECONDS', 'WAN25_POLL_MIN_INTERVAL_SECONDS', 'WAN25_POLL_MAX_INTERVAL_SECONDS',
+    'WAN25_POLL_CONCURRENCY', 'WAVESPEED_WEBHOOK_URL', 'WAVESPEED_WEBHOOK_SECRET',
+    'WAVESPEED_OUTPUT_HOSTS', 'WAN25_WEBHOOK_SAFETY_POLL_SECONDS',
     # FAL AI
-    'FAL_API_KEY'
+    'FAL_API_KEY',
+    # Supabase Auth
+    'SUPABASE_URL', 'SUPABASE_AUTH_API_KEY', 'SUPABASE_JWT_SECRET', 'SUPABASE_JWT_AUDIENCE',
+    'SUPABASE_JWT_VERIFICATION', 'SUPABASE_JWKS_CACHE_SECONDS',
+    'AUTH_CACHE_MAX_ENTRIES', 'AUTH_CACHE_TTL_SECONDS', 'AUTH_CACHE_NEGATIVE_TTL_SECONDS',
+    'ADMIN_ROLE_CACHE_TTL_SECONDS', 'ADMIN_ROLE_CACHE_MAX_ENTRIES', 'SUPABASE_WEBHOOK_SECRET',
+    # Stockage des tâches
+    'TASK_STORE_BACKEND', 'TASK_STORE_SQLITE_PATH', 'TASK_STORE_REDIS_URL',
+    'TASK_RETENTION_SECONDS', 'TASK_ACTIVE_TTL_SECONDS', 'TASK_STORE_MAX_RECORDS', 'TASK_STORE_MAX_BYTES',
+    'TASK_STORE_PURGE_INTERVAL_SECONDS', 'PIPELINE_RESUME_ON_STARTUP', 'PIPELINE_LEASE_SECONDS',
+    # File d'attente des générations
+    'JOB_QUEUE_ANIMATION_WORKERS', 'JOB_QUEUE_ANIMATION_MAX_DEPTH',
+    'JOB_QUEUE_COMIC_WORKERS', 'JOB_QUEUE_COMIC_MAX_DEPTH',
+    'JOB_QUEUE_ANIMATION_USER_MAX_RUNNING', 'JOB_QUEUE_COMIC_USER_MAX_RUNNING', 'JOB_QUEUE_USER_MAX_PENDING',
+    'JOB_QUEUE_PRIORITY_WEIGHT', 'JOB_QUEUE_STANDARD_WEIGHT', 'SUBSCRIPTION_TIER_CACHE_TTL_SECONDS',
+    # Idempotence
+    'IDEMPOTENCY_CACHE_SECONDS', 'IDEMPOTENCY_CACHE_MAX_ENTRIES',
+    # Media worker
+    'MEDIA_WORKER_PROCESSES', 'ENCODE_CPU_BUDGET', 'ENCODE_MIN_THREADS',
+    'ANIMATION_HLS_ENABLED', 'ANIMATION_HLS_SEGMENT_SECONDS'
 ]
\ No newline at end of file
@@ -1,10 +1,10 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Request, Header, Depends, Body
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request, Header, Depends, Body, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, ValidationError
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from unidecode import unidecode
 
 # Modèles Pydantic pour la validation des requêtes
@@ -21,12 +21,10 @@ from email.mime.multipart import MIMEMultipart
 from email.header import Header
 from email.utils import formataddr
 import jwt
-import httpx
 from fastapi import status
 
 from dotenv import load_dotenv
 import openai
-from openai import AsyncOpenAI
 
 from datetime import datetime
 from services.tts import generate_speech
@@ -45,6 +43,22 @@ from routes.admin_features import router as admin_features_router, load_features
 # Service d'unicité pour éviter les doublons
 from services.uniqueness_service import uniqueness_service
 
+# Vérification des JWT Supabase (locale avec repli sur /auth/v1/user)
+from services.supabase_auth import supabase_user_resolver, extract_user_id_from_jwt
+from services.admin_roles import admin_role_cache
+from services.http_clients import http_clients, get_http_client
+from services.ai_clients import ai_clients, get_async_openai
+from services.task_store import task_store, worker_id, ANIMATION_TASKS, COMIC_TASKS, TERMINAL_STATUSES
+from services.progress_broker import progress_broker, RHYME_TASKS
+from services.job_queue import job_queue, QueueFullError, JobCancelled
+from services.subscription_tiers import subscription_tiers
+from services.pipeline_checkpoints import pipeline_checkpoints
+from services.idempotency import idempotency
+from services.wavespeed_poller import wavespeed_poller
+from services.media_worker import media_worker
+from services.encode_scheduler import encode_scheduler
+from config import TASK_STORE_PURGE_INTERVAL_SECONDS, PIPELINE_RESUME_ON_STARTUP, PIPELINE_LEASE_SECONDS
+
 # --- Chargement .env ---
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
@@ -67,11 +81,112 @@ if SUPABASE_SERVICE_KEY:
 # Service de nettoyage automatique des fichiers locaux
 from services.file_cleanup import run_scheduled_cleanup
 from apscheduler.schedulers.background import BackgroundScheduler
+import asyncio
 import atexit
+from contextlib import asynccontextmanager
 
 # Démarrage silencieux - pas de logs sensibles
 
-app = FastAPI(title="API FRIDAY - Contenu Créatif IA", version="2.0", description="API pour générer du contenu créatif pour enfants : BD, coloriages, histoires, comptines")
+async def purge_task_store_periodically():
+    """Applique périodiquement la politique de rétention du task store"""
+    while True:
+        await asyncio.sleep(TASK_STORE_PURGE_INTERVAL_SECONDS)
+        try:
+            await task_store.purge()
+        except Exception as e:
+            print(f"⚠️ Purge du task store impossible: {e}")
+
+async def renew_animation_leases_periodically():
+    """
+    Renouvelle le bail (heartbeat) des animations de ce processus, en file ou en cours.
+    Une animation dont le bail a été repris par un autre worker est arrêtée ici.
+    """
+    while True:
+        await asyncio.sleep(PIPELINE_LEASE_SECONDS / 3)
+        for task_id in job_queue.job_ids(ANIMATION_TASKS):
+            try:
+                if await task_store.claim(ANIMATION_TASKS, task_id, worker_id(), PIPELINE_LEASE_SECONDS):
+                    continue
+                record = await task_store.get(ANIMATION_TASKS, task_id)
+                if record is not None and record.get("status") not in TERMINAL_STATUSES:
+                    print(f"⚠️ Animation {task_id} reprise par {record.get('owner')} - arrêt sur ce worker")
+                    await job_queue.cancel(ANIMATION_TASKS, task_id)
+            except Exception as e:
+                print(f"⚠️ Renouvellement du bail de l'animation {task_id} impossible: {e}")
+
+async def resume_interrupted_animations():
+    """
+    Remet en file les animations interrompues par un arrêt du processus.
+    Le pipeline reprend depuis son point de reprise (scénario, prédictions WaveSpeed déjà soumises).
+    Seules les animations dont le bail est périmé sont reprises, chacune par un seul worker (claim atomique) :
+    celles qu'un autre processus exécute ou garde en file renouvellent leur heartbeat.
+    """
+    if not PIPELINE_RESUME_ON_STARTUP or not task_store.persistent:
+        return
+    try:
+        interrupted = await task_store.list_active(ANIMATION_TASKS)
+    except Exception as e:
+        print(f"⚠️ Lecture des animations interrompues impossible: {e}")
+        return
+
+    for task_id, record in interrupted:
+        user_id = record.get("user_id")
+        theme, duration, style = record.get("theme"), record.get("duration"), record.get("style", "cartoon")
+        if not theme or not duration:
+            continue
+        try:
+            if not await task_store.claim(ANIMATION_TASKS, task_id, worker_id(), PIPELINE_LEASE_SECONDS):
+                continue
+        except Exception as e:
+            print(f"⚠️ Bail de l'animation {task_id} non obtenu: {e}")
+            continue
+        # Statut posé avant la mise en file : le job peut démarrer (et passer en "generating") dès submit
+        await task_store.update(ANIMATION_TASKS, task_id, status="processing", message="Reprise après redémarrage du serveur...")
+        try:
+            await job_queue.submit(
+                ANIMATION_TASKS, task_id,
+                lambda task_id=task_id, theme=theme, duration=duration, style=style, user_id=user_id:
+                    generate_zseedance_animation_task(task_id, theme, duration, style, user_id),
+                user_id=user_id,
+                tier=await subscription_tiers.get_tier(supabase_client, user_id),
+                cost=duration / 30
+            )
+        except QueueFullError as e:
+            await task_store.update(ANIMATION_TASKS, task_id, status="failed", error="Génération interrompue par un redémarrage du serveur")
+            print(f"⚠️ Animation {task_id} non reprise: {e}")
+            continue
+        progress_broker.register_task(user_id, ANIMATION_TASKS, task_id)
+        print(f"♻️ Animation {task_id} remise en file (reprise depuis le point de reprise)")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ouvre les ressources partagées au démarrage et les ferme à l'arrêt"""
+    await http_clients.start()
+    # Workers des générations longues (animations, BD)
+    await job_queue.start()
+    # Pool de processus des traitements d'images (hors du processus web)
+    media_worker.start()
+    await resume_interrupted_animations()
+    # Préchauffage des pools OpenAI/Gemini en arrière-plan (ne retarde pas le démarrage)
+    app.state.ai_warmup_task = asyncio.create_task(ai_clients.warmup())
+    # Rétention des tâches terminées (expiration + plafonds de taille)
+    app.state.task_purge_task = asyncio.create_task(purge_task_store_periodically())
+    # Heartbeat des animations de ce processus (reprise par un autre worker uniquement si le bail expire)
+    app.state.lease_renewal_task = asyncio.create_task(renew_animation_leases_periodically())
+    try:
+        yield
+    finally:
+        app.state.ai_warmup_task.cancel()
+        app.state.task_purge_task.cancel()
+        app.state.lease_renewal_task.cancel()
+        await job_queue.aclose()
+        await wavespeed_poller.aclose()
+        await media_worker.aclose()
+        await ai_clients.aclose()
+        await http_clients.aclose()
+        await task_store.close()
+
+app = FastAPI(title="API FRIDAY - Contenu Créatif IA", version="2.0", description="API pour générer du contenu créatif pour enfants : BD, coloriages, histoires, comptines", lifespan=lifespan)
 
 # Initialiser le scheduler pour le nettoyage automatique
 scheduler = BackgroundScheduler()
@@ -93,49 +208,6 @@ atexit.register(lambda: scheduler.shutdown())
 # FONCTIONS D'AUTHENTIFICATION ET SÉCURITÉ
 # ============================================
 
-async def fetch_user_id_from_supabase(token: str) -> Optional[str]:
-    """
-    Valide le JWT via l'API Supabase et retourne l'identifiant utilisateur.
-    Utilise l'endpoint /auth/v1/user pour garantir la vérification côté serveur.
-    """
-    if not token or not SUPABASE_URL or not SUPABASE_AUTH_API_KEY:
-        return None
-
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "apikey": SUPABASE_AUTH_API_KEY
-    }
-
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(f"{SUPABASE_URL}/auth/v1/user", headers=headers)
-
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("id") or data.get("user", {}).get("id")
-
-        print(f"[SECURITY] JWT invalide (status={response.status_code}) : {response.text}")
-    except httpx.HTTPError as exc:
-        print(f"[SECURITY] Erreur lors de la validation JWT : {exc}")
-
-    return None
-
-async def extract_user_id_from_jwt(
-    auth_token: Optional[str] = None,
-    request: Optional[Request] = None
-) -> Optional[str]:
-    """
-    Extrait le user_id depuis le JWT Supabase.
-    Retourne None si le JWT n'est pas présent ou invalide.
-    Compatible avec les JWT Supabase qui ont 'sub' comme claim du user_id.
-    """
-    if not auth_token or not auth_token.startswith("Bearer "):
-        return None
-
-    token = auth_token.split(" ")[1]
-    return await fetch_user_id_from_supabase(token)
-
-
 async def get_current_user_id(
     auth_token: Optional[str] = None,
     request_body: Optional[Dict[str, Any]] = None,
@@ -153,7 +225,7 @@ async def get_current_user_id(
     Returns:
         user_id ou None si non trouvé
     """
-    return await extract_user_id_from_jwt(auth_token, request_obj)
+    return await extract_user_id_from_jwt(auth_token)
 
 
 async def verify_admin(
@@ -175,7 +247,7 @@ async def verify_admin(
     
     # Récupérer le user_id depuis JWT uniquement
     if not user_id:
-        user_id = await extract_user_id_from_jwt(authorization, request)
+        user_id = await extract_user_id_from_jwt(authorization)
     
     if not user_id:
         raise HTTPException(
@@ -183,11 +255,9 @@ async def verify_admin(
             detail="Authentification requise. Fournissez un JWT valide dans le header Authorization."
         )
     
-    # Vérifier le rôle admin dans la table profiles
+    # Vérifier le rôle admin dans la table profiles (mis en cache, voir services/admin_roles.py)
     try:
-        response = supabase_client.table('profiles').select('role').eq('id', user_id).single().execute()
-        
-        if not response.data or response.data.get('role') != 'admin':
+        if not await admin_role_cache.is_admin(supabase_client, user_id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Accès réservé aux administrateurs"
@@ -424,9 +494,33 @@ async def diagnostic(authorization: Optional[str] = Header(None)):
         "text_model": TEXT_MODEL,
         "openai_key_preview": f"{openai_key[:10]}..." if openai_key else "Non configurée",
         "stability_key_preview": f"{stability_key[:10]}..." if stability_key else "Non configurée",
-        "fal_key_preview": f"{fal_key[:10]}..." if fal_key else "Non configurée"
+        "fal_key_preview": f"{fal_key[:10]}..." if fal_key else "Non configurée",
+        "jwt_verification": supabase_user_resolver.get_stats(),
+        "admin_role_cache": admin_role_cache.get_stats(),
+        "ai_clients": ai_clients.get_stats(),
+        "task_store": task_store.get_stats(),
+        "progress_broker": progress_broker.get_stats(),
+        "job_queue": job_queue.get_stats(),
+        "subscription_tiers": subscription_tiers.get_stats(),
+        "pipeline_checkpoints": pipeline_checkpoints.get_stats(),
+        "idempotency": idempotency.get_stats(),
+        "wavespeed_poller": wavespeed_poller.get_stats(),
+        "media_worker": media_worker.get_stats(),
+        "encode_scheduler": encode_scheduler.get_stats()
     }
 
+@app.get("/diagnostic/task_store")
+async def diagnostic_task_store(authorization: Optional[str] = Header(None)):
+    """Taille du task store et compteurs d'éviction (rétention, plafonds)"""
+    await verify_admin(authorization=authorization)
+    return task_store.get_stats()
+
+@app.get("/diagnostic/http_pools")
+async def diagnostic_http_pools(authorization: Optional[str] = Header(None)):
+    """Statistiques des pools de connexions HTTP sortants (par fournisseur)"""
+    await verify_admin(authorization=authorization)
+    return http_clients.get_stats()
+
 # === ROUTES DES FONCTIONNALITÉS GÉRÉES PAR LE ROUTEUR ADMIN_FEATURES ===
 # Les routes /api/features sont maintenant gérées par le routeur admin_features_router
 
@@ -500,8 +594,14 @@ async def stt_endpoint(file: UploadFile = File(...)):
 # --- Comptine ---
 from services.suno_service import suno_service
 from routes.rhyme_routes import router as rhyme_router
+# Statut des comptines pour le flux de progression (poller partagé par tâche)
+progress_broker.set_rhyme_fetcher(lambda task_id, user_id: suno_service.check_task_status(task_id, user_id=user_id))
 app.include_router(rhyme_router)
 
+# --- Webhooks fournisseurs (fin de génération des clips WaveSpeed) ---
+from routes.webhook_routes import router as webhook_router
+app.include_router(webhook_router)
+
 # ANCIEN ENDPOINT COMPTINE SUPPRIMÉ
 # Voir routes/rhyme_routes.py pour le nouveau code propre
 
@@ -516,7 +616,6 @@ async def check_task_status(task_id: str, req: Request = None):
         if req:
             authorization = req.headers.get("authorization")
             if authorization:
-                from routes.rhyme_routes import extract_user_id_from_jwt
                 user_id = await extract_user_id_from_jwt(authorization)
         
         result = await suno_service.check_task_status(task_id, user_id=user_id)
@@ -660,10 +759,14 @@ async def stream_audio(filename: str, download: bool = False):
 
 @app.post("/generate_audio_story/")
 async def generate_audio_story(request: dict, req: Request = None):
+    """Génère une histoire (idempotent : Idempotency-Key ou requêtes identiques fusionnées)"""
+    return await idempotency.handle(req, "generate_audio_story", request, lambda: _generate_audio_story(request, req))
+
+async def _generate_audio_story(request: dict, req: Request = None):
     try:
         # Extraire user_id depuis JWT - AUTHENTIFICATION REQUISE
         authorization = req.headers.get("authorization") if req else None
-        user_id = await extract_user_id_from_jwt(authorization, req)
+        user_id = await extract_user_id_from_jwt(authorization)
         if not user_id:
             raise HTTPException(
                 status_code=401,
@@ -711,7 +814,7 @@ HISTOIRE: [texte de l'histoire]
 
 N'ajoute aucun titre dans le texte de l'histoire lui-même, juste dans la partie TITRE."""
 
-        client = AsyncOpenAI(api_key=openai_key)
+        client = get_async_openai(openai_key)
 
         response = await client.chat.completions.create(
             model=TEXT_MODEL,
@@ -835,7 +938,6 @@ N'ajoute aucun titre dans le texte de l'histoire lui-même, juste dans la partie
                 try:
                     print(f"🎵 Génération audio avec user_id={user_id[:8]}... (voix={voice})")
                     # Timeout pour éviter les erreurs 520 lors de la génération audio
-                    import asyncio
                     audio_path = await asyncio.wait_for(
                         asyncio.get_event_loop().run_in_executor(None, generate_speech, story_content, voice, title, user_id),
                         timeout=60  # 60 secondes maximum pour la génération audio
@@ -909,6 +1011,13 @@ def get_coloring_generator():
 @app.post("/generate_coloring/")
 @app.post("/generate_coloring/{content_type_id}")
 async def generate_coloring(request: dict, content_type_id: int = None, req: Request = None):
+    """Génère un coloriage (idempotent : Idempotency-Key ou requêtes identiques fusionnées)"""
+    return await idempotency.handle(
+        req, "generate_coloring", {"content_type_id": content_type_id, **request},
+        lambda: _generate_coloring(request, content_type_id, req)
+    )
+
+async def _generate_coloring(request: dict, content_type_id: int = None, req: Request = None):
     """
     Génère un coloriage basé sur un thème avec GPT-4o-mini + gpt-image-1-mini
     Supporte deux formats d'URL pour compatibilité frontend
@@ -917,7 +1026,7 @@ async def generate_coloring(request: dict, content_type_id: int = None, req: Req
     try:
         # Extraire user_id depuis JWT - AUTHENTIFICATION REQUISE
         authorization = req.headers.get("authorization") if req else None
-        user_id = await extract_user_id_from_jwt(authorization, None)
+        user_id = await extract_user_id_from_jwt(authorization)
         if not user_id:
             raise HTTPException(
                 status_code=401,
@@ -1094,7 +1203,7 @@ async def convert_photo_to_coloring(request: dict, req: Request = None):
     try:
         # Extraire user_id depuis JWT - AUTHENTIFICATION REQUISE
         authorization = req.headers.get("authorization") if req else None
-        user_id = await extract_user_id_from_jwt(authorization, None)
+        user_id = await extract_user_id_from_jwt(authorization)
         if not user_id:
             raise HTTPException(
                 status_code=401,
@@ -1205,6 +1314,13 @@ def get_comics_generator():
 
 @app.post("/generate_comic/")
 async def generate_comic(request: dict, req: Request = None):
+    """
+    Lance la génération d'une bande dessinée (idempotent : une requête en double
+    retourne le task_id de la génération déjà lancée)
+    """
+    return await idempotency.handle(req, "generate_comic", request, lambda: _generate_comic(request, req))
+
+async def _generate_comic(request: dict, req: Request = None):
     """
     Lance la génération d'une bande dessinée en arrière-plan
     Retourne immédiatement un task_id pour éviter les timeouts
@@ -1212,7 +1328,7 @@ async def generate_comic(request: dict, req: Request = None):
     try:
         # Extraire user_id depuis JWT - AUTHENTIFICATION REQUISE
         authorization = req.headers.get("authorization") if req else None
-        user_id = await extract_user_id_from_jwt(authorization, None)
+        user_id = await extract_user_id_from_jwt(authorization)
         if not user_id:
             raise HTTPException(
                 status_code=401,
@@ -1254,7 +1370,7 @@ async def generate_comic(request: dict, req: Request = None):
         print(f"📋 Task BD créé: {task_id}")
         
         # Stocker les informations de la tâche
-        comic_task_storage[task_id] = {
+        await task_store.create(COMIC_TASKS, task_id, {
             "start_time": time.time(),
             "theme": theme,
             "art_style": art_style,
@@ -1264,11 +1380,27 @@ async def generate_comic(request: dict, req: Request = None):
             "character_photo_path": character_photo_path,
             "user_id": user_id,  # Stocker pour utilisation ultérieure
             "status": "processing"
-        }
+        })
         
-        # Lancer la génération en arrière-plan
-        import asyncio
-        asyncio.create_task(generate_comic_task(task_id, theme, art_style, num_panels, num_pages, custom_prompt, character_photo_path, user_id))
+        # Mettre la génération en file d'attente (exécutée par un worker BD, abonnés prioritaires)
+        try:
+            queue_info = await job_queue.submit(
+                COMIC_TASKS, task_id,
+                lambda: generate_comic_task(task_id, theme, art_style, num_panels, num_pages, custom_prompt, character_photo_path, user_id),
+                user_id=user_id,
+                tier=await subscription_tiers.get_tier(supabase_client, user_id),
+                cost=num_pages * num_panels / 4
+            )
+        except QueueFullError as e:
+            await task_store.delete(COMIC_TASKS, task_id)
+            print(f"🚦 {e} - task BD {task_id} refusée")
+            raise HTTPException(
+                status_code=429,
+                detail="Vous avez déjà plusieurs bandes dessinées en attente, veuillez patienter" if e.per_user
+                else "Trop de bandes dessinées en cours de création, veuillez réessayer dans quelques instants",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        progress_broker.register_task(user_id, COMIC_TASKS, task_id)
         
         # Retourner immédiatement le task_id
         estimated_time = f"{num_pages * num_panels * 0.3:.0f}-{num_pages * num_panels * 0.4:.0f} minutes"
@@ -1280,7 +1412,8 @@ async def generate_comic(request: dict, req: Request = None):
             "theme": theme,
             "art_style": art_style,
             "num_panels": num_panels,
-            "num_pages": num_pages
+            "num_pages": num_pages,
+            **queue_info
         }
         
         print(f"✅ Task BD lancée: {result}")
@@ -1339,6 +1472,72 @@ async def upload_character_photo(file: UploadFile = File(...)):
         print(f"❌ Erreur upload photo: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur upload: {str(e)}")
 
+def build_queued_status(kind: str, task_id: str) -> Optional[Dict[str, Any]]:
+    """Statut d'une tâche encore en file d'attente (None si elle a démarré ou n'est pas suivie par ce processus)"""
+    position = job_queue.position(kind, task_id)
+    if not position:
+        return None
+    estimated_wait = job_queue.estimated_wait(kind, position)
+    return {
+        "task_id": task_id,
+        "status": "processing",
+        "queued": True,
+        "progress": 0,
+        "queue_position": position,
+        "estimated_wait": estimated_wait,
+        "message": f"En file d'attente (position {position}, démarrage estimé dans ~{max(estimated_wait, 1) // 60 + 1} min)"
+    }
+
+def build_comic_status(task_id: str, task_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Contenu "data" du statut d'une BD (partagé par /status_comic et le flux de progression)"""
+    status = task_info.get("status", "processing")
+
+    if status == "processing" or status == "generating":
+        queued = build_queued_status(COMIC_TASKS, task_id)
+        if queued:
+            return queued
+
+        # Encore en traitement
+        current_time = time.time()
+        elapsed_seconds = current_time - task_info.get("started_at", task_info["start_time"])
+
+        # Estimation temps selon le nombre de cases et pages (15s par case)
+        num_panels = task_info.get("num_panels", 4)
+        num_pages = task_info.get("num_pages", 1)
+        estimated_duration = num_panels * num_pages * 15
+        progress = min(int((elapsed_seconds / estimated_duration) * 100), 95)
+
+        return {
+            "task_id": task_id,
+            "status": "processing",
+            "progress": progress,
+            "message": f"Génération de la BD en cours... {progress}%",
+            "estimated_remaining": max(int(estimated_duration - elapsed_seconds), 10)
+        }
+
+    if status == "completed":
+        # BD terminée !
+        return task_info.get("result", {})
+
+    if status == "failed":
+        # Erreur de génération
+        return {
+            "status": "failed",
+            "error": task_info.get("error", "Erreur inconnue")
+        }
+
+    if status == "cancelled":
+        return {
+            "task_id": task_id,
+            "status": "cancelled",
+            "message": task_info.get("message", "Génération annulée")
+        }
+
+    return {
+        "status": status,
+        "message": "Statut inconnu"
+    }
+
 @app.get("/status_comic/{task_id}")
 async def get_comic_status(task_id: str):
     """
@@ -1346,66 +1545,27 @@ async def get_comic_status(task_id: str):
     """
     try:
         # Vérifier si la tâche existe
-        if task_id not in comic_task_storage:
+        task_info = await task_store.get(COMIC_TASKS, task_id)
+        if task_info is None:
             print(f"❌ Task BD {task_id} non trouvé")
             raise HTTPException(status_code=404, detail="Tâche non trouvée")
         
-        task_info = comic_task_storage[task_id]
         status = task_info.get("status", "processing")
         
         print(f"📊 Statut BD demandé pour {task_id}: {status}")
         
+        data = build_comic_status(task_id, task_info)
+        result = {
+            "type": "result",
+            "data": data
+        }
+        
         if status == "processing" or status == "generating":
-            # Encore en traitement
-            current_time = time.time()
-            elapsed_seconds = current_time - task_info["start_time"]
-            
-            # Estimation temps selon le nombre de cases et pages (15s par case)
-            num_panels = task_info.get("num_panels", 4)
-            num_pages = task_info.get("num_pages", 1)
-            estimated_duration = num_panels * num_pages * 15
-            progress = min(int((elapsed_seconds / estimated_duration) * 100), 95)
-            
-            result = {
-                "type": "result", 
-                "data": {
-                    "task_id": task_id,
-                    "status": "processing",
-                    "progress": progress,
-                    "message": f"Génération de la BD en cours... {progress}%",
-                    "estimated_remaining": max(int(estimated_duration - elapsed_seconds), 10)
-                }
-            }
-            print(f"⏳ Task BD {task_id} en cours: {progress}%")
-            
+            print(f"⏳ Task BD {task_id} en cours: {data['progress']}%")
         elif status == "completed":
-            # BD terminée !
-            comic_result = task_info.get("result", {})
-            result = {
-                "type": "result",
-                "data": comic_result
-            }
             print(f"✅ BD {task_id} terminée et retournée!")
-            
         elif status == "failed":
-            # Erreur de génération
-            error_msg = task_info.get("error", "Erreur inconnue")
-            result = {
-                "type": "result",
-                "data": {
-                    "status": "failed",
-                    "error": error_msg
-                }
-            }
-            print(f"❌ Task BD {task_id} échouée: {error_msg}")
-        else:
-            result = {
-                "type": "result",
-                "data": {
-                    "status": status,
-                    "message": "Statut inconnu"
-                }
-            }
+            print(f"❌ Task BD {task_id} échouée: {data['error']}")
         
         return result
         
@@ -1437,50 +1597,54 @@ async def get_themes():
 @app.post("/generate_animation/")
 async def generate_animation_post(
     request: AnimationRequest,
+    req: Request,
     authorization: Optional[str] = Header(None)
 ):
     """
     Génère une animation via POST avec body JSON
     """
     # Extraire user_id depuis JWT - AUTHENTIFICATION REQUISE
-    user_id = await extract_user_id_from_jwt(authorization, None)
+    user_id = await extract_user_id_from_jwt(authorization)
     if not user_id:
         raise HTTPException(
             status_code=401,
             detail="Authentification requise pour générer une animation"
         )
     
-    return await _generate_animation_logic(
+    # Une requête en double retourne le task_id de l'animation déjà lancée
+    return await idempotency.handle(req, "generate_animation", request, lambda: _generate_animation_logic(
         theme=request.theme,
         duration=request.duration or 30,
         style=request.style or "cartoon",
         custom_prompt=request.custom_prompt,
         user_id=user_id
-    )
+    ))
 
 @app.post("/generate-quick-json")
 async def generate_quick_json(
     request: GenerateQuickRequest,
+    req: Request,
     authorization: Optional[str] = Header(None)
 ):
     """
     Génère une animation via POST avec body JSON uniquement (nouvelle route)
     """
     # Extraire user_id depuis JWT - AUTHENTIFICATION REQUISE
-    user_id = await extract_user_id_from_jwt(authorization, None)
+    user_id = await extract_user_id_from_jwt(authorization)
     if not user_id:
         raise HTTPException(
             status_code=401,
             detail="Authentification requise pour générer une animation rapide"
         )
 
-    return await _generate_animation_logic(
+    # Une requête en double retourne le task_id de l'animation déjà lancée
+    return await idempotency.handle(req, "generate_animation", request, lambda: _generate_animation_logic(
         theme=request.theme,
         duration=request.duration,
         style=request.style,
         custom_prompt=request.custom_prompt,
         user_id=user_id
-    )
+    ))
 
 @app.get("/generate-quick")   # Ajouter support GET pour compatibilité
 async def generate_animation(
@@ -1499,7 +1663,7 @@ async def generate_animation(
     if request:
         authorization = request.headers.get("authorization")
         if authorization:
-            user_id = await extract_user_id_from_jwt(authorization, request)
+            user_id = await extract_user_id_from_jwt(authorization)
     
     return await _generate_animation_logic(theme, duration, style, custom_prompt, user_id=user_id)
 
@@ -1560,18 +1724,38 @@ async def _generate_animation_logic(
         print(f"📋 Task ID créé: {task_id}")
 
         # Stocker les informations de la tâche
-        task_storage[task_id] = {
+        await task_store.create(ANIMATION_TASKS, task_id, {
             "start_time": time.time(),
             "theme": theme,
             "duration": duration,
             "style": style,
             "workflow": "zseedance",
-            "status": "processing"
-        }
+            "user_id": user_id,
+            "status": "processing",
+            "owner": worker_id(),
+            "heartbeat_at": time.time()
+        })
 
-        # Génération selon le workflow Wan 2.5 via WaveSpeed API (Seedance-style)
-        import asyncio
-        asyncio.create_task(generate_zseedance_animation_task(task_id, theme, duration, style, user_id))
+        # Génération selon le workflow Wan 2.5 via WaveSpeed API (Seedance-style), exécutée par un worker animation
+        # (équité entre utilisateurs, abonnés prioritaires)
+        try:
+            queue_info = await job_queue.submit(
+                ANIMATION_TASKS, task_id,
+                lambda: generate_zseedance_animation_task(task_id, theme, duration, style, user_id),
+                user_id=user_id,
+                tier=await subscription_tiers.get_tier(supabase_client, user_id),
+                cost=duration / 30
+            )
+        except QueueFullError as e:
+            await task_store.delete(ANIMATION_TASKS, task_id)
+            print(f"🚦 {e} - task animation {task_id} refusée")
+            raise HTTPException(
+                status_code=429,
+                detail="Vous avez déjà plusieurs animations en attente, veuillez patienter" if e.per_user
+                else "Trop d'animations en cours de génération, veuillez réessayer dans quelques instants",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        progress_broker.register_task(user_id, ANIMATION_TASKS, task_id)
 
         # Retourner immédiatement le task_id
         result = {
@@ -1581,22 +1765,21 @@ async def _generate_animation_logic(
             "estimated_time": "5-7 minutes",
             "style": style,
             "theme": theme,
-            "duration": duration
+            "duration": duration,
+            **queue_info
         }
 
         print(f"✅ Task lancée: {result}")
         return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Erreur génération animation: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Erreur lors de la génération de l'animation : {str(e)}")
 
-# Stockage temporaire des tâches en cours (en production, utiliser Redis/DB)
-task_storage = {}
-comic_task_storage = {}
-
 async def generate_zseedance_animation_task(task_id: str, theme: str, duration: int, style: str = "cartoon", user_id: str = None):
     """
     Tâche en arrière-plan pour la génération avec Wan 2.5 via WaveSpeed API.
@@ -1604,7 +1787,7 @@ async def generate_zseedance_animation_task(task_id: str, theme: str, duration:
     
     Utilise le WanVideoOrchestrator qui implémente:
     - Showrunner logic avec Character Sheet pour consistance
-    - Génération parallèle avec rate limiting (semaphore)
+    - Génération parallèle avec rate limiting (places réparties équitablement entre animations)
     - Assemblage intelligent avec normalisation audio
     - Wan 2.5 génère déjà l'audio - pas besoin de génération audio séparée
     """
@@ -1619,7 +1802,7 @@ async def generate_zseedance_animation_task(task_id: str, theme: str, duration:
     
     try:
         # Mettre à jour le statut
-        task_storage[task_id]["status"] = "generating"
+        await update_task(ANIMATION_TASKS, task_id, status="generating", started_at=time.time())
         print(f"✅ Statut mis à jour: generating")
 
         # Utiliser le nouveau WanVideoOrchestrator
@@ -1650,15 +1833,28 @@ async def generate_zseedance_animation_task(task_id: str, theme: str, duration:
 
         # Callback pour mise à jour du progrès
         async def on_progress(progress: int, message: str):
-            task_storage[task_id]["progress"] = progress
-            task_storage[task_id]["message"] = message
+            # Annulation demandée depuis un autre worker : s'arrêter à la prochaine étape
+            current = await task_store.get(ANIMATION_TASKS, task_id)
+            if current is not None and current.get("status") == "cancelled":
+                raise JobCancelled(task_id)
+            await update_task(ANIMATION_TASKS, task_id, progress=progress, message=message, heartbeat_at=time.time())
             print(f"📊 Progress {task_id}: {progress}% - {message}")
 
+        # Callback des clips de scène déjà lisibles (aperçu avant l'assemblage)
+        async def on_preview(preview_clips: List[Dict[str, Any]]):
+            await update_task(ANIMATION_TASKS, task_id, preview_clips=preview_clips)
+            print(f"🎞️ Aperçu {task_id}: {len(preview_clips)} scène(s) lisible(s)")
+
         # Générer l'animation complète avec le nouveau pipeline
         print(f"🚀 Appel WanVideoOrchestrator.run_pipeline avec thème: {theme}")
         try:
-            result = await orchestrator.run_pipeline(request, on_progress=on_progress)
+            # task_id comme point de reprise : une relance après redémarrage reprend les clips déjà soumis
+            result = await orchestrator.run_pipeline(
+                request, on_progress=on_progress, checkpoint_id=task_id, on_preview=on_preview
+            )
             print(f"✅ run_pipeline terminé avec résultat: {result.status.value}")
+        except JobCancelled:
+            raise
         except Exception as gen_error:
             print(f"❌ ERREUR lors de l'appel run_pipeline: {gen_error}")
             import traceback
@@ -1669,33 +1865,33 @@ async def generate_zseedance_animation_task(task_id: str, theme: str, duration:
         if result.status == GenerationStatus.COMPLETED and result.final_video_url:
             print(f"✅ Animation Wan 2.5 {task_id} générée avec succès!")
             print(f"🎬 Vidéo finale: {result.final_video_url[:50]}...")
-            task_storage[task_id]["status"] = "completed"
-            
             # Stocker le résultat au format compatible avec l'ancien système
             animation_result = result.to_frontend_response()
             animation_result["status"] = "completed"
-            task_storage[task_id]["result"] = animation_result
+            await update_task(ANIMATION_TASKS, task_id, status="completed", result=animation_result)
             
         elif result.status == GenerationStatus.PARTIAL_SUCCESS:
             print(f"⚠️ Animation Wan 2.5 {task_id} partiellement réussie (dégradation gracieuse)")
             print(f"🎬 Vidéo finale: {result.final_video_url[:50] if result.final_video_url else 'N/A'}...")
-            task_storage[task_id]["status"] = "completed"  # On marque comme completed pour le frontend
-            
             animation_result = result.to_frontend_response()
             animation_result["status"] = "completed"
             animation_result["warning"] = f"{result.failed_clips} clips sur {result.total_clips} ont échoué"
-            task_storage[task_id]["result"] = animation_result
+            # On marque comme completed pour le frontend
+            await update_task(ANIMATION_TASKS, task_id, status="completed", result=animation_result)
             
         else:
             print(f"❌ Animation Wan 2.5 {task_id} échouée: {result.error_message}")
-            task_storage[task_id]["status"] = "failed"
-            task_storage[task_id]["result"] = {
+            await update_task(ANIMATION_TASKS, task_id, status="failed", result={
                 "status": "failed",
                 "error": result.error_message or "Erreur inconnue",
                 "theme": theme,
                 "type": "wan25_wavespeed"
-            }
+            })
 
+    except JobCancelled:
+        # Annulée depuis un autre worker : statut "cancelled" déjà écrit, nettoyage fait par l'annulation
+        print(f"🛑 Animation {task_id} arrêtée (annulation)")
+        raise
     except Exception as e:
         print(f"\n{'='*80}")
         print(f"❌❌❌ ERREUR TÂCHE GÉNÉRATION WAN 2.5 ❌❌❌")
@@ -1707,14 +1903,12 @@ async def generate_zseedance_animation_task(task_id: str, theme: str, duration:
         traceback.print_exc()
         print(f"{'='*80}\n")
 
-        task_storage[task_id]["status"] = "failed"
-        task_storage[task_id]["error"] = str(e)
-        task_storage[task_id]["result"] = {
+        await update_task(ANIMATION_TASKS, task_id, status="failed", error=str(e), result={
             "status": "failed",
             "error": str(e),
             "theme": theme,
             "type": "wan25_wavespeed"
-        }
+        })
 
 async def generate_comic_task(task_id: str, theme: str, art_style: str, num_panels: int, num_pages: int, custom_prompt: str, character_photo_path: str, user_id: str = None):
     """
@@ -1725,14 +1919,20 @@ async def generate_comic_task(task_id: str, theme: str, art_style: str, num_pane
         
         # Récupérer user_id depuis le storage si non fourni
         if not user_id:
-            user_id = comic_task_storage[task_id].get("user_id")
+            user_id = (await task_store.get(COMIC_TASKS, task_id) or {}).get("user_id")
         
         # Mettre à jour le statut
-        comic_task_storage[task_id]["status"] = "generating"
+        await update_task(COMIC_TASKS, task_id, status="generating", started_at=time.time())
         
         # Obtenir le générateur
         generator = get_comics_generator()
         
+        # Annulation demandée depuis un autre worker : s'arrêter avant la page suivante
+        async def before_page(page_num: int):
+            current = await task_store.get(COMIC_TASKS, task_id)
+            if current is not None and current.get("status") == "cancelled":
+                raise JobCancelled(task_id)
+        
         # Générer la BD complète (nombre variable de pages avec num_panels cases par page)
         result = await generator.create_complete_comic(
             theme=theme,
@@ -1741,7 +1941,8 @@ async def generate_comic_task(task_id: str, theme: str, art_style: str, num_pane
             art_style=art_style,
             custom_prompt=custom_prompt,
             character_photo_path=character_photo_path,
-            user_id=user_id  # Passer user_id pour Supabase Storage
+            user_id=user_id,  # Passer user_id pour Supabase Storage
+            before_page=before_page
         )
         
         # Stocker le résultat
@@ -1763,7 +1964,7 @@ async def generate_comic_task(task_id: str, theme: str, art_style: str, num_pane
             except Exception:
                 pass
             
-            comic_task_storage[task_id]["result"] = {
+            comic_result = {
                 "status": "success",
                 "comic_id": result["comic_id"],
                 "title": result["title"],
@@ -1775,20 +1976,78 @@ async def generate_comic_task(task_id: str, theme: str, art_style: str, num_pane
                 "generation_time": result["generation_time"],
                 "uniqueness_metadata": uniqueness_metadata if uniqueness_metadata else None
             }
-            comic_task_storage[task_id]["status"] = "completed"
+            await update_task(COMIC_TASKS, task_id, status="completed", result=comic_result)
             print(f"✅ BD {task_id} générée avec succès!")
         else:
             error_msg = result.get("error", "Erreur inconnue")
-            comic_task_storage[task_id]["status"] = "failed"
-            comic_task_storage[task_id]["error"] = error_msg
+            await update_task(COMIC_TASKS, task_id, status="failed", error=error_msg)
             print(f"❌ Échec BD {task_id}: {error_msg}")
         
+    except JobCancelled:
+        print(f"🛑 BD {task_id} arrêtée (annulation)")
+        raise
     except Exception as e:
         print(f"❌ Erreur génération BD {task_id}: {e}")
         import traceback
         traceback.print_exc()
-        comic_task_storage[task_id]["status"] = "failed" 
-        comic_task_storage[task_id]["error"] = str(e)
+        await update_task(COMIC_TASKS, task_id, status="failed", error=str(e))
+
+def build_animation_status(task_id: str, task_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Contenu "data" du statut d'une animation (partagé par /status et le flux de progression)"""
+    status = task_info.get("status", "processing")
+
+    if status == "processing" or status == "generating":
+        queued = build_queued_status(ANIMATION_TASKS, task_id)
+        if queued:
+            return queued
+
+        # Encore en traitement RÉEL
+        current_time = time.time()
+        elapsed_seconds = current_time - task_info.get("started_at", task_info["start_time"])
+
+        # Estimation temps selon le mode
+        estimated_duration = 180  # 3 minutes en mode démo, 6.5 minutes en mode réel
+        estimated_progress = min(int((elapsed_seconds / estimated_duration) * 100), 95)
+
+        # Progression réelle remontée par le pipeline si disponible
+        progress = task_info.get("progress", estimated_progress)
+        return {
+            "task_id": task_id,
+            "status": "processing",
+            "progress": progress,
+            "message": task_info.get("message") or f"Génération RÉELLE en cours... {progress}%",
+            "estimated_remaining": max(int(estimated_duration - elapsed_seconds), 30),
+            # Scènes terminées, lisibles dans l'ordre avant la vidéo finale
+            "preview_clips": task_info.get("preview_clips", [])
+        }
+
+    if status == "completed":
+        # Animation RÉELLE terminée !
+        return task_info.get("result", {})
+
+    if status == "failed":
+        # Erreur de génération
+        error_msg = task_info.get("error") or task_info.get("result", {}).get("error", "Erreur inconnue")
+        return {
+            "task_id": task_id,
+            "status": "failed",
+            "error": error_msg,
+            "message": f"Échec de la génération: {error_msg}"
+        }
+
+    if status == "cancelled":
+        return {
+            "task_id": task_id,
+            "status": "cancelled",
+            "message": task_info.get("message", "Génération annulée")
+        }
+
+    # Statut inconnu - fallback
+    return {
+        "task_id": task_id,
+        "status": "unknown",
+        "message": f"Statut inconnu: {status}"
+    }
 
 @app.get("/status/{task_id}")
 async def get_animation_status(task_id: str):
@@ -1797,70 +2056,29 @@ async def get_animation_status(task_id: str):
     """
     try:
         # Vérifier si la tâche existe dans notre stockage
-        if task_id not in task_storage:
+        task_info = await task_store.get(ANIMATION_TASKS, task_id)
+        if task_info is None:
             print(f"❌ Task ID {task_id} non trouvé")
             raise HTTPException(status_code=404, detail="Tâche non trouvée")
         
-        task_info = task_storage[task_id]
         status = task_info.get("status", "processing")
         
         print(f"📊 Statut RÉEL demandé pour {task_id}: {status}")
         
+        data = build_animation_status(task_id, task_info)
+        result = {
+            "type": "result",
+            "data": data
+        }
+        
         if status == "processing" or status == "generating":
-            # Encore en traitement RÉEL
-            current_time = time.time()
-            elapsed_seconds = current_time - task_info["start_time"]
-            
-            # Estimation temps selon le mode
-            estimated_duration = 180  # 3 minutes en mode démo, 6.5 minutes en mode réel
-            progress = min(int((elapsed_seconds / estimated_duration) * 100), 95)
-            
-            result = {
-                "type": "result", 
-                "data": {
-                    "task_id": task_id,
-                    "status": "processing",
-                    "progress": progress,
-                    "message": f"Génération RÉELLE en cours... {progress}%",
-                    "estimated_remaining": max(int(estimated_duration - elapsed_seconds), 30)
-                }
-            }
-            print(f"⏳ Task RÉEL {task_id} en cours: {progress}%")
+            print(f"⏳ Task RÉEL {task_id} en cours: {data['progress']}%")
         elif status == "completed":
-            # Animation RÉELLE terminée !
-            animation_result = task_info.get("result", {})
-            result = {
-                "type": "result",
-                "data": animation_result
-            }
             # LOG DÉTAILLÉ pour déboguer l'affichage frontend
             print(f"✅ Animation RÉELLE {task_id} terminée et retournée!")
-            print(f"📦 Données retournées: status={animation_result.get('status')}, final_video_url={'OUI' if animation_result.get('final_video_url') else 'NON'}, video_urls={'OUI' if animation_result.get('video_urls') else 'NON'}, clips={'OUI' if animation_result.get('clips') else 'NON'}")
-            
+            print(f"📦 Données retournées: status={data.get('status')}, final_video_url={'OUI' if data.get('final_video_url') else 'NON'}, video_urls={'OUI' if data.get('video_urls') else 'NON'}, clips={'OUI' if data.get('clips') else 'NON'}")
         elif status == "failed":
-            # Erreur de génération
-            error_msg = task_info.get("error", "Erreur inconnue")
-            result = {
-                "type": "result",
-                "data": {
-                    "task_id": task_id,
-                    "status": "failed",
-                    "error": error_msg,
-                    "message": f"Échec de la génération: {error_msg}"
-                }
-            }
-            print(f"❌ Animation {task_id} échouée: {error_msg}")
-            
-        else:
-            # Statut inconnu - fallback
-            result = {
-                "type": "result", 
-                "data": {
-                    "task_id": task_id,
-                    "status": "unknown",
-                    "message": f"Statut inconnu: {status}"
-                }
-            }
+            print(f"❌ Animation {task_id} échouée: {data['error']}")
         
         # Retourner le résultat dans tous les cas
         return result
@@ -1872,15 +2090,176 @@ async def get_animation_status(task_id: str):
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du statut : {str(e)}")
 
 
+# === FLUX DE PROGRESSION (SSE / WebSocket) ===
+
+STATUS_BUILDERS = {
+    ANIMATION_TASKS: build_animation_status,
+    COMIC_TASKS: build_comic_status,
+}
+
+async def update_task(kind: str, task_id: str, **fields: Any) -> None:
+    """Met à jour une tâche dans le task store et publie son nouvel état dans le flux de progression"""
+    # Une tâche annulée (éventuellement depuis un autre worker) ne repasse jamais dans un autre état
+    if fields.get("status", "cancelled") != "cancelled":
+        current = await task_store.get(kind, task_id)
+        if current is not None and current.get("status") == "cancelled":
+            print(f"🛑 Tâche {task_id} annulée : statut {fields['status']} ignoré")
+            return
+    await task_store.update(kind, task_id, **fields)
+    try:
+        task_info = await task_store.get(kind, task_id)
+        if task_info is not None:
+            progress_broker.publish(
+                kind, task_id, STATUS_BUILDERS[kind](task_id, task_info),
+                status=task_info.get("status"), user_id=task_info.get("user_id")
+            )
+    except Exception as e:
+        # La diffusion ne doit jamais faire échouer la génération
+        print(f"⚠️ Publication de la progression impossible pour {task_id}: {e}")
+
+def parse_progress_tasks(tasks: Optional[str]) -> Optional[List[Tuple[str, str]]]:
+    """Parse le paramètre tasks=kind:task_id,kind:task_id (None = toutes les tâches de l'utilisateur)"""
+    if not tasks:
+        return None
+    parsed = []
+    for item in tasks.split(","):
+        kind, _, task_id = item.strip().partition(":")
+        if kind not in (ANIMATION_TASKS, COMIC_TASKS, RHYME_TASKS) or not task_id:
+            raise HTTPException(status_code=400, detail=f"Tâche invalide: {item} (format attendu: animation:<id>, comic:<id> ou rhyme:<id>)")
+        parsed.append((kind, task_id))
+    return parsed
+
+def make_progress_snapshot(user_id: str):
+    """Lecture de l'état d'une tâche dans le task store, limitée aux tâches de l'utilisateur"""
+    async def snapshot(kind: str, task_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        task_info = await task_store.get(kind, task_id)
+        if task_info is None or task_info.get("user_id") != user_id:
+            return None
+        return task_info.get("status", "processing"), STATUS_BUILDERS[kind](task_id, task_info)
+    return snapshot
+
+def format_sse(event: Optional[Dict[str, Any]]) -> str:
+    """Sérialise un événement au format text/event-stream (None = heartbeat)"""
+    if event is None:
+        return ": ping\n\n"
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+@app.get("/progress/stream")
+async def progress_stream(
+    request: Request,
+    tasks: Optional[str] = Query(None, description="Tâches à suivre: animation:<id>,comic:<id>,rhyme:<id> (défaut: toutes)"),
+    token: Optional[str] = Query(None, description="JWT Supabase (EventSource ne permet pas d'envoyer de header)"),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Flux Server-Sent Events de la progression des tâches de l'utilisateur.
+    Remplace le polling de /status, /status_comic et /check_task_status : chaque
+    événement contient le même "data" que ces endpoints.
+    """
+    user_id = await extract_user_id_from_jwt(f"Bearer {token}" if token else authorization)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Authentification requise")
+
+    requested = parse_progress_tasks(tasks)
+
+    async def event_source():
+        yield "retry: 3000\n\n"
+        async for event in progress_broker.stream(user_id, make_progress_snapshot(user_id), tasks=requested):
+            if await request.is_disconnected():
+                break
+            yield format_sse(event)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@app.websocket("/ws/progress")
+async def progress_websocket(websocket: WebSocket, tasks: Optional[str] = None, token: Optional[str] = None):
+    """Même flux que /progress/stream, via WebSocket (JWT dans le paramètre token)"""
+    user_id = await extract_user_id_from_jwt(f"Bearer {token}") if token else None
+    if not user_id:
+        await websocket.close(code=4401)
+        return
+
+    try:
+        requested = parse_progress_tasks(tasks)
+    except HTTPException as e:
+        await websocket.close(code=4400, reason=e.detail[:120])
+        return
+
+    await websocket.accept()
+    try:
+        async for event in progress_broker.stream(user_id, make_progress_snapshot(user_id), tasks=requested):
+            await websocket.send_json(event if event is not None else {"event": "ping"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+# === ANNULATION DES GÉNÉRATIONS ===
+
+@app.delete("/tasks/{task_id}")
+async def cancel_task(task_id: str, authorization: Optional[str] = Header(None)):
+    """
+    Annule une génération (BD ou animation) de l'utilisateur connecté.
+    En attente : retirée de la file. En cours : le pipeline est interrompu, ses places
+    de sémaphore sont libérées, les prédictions WaveSpeed en cours sont annulées
+    (si possible) et les fichiers temporaires supprimés.
+    """
+    user_id = await extract_user_id_from_jwt(authorization)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Authentification requise")
+
+    kind, task_info = None, None
+    for candidate in (ANIMATION_TASKS, COMIC_TASKS):
+        task_info = await task_store.get(candidate, task_id)
+        if task_info is not None:
+            kind = candidate
+            break
+    # Tâche d'un autre utilisateur : même réponse qu'une tâche inexistante
+    if task_info is None or task_info.get("user_id") != user_id:
+        raise HTTPException(status_code=404, detail="Tâche non trouvée")
+
+    if task_info.get("status") in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Tâche déjà terminée ({task_info.get('status')})")
+
+    # None : le job tourne dans un autre worker, qui s'arrêtera à sa prochaine étape
+    state = await job_queue.cancel(kind, task_id)
+
+    task_info = await task_store.get(kind, task_id)
+    if task_info is not None and task_info.get("status") in TERMINAL_STATUSES:
+        # Terminée pendant l'annulation
+        raise HTTPException(status_code=409, detail=f"Tâche déjà terminée ({task_info.get('status')})")
+
+    await update_task(kind, task_id, status="cancelled", message="Génération annulée")
+
+    cleanup = None
+    if kind == ANIMATION_TASKS:
+        try:
+            cleanup = await get_wan_orchestrator().cancel_pipeline(task_id)
+        except Exception as e:
+            print(f"⚠️ Nettoyage du pipeline {task_id} incomplet: {e}")
+
+    print(f"🛑 Tâche {task_id} annulée par {user_id} (état: {state or 'autre worker'})")
+    return {
+        "task_id": task_id,
+        "status": "cancelled",
+        "was": state or "remote",
+        "cleanup": cleanup
+    }
+
+
 # === ROUTES D'AUTHENTIFICATION JWT ===
 
 # === ENDPOINTS D'AUTHENTIFICATION ===
 # Authentification gérée par Supabase - endpoints supprimés car inutiles avec Vercel
 
 # Configuration pour supprimer les erreurs de connexion dans les logs
-import asyncio
-import logging
-
 def ignore_connection_errors(loop, context):
     """Gestionnaire pour ignorer les erreurs de connexion fermée"""
     if 'exception' not in context:
@@ -2129,32 +2508,30 @@ Cet email a été envoyé automatiquement depuis le formulaire de contact Herbbi
 """
 
         # Envoi via Resend API
-        import httpx
-
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                "https://api.resend.com/emails",
-                headers={
-                    "Authorization": f"Bearer {resend_api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "from": "Herbbie <contact@herbbie.com>",
-                    "to": [receiver_email],
-                    "subject": f"HERBBIE - {contact_form.subject}",
-                    "html": html_content,
-                    "text": text_content,
-                }
-            )
+        client = get_http_client("default")
+        response = await client.post(
+            "https://api.resend.com/emails",
+            headers={
+                "Authorization": f"Bearer {resend_api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "from": "Herbbie <contact@herbbie.com>",
+                "to": [receiver_email],
+                "subject": f"HERBBIE - {contact_form.subject}",
+                "html": html_content,
+                "text": text_content,
+            }
+        )
 
-            if response.status_code == 200:
-                result = response.json()
-                print(f"✅ Email envoyé avec succès via Resend - ID: {result.get('id', 'N/A')}")
-                print(f"📧 De: {contact_form.email} → À: {receiver_email}")
-            else:
-                error_msg = response.text
-                print(f"❌ Erreur Resend API ({response.status_code}): {error_msg}")
-                raise Exception(f"Resend API error: {error_msg}")
+        if response.status_code == 200:
+            result = response.json()
+            print(f"✅ Email envoyé avec succès via Resend - ID: {result.get('id', 'N/A')}")
+            print(f"📧 De: {contact_form.email} → À: {receiver_email}")
+        else:
+            error_msg = response.text
+            print(f"❌ Erreur Resend API ({response.status_code}): {error_msg}")
+            raise Exception(f"Resend API error: {error_msg}")
 
     except Exception as e:
         print(f"❌ Erreur envoi email via Resend: {e}")
@@ -2349,7 +2726,7 @@ async def delete_creation_files(
         
         token = authorization.split(" ")[1] if authorization.startswith("Bearer ") else authorization
         
-        user_id = await fetch_user_id_from_supabase(token)
+        user_id = await supabase_user_resolver.resolve_token(token)
         
         if not user_id:
             print("❌ [DELETE_FILES] User ID manquant")
@@ -2427,16 +2804,27 @@ async def delete_creation_files(
                                 failed_files.append({"path": storage_path, "error": result.get("error")})
         
         elif creation_type in ["animation", "crewai_animation"]:
-            # Vidéo d'animation
+            # Vidéo d'animation, affiche et bande de vignettes
             video_url = creation_data.get("video_url") or creation_data.get("final_video_url")
-            if video_url:
-                storage_path = _extract_storage_path_from_url(video_url, creation_type)
+            for file_url in (video_url, creation_data.get("poster_url"), creation_data.get("sprite_url")):
+                if not file_url:
+                    continue
+                storage_path = _extract_storage_path_from_url(file_url, creation_type)
                 if storage_path:
                     result = await storage_service.delete_file(storage_path, content_type=creation_type)
                     if result.get("success"):
                         deleted_files.append(storage_path)
                     else:
                         failed_files.append({"path": storage_path, "error": result.get("error")})
+            # Diffusion HLS : playlist maître et renditions "<nom>*" dans le même dossier
+            hls_path = _extract_storage_path_from_url(creation_data.get("hls_url"), creation_type)
+            if hls_path:
+                hls_prefix = os.path.splitext(hls_path)[0]
+                result = await storage_service.delete_prefix(hls_prefix, content_type=creation_type)
+                if result.get("success"):
+                    deleted_files.extend(result.get("deleted", []))
+                else:
+                    failed_files.append({"path": f"{hls_prefix}*", "error": result.get("error")})
         
         return {
             "success": True,
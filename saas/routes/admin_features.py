@@ -4,10 +4,15 @@ from typing import Dict, Any, Optional
 from copy import deepcopy
 import json
 import os
+import secrets
 import httpx
 import traceback
 from datetime import datetime
 from fastapi import status
+from services.supabase_auth import extract_user_id_from_jwt
+from services.admin_roles import admin_role_cache, apply_profiles_webhook
+from services.http_clients import get_http_client
+from config import SUPABASE_WEBHOOK_SECRET
 
 # Fichier de stockage local pour les configurations
 CONFIG_FILE = "features_config.json"
@@ -21,49 +26,21 @@ router = APIRouter(prefix="/api", tags=["admin"])
 # Import du client Supabase depuis l'environnement
 SUPABASE_URL = os.getenv("SUPABASE_URL", "https://xfbmdeuzuyixpmouhqcv.supabase.co")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
-SUPABASE_AUTH_API_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+
+_supabase_client = None
 
 async def get_supabase_client():
-    """Récupère le client Supabase"""
+    """Récupère le client Supabase (créé une seule fois)"""
+    global _supabase_client
     if not SUPABASE_SERVICE_KEY:
         return None
-    try:
-        from supabase import create_client, Client
-        return create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-    except:
-        return None
-
-async def extract_user_id_from_jwt(authorization: Optional[str] = Header(None)) -> Optional[str]:
-    """
-    Valide le JWT via l'API Supabase et retourne l'identifiant utilisateur.
-    Utilise l'endpoint /auth/v1/user pour garantir la vérification côté serveur.
-    """
-    if not authorization or not authorization.startswith("Bearer "):
-        return None
-    
-    token = authorization.split(" ")[1]
-    
-    if not token or not SUPABASE_URL or not SUPABASE_AUTH_API_KEY:
-        return None
-
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "apikey": SUPABASE_AUTH_API_KEY
-    }
-
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(f"{SUPABASE_URL}/auth/v1/user", headers=headers)
-
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("id") or data.get("user", {}).get("id")
-
-        print(f"[SECURITY] JWT invalide (status={response.status_code})")
-    except httpx.HTTPError as exc:
-        print(f"[SECURITY] Erreur lors de la validation JWT : {exc}")
-
-    return None
+    if _supabase_client is None:
+        try:
+            from supabase import create_client, Client
+            _supabase_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+        except:
+            return None
+    return _supabase_client
 
 async def verify_admin_for_features(
     request: Request,
@@ -87,11 +64,9 @@ async def verify_admin_for_features(
             detail="Authentification requise. Fournissez un JWT dans le header Authorization."
         )
     
-    # Vérifier le rôle admin
+    # Vérifier le rôle admin (mis en cache, voir services/admin_roles.py)
     try:
-        response = supabase_client.table('profiles').select('role').eq('id', user_id).single().execute()
-        
-        if not response.data or response.data.get('role') != 'admin':
+        if not await admin_role_cache.is_admin(supabase_client, user_id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Accès réservé aux administrateurs"
@@ -318,17 +293,17 @@ async def list_users(
             "Content-Type": "application/json"
         }
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{SUPABASE_URL}/rest/v1/profiles",
-                headers=headers,
-                params={"select": "id,prenom,nom,email,role,created_at"}
-            )
+        client = get_http_client("supabase")
+        response = await client.get(
+            f"{SUPABASE_URL}/rest/v1/profiles",
+            headers=headers,
+            params={"select": "id,prenom,nom,email,role,created_at"}
+        )
             
-            response.raise_for_status()  # Lève une exception pour les codes 4xx/5xx
-            users = response.json()
-            users.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-            return {"users": users}
+        response.raise_for_status()  # Lève une exception pour les codes 4xx/5xx
+        users = response.json()
+        users.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+        return {"users": users}
     except httpx.HTTPStatusError as exc:
         print(f"[admin_users] Supabase status error: {exc.response.status_code} - {exc.response.text}")
         raise HTTPException(
@@ -365,91 +340,92 @@ async def delete_user_and_creations(
             "Content-Type": "application/json"
         }
 
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            # 1. Supprimer les créations de l'utilisateur (non-bloquant)
-            try:
-                response = await client.delete(
-                    f"{SUPABASE_URL}/rest/v1/creations",
-                    headers=headers,
-                    params={"user_id": f"eq.{user_id}"}
-                )
-                response.raise_for_status()
-                print(f"[admin_users] Créations de l'utilisateur {user_id} supprimées.")
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code != 404:
-                    print(f"[admin_users] Avertissement: Erreur lors de la suppression des créations: {e.response.status_code} - {e.response.text}")
-                else:
-                    print(f"[admin_users] Aucune création trouvée pour l'utilisateur {user_id}.")
-
-            # 2. Supprimer les abonnements de l'utilisateur (non-bloquant)
-            try:
-                response = await client.delete(
-                    f"{SUPABASE_URL}/rest/v1/subscriptions",
-                    headers=headers,
-                    params={"user_id": f"eq.{user_id}"}
-                )
-                response.raise_for_status()
-                print(f"[admin_users] Abonnements de l'utilisateur {user_id} supprimés.")
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code != 404:
-                    print(f"[admin_users] Avertissement: Erreur lors de la suppression des abonnements: {e.response.status_code} - {e.response.text}")
-                else:
-                    print(f"[admin_users] Aucun abonnement trouvé pour l'utilisateur {user_id}.")
-
-            # 3. Supprimer les tokens de l'utilisateur (non-bloquant)
-            try:
-                response = await client.delete(
-                    f"{SUPABASE_URL}/rest/v1/user_tokens",
-                    headers=headers,
-                    params={"user_id": f"eq.{user_id}"}
-                )
-                response.raise_for_status()
-                print(f"[admin_users] Tokens de l'utilisateur {user_id} supprimés.")
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code != 404:
-                    print(f"[admin_users] Avertissement: Erreur lors de la suppression des tokens: {e.response.status_code} - {e.response.text}")
-                else:
-                    print(f"[admin_users] Aucun token trouvé pour l'utilisateur {user_id}.")
-
-            # 4. Supprimer le profil de l'utilisateur (non-bloquant)
-            try:
-                response = await client.delete(
-                    f"{SUPABASE_URL}/rest/v1/profiles",
-                    headers=headers,
-                    params={"id": f"eq.{user_id}"}
-                )
-                response.raise_for_status()
-                print(f"[admin_users] Profil de l'utilisateur {user_id} supprimé.")
-            except httpx.HTTPStatusError as e:
+        client = get_http_client("supabase")
+        # 1. Supprimer les créations de l'utilisateur (non-bloquant)
+        try:
+            response = await client.delete(
+                f"{SUPABASE_URL}/rest/v1/creations",
+                headers=headers,
+                params={"user_id": f"eq.{user_id}"}
+            )
+            response.raise_for_status()
+            print(f"[admin_users] Créations de l'utilisateur {user_id} supprimées.")
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 404:
+                print(f"[admin_users] Avertissement: Erreur lors de la suppression des créations: {e.response.status_code} - {e.response.text}")
+            else:
+                print(f"[admin_users] Aucune création trouvée pour l'utilisateur {user_id}.")
+
+        # 2. Supprimer les abonnements de l'utilisateur (non-bloquant)
+        try:
+            response = await client.delete(
+                f"{SUPABASE_URL}/rest/v1/subscriptions",
+                headers=headers,
+                params={"user_id": f"eq.{user_id}"}
+            )
+            response.raise_for_status()
+            print(f"[admin_users] Abonnements de l'utilisateur {user_id} supprimés.")
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 404:
+                print(f"[admin_users] Avertissement: Erreur lors de la suppression des abonnements: {e.response.status_code} - {e.response.text}")
+            else:
+                print(f"[admin_users] Aucun abonnement trouvé pour l'utilisateur {user_id}.")
+
+        # 3. Supprimer les tokens de l'utilisateur (non-bloquant)
+        try:
+            response = await client.delete(
+                f"{SUPABASE_URL}/rest/v1/user_tokens",
+                headers=headers,
+                params={"user_id": f"eq.{user_id}"}
+            )
+            response.raise_for_status()
+            print(f"[admin_users] Tokens de l'utilisateur {user_id} supprimés.")
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 404:
+                print(f"[admin_users] Avertissement: Erreur lors de la suppression des tokens: {e.response.status_code} - {e.response.text}")
+            else:
+                print(f"[admin_users] Aucun token trouvé pour l'utilisateur {user_id}.")
+
+        # 4. Supprimer le profil de l'utilisateur (non-bloquant)
+        try:
+            response = await client.delete(
+                f"{SUPABASE_URL}/rest/v1/profiles",
+                headers=headers,
+                params={"id": f"eq.{user_id}"}
+            )
+            response.raise_for_status()
+            print(f"[admin_users] Profil de l'utilisateur {user_id} supprimé.")
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 404:
+                print(f"[admin_users] Avertissement: Erreur lors de la suppression du profil: {e.response.status_code} - {e.response.text}")
+            else:
+                print(f"[admin_users] Aucun profil trouvé pour l'utilisateur {user_id}.")
+
+        # 5. Supprimer l'utilisateur de Supabase Auth (nécessite l'API admin - doit être fait en dernier)
+        # IMPORTANT: Doit être fait en dernier car la suppression du profil peut déclencher des cascades
+        auth_headers = {
+            "apikey": SUPABASE_SERVICE_KEY,
+            "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+            "Content-Type": "application/json"
+        }
+        try:
+            auth_response = await client.delete(
+                f"{SUPABASE_URL}/auth/v1/admin/users/{user_id}",
+                headers=auth_headers
+            )
+            auth_response.raise_for_status()
+            print(f"[admin_users] Utilisateur {user_id} supprimé de Supabase Auth.")
+        except httpx.HTTPStatusError as e:
+            error_text = e.response.text if hasattr(e.response, 'text') else str(e.response)
+            if e.response.status_code == 404:
+                print(f"[admin_users] Avertissement: Utilisateur {user_id} non trouvé dans Supabase Auth (peut-être déjà supprimé).")
+            else:
+                print(f"[admin_users] Erreur lors de la suppression de Supabase Auth: {e.response.status_code} - {error_text}")
+                # Ne pas relever l'erreur si l'utilisateur n'existe pas déjà dans Auth
                 if e.response.status_code != 404:
-                    print(f"[admin_users] Avertissement: Erreur lors de la suppression du profil: {e.response.status_code} - {e.response.text}")
-                else:
-                    print(f"[admin_users] Aucun profil trouvé pour l'utilisateur {user_id}.")
-
-            # 5. Supprimer l'utilisateur de Supabase Auth (nécessite l'API admin - doit être fait en dernier)
-            # IMPORTANT: Doit être fait en dernier car la suppression du profil peut déclencher des cascades
-            auth_headers = {
-                "apikey": SUPABASE_SERVICE_KEY,
-                "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-                "Content-Type": "application/json"
-            }
-            try:
-                auth_response = await client.delete(
-                    f"{SUPABASE_URL}/auth/v1/admin/users/{user_id}",
-                    headers=auth_headers
-                )
-                auth_response.raise_for_status()
-                print(f"[admin_users] Utilisateur {user_id} supprimé de Supabase Auth.")
-            except httpx.HTTPStatusError as e:
-                error_text = e.response.text if hasattr(e.response, 'text') else str(e.response)
-                if e.response.status_code == 404:
-                    print(f"[admin_users] Avertissement: Utilisateur {user_id} non trouvé dans Supabase Auth (peut-être déjà supprimé).")
-                else:
-                    print(f"[admin_users] Erreur lors de la suppression de Supabase Auth: {e.response.status_code} - {error_text}")
-                    # Ne pas relever l'erreur si l'utilisateur n'existe pas déjà dans Auth
-                    if e.response.status_code != 404:
-                        raise  # Relever l'erreur pour Supabase Auth car c'est critique
+                    raise  # Relever l'erreur pour Supabase Auth car c'est critique
 
+        admin_role_cache.invalidate(user_id)
         return {"message": f"Utilisateur {user_id} et toutes ses données supprimés avec succès."}
 
     except httpx.HTTPStatusError as exc:
@@ -473,4 +449,53 @@ async def delete_user_and_creations(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur interne du serveur lors de la suppression de l'utilisateur: {str(exc)}"
-        )
\ No newline at end of file
+        )
+
+
+# ============================================
+# CACHE DES RÔLES ADMIN
+# ============================================
+
+class RoleCacheInvalidation(BaseModel):
+    user_id: Optional[str] = None  # None = vider tout le cache
+
+@router.post("/admin/role-cache/invalidate")
+async def invalidate_role_cache(
+    payload: RoleCacheInvalidation,
+    request: Request,
+    authorization: Optional[str] = Header(None)
+):
+    """Invalide le rôle en cache d'un utilisateur (ou de tous) après un changement de rôle (requiert admin)"""
+    await verify_admin_for_features(authorization=authorization, request=request)
+    admin_role_cache.invalidate(payload.user_id)
+    return {"invalidated": payload.user_id or "all", "stats": admin_role_cache.get_stats()}
+
+@router.post("/webhooks/supabase/profiles")
+async def supabase_profiles_webhook(
+    request: Request,
+    x_webhook_secret: Optional[str] = Header(None)
+):
+    """
+    Webhook Supabase (Database Webhooks) sur la table profiles.
+    Configurer le header x-webhook-secret avec la valeur de SUPABASE_WEBHOOK_SECRET.
+    """
+    if not SUPABASE_WEBHOOK_SECRET:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Webhook non configuré"
+        )
+    if not x_webhook_secret or not secrets.compare_digest(x_webhook_secret, SUPABASE_WEBHOOK_SECRET):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Secret de webhook invalide"
+        )
+
+    try:
+        payload = await request.json()
+    except json.JSONDecodeError:
+        payload = None
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Payload JSON invalide")
+
+    user_id = apply_profiles_webhook(payload)
+    return {"invalidated": user_id}
@@ -4,49 +4,16 @@ Routes pour la génération de comptines musicales avec Suno AI
 from fastapi import APIRouter, HTTPException, Request, Header
 from typing import Dict, Any, Optional
 import os
-import httpx
-from openai import AsyncOpenAI
 from services.suno_service import suno_service
 from services.uniqueness_service import uniqueness_service
+from services.supabase_auth import extract_user_id_from_jwt
+from services.http_clients import get_http_client
+from services.ai_clients import get_async_openai
+from services.progress_broker import progress_broker, RHYME_TASKS
+from services.idempotency import idempotency
 
 router = APIRouter()
 
-# Helper pour extraire user_id depuis JWT avec validation sécurisée
-async def extract_user_id_from_jwt(authorization: Optional[str] = None) -> Optional[str]:
-    """
-    Valide le JWT via l'API Supabase et retourne l'identifiant utilisateur.
-    Utilise l'endpoint /auth/v1/user pour garantir la vérification côté serveur.
-    """
-    if not authorization or not authorization.startswith("Bearer "):
-        return None
-    
-    token = authorization.split(" ")[1]
-    
-    SUPABASE_URL = os.getenv("SUPABASE_URL", "https://xfbmdeuzuyixpmouhqcv.supabase.co")
-    SUPABASE_AUTH_API_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_ANON_KEY")
-    
-    if not token or not SUPABASE_URL or not SUPABASE_AUTH_API_KEY:
-        return None
-
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "apikey": SUPABASE_AUTH_API_KEY
-    }
-
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(f"{SUPABASE_URL}/auth/v1/user", headers=headers)
-
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("id") or data.get("user", {}).get("id")
-
-        print(f"[SECURITY] JWT invalide (status={response.status_code})")
-    except httpx.HTTPError as exc:
-        print(f"[SECURITY] Erreur lors de la validation JWT : {exc}")
-
-    return None
-
 # Configuration
 TEXT_MODEL = os.getenv("TEXT_MODEL", "gpt-4o-mini")
 
@@ -88,6 +55,15 @@ async def generate_rhyme_endpoint(
     request: Dict[str, Any],
     req: Request,
     authorization: Optional[str] = Header(None)
+):
+    """Génère une comptine musicale (idempotent : Idempotency-Key ou requêtes identiques fusionnées)"""
+    return await idempotency.handle(req, "generate_rhyme", request, lambda: _generate_rhyme(request, req, authorization))
+
+
+async def _generate_rhyme(
+    request: Dict[str, Any],
+    req: Request,
+    authorization: Optional[str] = None
 ):
     """Génère une comptine musicale"""
     try:
@@ -132,7 +108,7 @@ async def generate_rhyme_endpoint(
             if not openai_key:
                 raise HTTPException(400, "OpenAI key missing")
             
-            client = AsyncOpenAI(api_key=openai_key)
+            client = get_async_openai(openai_key)
             
             # Étape 1 : Générer un prompt optimisé pour Suno à partir de la demande utilisateur
             prompt_optimization_request = f"""Tu es un expert en création de prompts pour Suno AI qui génère de la musique.
@@ -226,6 +202,9 @@ Réponds UNIQUEMENT avec le prompt optimisé, sans explications supplémentaires
         
         if suno_res.get("status") == "success":
             task_id = suno_res.get("task_id")
+            if task_id:
+                # Suivi de la musique via /progress/stream (un seul poller Suno par tâche)
+                progress_broker.register_task(user_id, RHYME_TASKS, task_id)
             
             # 🆕 Stocker les métadonnées d'unicité (non-bloquant)
             uniqueness_metadata = {}
@@ -281,27 +260,25 @@ Réponds UNIQUEMENT avec le prompt optimisé, sans explications supplémentaires
 @router.get("/proxy_audio")
 async def proxy_audio(url: str, filename: str = "comptine.mp3"):
     """Proxy pour télécharger l'audio depuis Suno (évite les problèmes CORS)"""
-    import httpx
     from fastapi.responses import StreamingResponse
     import io
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url)
-            response.raise_for_status()
+        response = await get_http_client("media").get(url, timeout=30.0)
+        response.raise_for_status()
 
-            # Créer un flux de données
-            data = io.BytesIO(response.content)
+        # Créer un flux de données
+        data = io.BytesIO(response.content)
 
-            # Retourner le fichier avec les bons headers
-            return StreamingResponse(
-                data,
-                media_type="audio/mpeg",
-                headers={
-                    "Content-Disposition": f"attachment; filename={filename}",
-                    "Content-Length": str(len(response.content))
-                }
-            )
+        # Retourner le fichier avec les bons headers
+        return StreamingResponse(
+            data,
+            media_type="audio/mpeg",
+            headers={
+                "Content-Disposition": f"attachment; filename={filename}",
+                "Content-Length": str(len(response.content))
+            }
+        )
     except Exception as e:
         raise HTTPException(500, f"Erreur proxy audio: {str(e)}")
 
@@ -0,0 +1,38 @@
+"""
+Webhooks des fournisseurs de génération (callbacks de fin de prédiction WaveSpeed)
+"""
+from fastapi import APIRouter, HTTPException, Request, status
+from typing import Optional
+import json
+from services.wavespeed_poller import wavespeed_poller
+
+router = APIRouter(tags=["webhooks"])
+
+
+@router.post("/webhooks/wavespeed")
+async def wavespeed_webhook(request: Request, token: Optional[str] = None):
+    """
+    Callback WaveSpeed de fin de génération d'un clip.
+    L'URL (avec ?token=WAVESPEED_WEBHOOK_SECRET) est transmise à chaque soumission
+    quand WAVESPEED_WEBHOOK_URL et WAVESPEED_WEBHOOK_SECRET sont configurés.
+    """
+    if not wavespeed_poller.webhook_enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Webhook non configuré"
+        )
+    if not wavespeed_poller.verify_token(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Jeton de webhook invalide"
+        )
+
+    try:
+        payload = await request.json()
+    except json.JSONDecodeError:
+        payload = None
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Payload JSON invalide")
+
+    # Toujours 200 : un callback inconnu ne doit pas être renvoyé en boucle par WaveSpeed
+    return {"status": wavespeed_poller.resolve(payload)}
@@ -88,6 +88,7 @@ class Scene(BaseModel):
     
     # Generation results
     video_url: Optional[str] = Field(default=None, description="URL of generated video clip")
+    prediction_id: Optional[str] = Field(default=None, description="WaveSpeed prediction ID (checkpointed for resume)")
     status: GenerationStatus = Field(default=GenerationStatus.PENDING)
     error_message: Optional[str] = Field(default=None, description="Error message if generation failed")
     retry_count: int = Field(default=0, description="Number of retry attempts")
@@ -240,6 +241,14 @@ class GenerationResult(BaseModel):
     # Output
     final_video_url: Optional[str] = Field(default=None, description="URL of final stitched video")
     video_urls: List[str] = Field(default_factory=list, description="Individual clip URLs")
+    poster_url: Optional[str] = Field(default=None, description="URL of the poster image (first frame)")
+    sprite_url: Optional[str] = Field(default=None, description="URL of the thumbnail strip for scrubbing")
+    sprite_tiles: Optional[int] = Field(default=None, description="Number of thumbnails in the strip")
+    hls_url: Optional[str] = Field(default=None, description="URL of the HLS master playlist (adaptive streaming)")
+    preview_clips: List[Dict[str, Any]] = Field(
+        default_factory=list,
+        description="Finished scene clips playable in order before the final video (scene_number, video_url, duration)"
+    )
     
     # Metadata
     script: Optional[Script] = Field(default=None, description="Generated script")
@@ -272,6 +281,10 @@ class GenerationResult(BaseModel):
             "status": self.status.value,
             "final_video_url": self.final_video_url,
             "video_urls": self.video_urls,
+            "poster_url": self.poster_url,
+            "sprite_url": self.sprite_url,
+            "sprite_tiles": self.sprite_tiles,
+            "hls_url": self.hls_url,
             "title": self.title,
             "duration": self.duration_seconds,
             "total_duration": self.duration_seconds,  # Alias pour compatibilité frontend
@@ -0,0 +1,135 @@
+"""
+Cache des rôles utilisateurs (table profiles) pour les vérifications admin.
+
+La requête Supabase est synchrone : elle est exécutée dans un thread pour ne pas
+bloquer la boucle d'événements, et son résultat est mis en cache avec un TTL court.
+Le cache est invalidé explicitement quand un rôle change (endpoint admin ou
+webhook Supabase sur la table profiles).
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from config import ADMIN_ROLE_CACHE_TTL_SECONDS, ADMIN_ROLE_CACHE_MAX_ENTRIES
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class AdminRoleCache:
+    """
+    Cache user_id -> rôle.
+
+    - Un profil absent est mis en cache (rôle None) comme un refus
+    - Les erreurs Supabase ne sont jamais mises en cache
+    - Des vérifications concurrentes pour le même utilisateur ne font qu'une requête
+    """
+
+    def __init__(self, ttl_seconds: float = 60, max_entries: int = 1000):
+        """
+        Args:
+            ttl_seconds: Durée de cache d'un rôle
+            max_entries: Nombre maximum d'utilisateurs en cache
+        """
+        self._cache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.invalidations = 0
+
+    @staticmethod
+    def _fetch_role(supabase_client, user_id: str) -> Optional[str]:
+        """Lit le rôle dans la table profiles (appel synchrone)"""
+        response = supabase_client.table('profiles').select('role').eq('id', user_id).limit(1).execute()
+        if not response.data:
+            return None
+        return response.data[0].get('role')
+
+    async def get_role(self, supabase_client, user_id: str) -> Optional[str]:
+        """
+        Retourne le rôle de l'utilisateur (None si aucun profil).
+
+        Raises:
+            Exception: erreur Supabase (non mise en cache)
+        """
+        role = self._cache.get(user_id, _MISSING)
+        if role is not _MISSING:
+            return role
+
+        task = self._inflight.get(user_id)
+        if task is None:
+            task = asyncio.create_task(asyncio.to_thread(self._fetch_role, supabase_client, user_id))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda t: self._on_fetched(user_id, t))
+
+        # shield : l'annulation d'une requête ne doit pas annuler la lecture partagée
+        return await asyncio.shield(task)
+
+    def _on_fetched(self, user_id: str, task: asyncio.Task) -> None:
+        # Invalidé pendant la lecture : le résultat est peut-être obsolète, ne pas le mettre en cache
+        stale = self._inflight.get(user_id) is not task
+        if not stale:
+            del self._inflight[user_id]
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.warning(f"Lecture du rôle impossible pour {user_id}: {task.exception()}")
+            return
+        if not stale:
+            self._cache.set(user_id, task.result())
+
+    async def is_admin(self, supabase_client, user_id: str) -> bool:
+        return await self.get_role(supabase_client, user_id) == 'admin'
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """Invalide le rôle d'un utilisateur, ou tout le cache si user_id est None"""
+        # Une lecture en cours pourrait réinsérer l'ancien rôle : l'oublier aussi
+        if user_id is None:
+            self._cache.clear()
+            self._inflight.clear()
+        else:
+            self._cache.pop(user_id)
+            self._inflight.pop(user_id, None)
+        self.invalidations += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "cache": self._cache.get_stats(),
+            "inflight": len(self._inflight),
+            "invalidations": self.invalidations
+        }
+
+
+# Instance globale partagée par main.py et routes/admin_features.py
+admin_role_cache = AdminRoleCache(
+    ttl_seconds=ADMIN_ROLE_CACHE_TTL_SECONDS,
+    max_entries=ADMIN_ROLE_CACHE_MAX_ENTRIES
+)
+
+
+def apply_profiles_webhook(payload: Dict[str, Any]) -> Optional[str]:
+    """
+    Applique un webhook Supabase (Database Webhooks) sur la table profiles.
+
+    Format attendu : {"type": "INSERT|UPDATE|DELETE", "table": "profiles",
+    "record": {...}, "old_record": {...}}
+
+    Returns:
+        Le user_id invalidé, ou None si le payload ne concerne pas un rôle
+    """
+    if payload.get("table") not in (None, "profiles"):
+        return None
+
+    record = payload.get("record") or {}
+    old_record = payload.get("old_record") or {}
+    user_id = record.get("id") or old_record.get("id")
+    if not user_id:
+        return None
+
+    event_type = (payload.get("type") or "").upper()
+    if event_type == "UPDATE" and "role" in old_record and old_record.get("role") == record.get("role"):
+        return None
+
+    admin_role_cache.invalidate(user_id)
+    return user_id
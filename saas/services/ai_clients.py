@@ -0,0 +1,162 @@
+"""
+Clients SDK partagés (OpenAI et Gemini) pour tout le processus.
+
+Chaque client SDK embarque son propre pool de connexions : en créer un par requête
+(ou par service) refait la poignée de main TLS à chaque appel et laisse des sockets
+ouverts sous charge. Les services empruntent ici un client unique par clé API,
+dont le pool est préchauffé au démarrage (lifespan FastAPI).
+"""
+
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI, OpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient
+
+logger = logging.getLogger(__name__)
+
+# Limites du pool de connexions vers api.openai.com
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "600"))
+AI_CLIENTS_WARMUP = os.getenv("AI_CLIENTS_WARMUP", "true").lower() == "true"
+
+
+def _openai_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=60.0
+    )
+
+
+class AIClientRegistry:
+    """Registre des clients OpenAI (async et sync) et Gemini, un par clé API"""
+
+    def __init__(self):
+        self._async_openai: Dict[str, AsyncOpenAI] = {}
+        self._openai: Dict[str, OpenAI] = {}
+        self._gemini: Dict[str, Any] = {}
+        # Les clients sync peuvent être demandés depuis des threads (run_in_executor)
+        self._lock = threading.Lock()
+        self.warmed_up = False
+        self.warmup_error: Optional[str] = None
+
+    @staticmethod
+    def _resolve_key(api_key: Optional[str], env_var: str) -> str:
+        key = api_key or os.getenv(env_var)
+        if not key:
+            raise ValueError(f"{env_var} manquante dans les variables d'environnement")
+        return key
+
+    def get_async_openai(self, api_key: Optional[str] = None) -> AsyncOpenAI:
+        """Client AsyncOpenAI partagé (clé par défaut: OPENAI_API_KEY)"""
+        key = self._resolve_key(api_key, "OPENAI_API_KEY")
+        client = self._async_openai.get(key)
+        if client is None:
+            with self._lock:
+                client = self._async_openai.get(key)
+                if client is None:
+                    client = AsyncOpenAI(
+                        api_key=key,
+                        timeout=OPENAI_TIMEOUT_SECONDS,
+                        http_client=DefaultAsyncHttpxClient(limits=_openai_limits())
+                    )
+                    self._async_openai[key] = client
+        return client
+
+    def get_openai(self, api_key: Optional[str] = None) -> OpenAI:
+        """Client OpenAI synchrone partagé (TTS/STT exécutés dans des threads)"""
+        key = self._resolve_key(api_key, "OPENAI_API_KEY")
+        client = self._openai.get(key)
+        if client is None:
+            with self._lock:
+                client = self._openai.get(key)
+                if client is None:
+                    client = OpenAI(
+                        api_key=key,
+                        timeout=OPENAI_TIMEOUT_SECONDS,
+                        http_client=DefaultHttpxClient(limits=_openai_limits())
+                    )
+                    self._openai[key] = client
+        return client
+
+    def get_gemini(self, api_key: Optional[str] = None):
+        """Client Gemini (google-genai) partagé (clé par défaut: GEMINI_API_KEY)"""
+        key = self._resolve_key(api_key, "GEMINI_API_KEY")
+        client = self._gemini.get(key)
+        if client is None:
+            with self._lock:
+                client = self._gemini.get(key)
+                if client is None:
+                    from google import genai
+                    client = genai.Client(api_key=key)
+                    self._gemini[key] = client
+        return client
+
+    async def warmup(self) -> None:
+        """
+        Ouvre une connexion vers OpenAI avant la première requête utilisateur
+        (requête légère sur /models). Les erreurs sont ignorées : le pool se
+        remplira à la première utilisation.
+        """
+        if not AI_CLIENTS_WARMUP or not os.getenv("OPENAI_API_KEY"):
+            return
+        try:
+            await self.get_async_openai().models.list()
+            self.warmed_up = True
+            logger.info("Pool OpenAI préchauffé")
+        except Exception as exc:
+            self.warmup_error = str(exc)
+            logger.warning(f"Préchauffage du pool OpenAI impossible: {exc}")
+
+        if os.getenv("GEMINI_API_KEY"):
+            try:
+                self.get_gemini()
+            except Exception as exc:
+                logger.warning(f"Initialisation du client Gemini impossible: {exc}")
+
+    async def aclose(self) -> None:
+        """Ferme les pools de connexions (appelé à l'arrêt de l'application)"""
+        for client in list(self._async_openai.values()):
+            try:
+                await client.close()
+            except Exception as exc:
+                logger.warning(f"Fermeture du client AsyncOpenAI impossible: {exc}")
+        for client in list(self._openai.values()):
+            try:
+                client.close()
+            except Exception as exc:
+                logger.warning(f"Fermeture du client OpenAI impossible: {exc}")
+        self._async_openai.clear()
+        self._openai.clear()
+        self._gemini.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "async_openai_clients": len(self._async_openai),
+            "openai_clients": len(self._openai),
+            "gemini_clients": len(self._gemini),
+            "max_connections": OPENAI_MAX_CONNECTIONS,
+            "max_keepalive_connections": OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            "warmed_up": self.warmed_up,
+            "warmup_error": self.warmup_error
+        }
+
+
+# Instance globale
+ai_clients = AIClientRegistry()
+
+
+def get_async_openai(api_key: Optional[str] = None) -> AsyncOpenAI:
+    return ai_clients.get_async_openai(api_key)
+
+
+def get_openai(api_key: Optional[str] = None) -> OpenAI:
+    return ai_clients.get_openai(api_key)
+
+
+def get_gemini_client(api_key: Optional[str] = None):
+    return ai_clients.get_gemini(api_key)
@@ -5,7 +5,7 @@ This module implements a production-grade cartoon generation pipeline following
 the "Seedance-style" workflow:
 1. Ideation: Generate cohesive script with consistent characters (Series Bible)
 2. Production: Parallel generation of video clips using Wan 2.5
-3. Post-Production: Intelligent stitching of clips with FAL AI FFmpeg
+3. Post-Production: Stitching of clips with local ffmpeg (stream-copy concat + loudnorm)
 
 Author: Herbbie Team
 Version: 1.0.0
@@ -13,14 +13,14 @@ Stack: Python 3.11, FastAPI, Supabase, WaveSpeed API
 """
 
 import asyncio
+import aiofiles
 import httpx
 import json
 import logging
 import os
 import uuid
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from typing import Callable, List, Dict, Any, Optional, Tuple
 
 # Import schemas
 import sys
@@ -33,6 +33,21 @@ from schemas.cartoon import (
 
 # Import uniqueness service to avoid duplicates
 from services.uniqueness_service import uniqueness_service
+from services.http_clients import get_http_client
+from services.ai_clients import get_async_openai
+from services.pipeline_checkpoints import PipelineCheckpoints, pipeline_checkpoints, scene_field
+from services.wavespeed_poller import wavespeed_poller
+from services.clip_scheduler import FairClipScheduler
+from services.clip_retry import ClipGenerationError, ClipRetryPolicy, clip_retry_policy
+from services.ffmpeg_tools import SPRITE_TILES, concat_clips, package_hls
+from services.encode_scheduler import encode_scheduler
+from services.job_queue import JobCancelled
+from utils.rate_limiter import AsyncTokenBucket
+from config import (
+    WAN25_MAX_OUTSTANDING_PREDICTIONS, WAN25_SUBMIT_RATE_PER_SECOND, WAN25_SUBMIT_BURST,
+    WAN25_FAVOR_NEAR_COMPLETION, WAN25_DOWNLOAD_CONCURRENCY,
+    ANIMATION_HLS_ENABLED, ANIMATION_HLS_SEGMENT_SECONDS
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -52,7 +67,9 @@ class WanVideoOrchestrator:
         wavespeed_api_key: WaveSpeed API key
         openai_api_key: OpenAI API key for script generation
         fal_api_key: FAL AI API key for video stitching
-        max_concurrent_clips: Maximum concurrent clip generation (semaphore limit)
+        max_concurrent_clips: Maximum outstanding WaveSpeed predictions, shared fairly across pipelines
+        clip_scheduler: Fair-share scheduler handing out prediction slots to concurrent pipelines
+        submit_limiter: Token bucket bounding the WaveSpeed submission rate
         clip_duration: Duration per clip in seconds (always 10s with Wan 2.5 Standard)
     """
     
@@ -61,6 +78,10 @@ class WanVideoOrchestrator:
     # Modèle standard uniquement - supporte 10 secondes par clip
     WAN25_ENDPOINT = "/alibaba/wan-2.5/text-to-video"
     FAL_FFMPEG_URL = "https://queue.fal.run/fal-ai/ffmpeg-api/compose"
+    DOWNLOAD_CHUNK_SIZE = 256 * 1024
+    # Optional remote cancellation endpoint, e.g. ".../predictions/{prediction_id}/cancel".
+    # When unset, cancelled predictions are simply no longer polled.
+    WAVESPEED_CANCEL_URL_TEMPLATE = os.getenv("WAVESPEED_CANCEL_URL_TEMPLATE")
     
     # Default settings optimized for Disney/Pixar quality animation
     DEFAULT_NEGATIVE_PROMPT = "nsfw, distorted, morphing, text, watermark, scary, horror, violence, blood, dark, creepy, blurry, low quality, bad anatomy, deformed, ugly, amateur, inconsistent style, different art style, changing appearance, jump cut, abrupt transition"
@@ -73,7 +94,15 @@ class WanVideoOrchestrator:
         fal_api_key: Optional[str] = None,
         supabase_client: Optional[Any] = None,
         max_concurrent_clips: int = 5,
-        clip_duration: int = 10  # Toujours 10s avec Wan 2.5 Standard
+        clip_duration: int = 10,  # Toujours 10s avec Wan 2.5 Standard
+        checkpoints: Optional[PipelineCheckpoints] = None,
+        submit_rate_per_second: float = 2.0,
+        submit_burst: int = 5,
+        favor_near_completion: bool = True,
+        retry_policy: Optional[ClipRetryPolicy] = None,
+        download_concurrency: int = 4,
+        hls_enabled: bool = False,
+        hls_segment_seconds: float = 4.0
     ):
         """
         Initialize the WanVideoOrchestrator.
@@ -83,8 +112,16 @@ class WanVideoOrchestrator:
             openai_api_key: OpenAI API key (or from env OPENAI_API_KEY)
             fal_api_key: FAL AI API key (or from env FAL_API_KEY)
             supabase_client: Supabase client for database updates
-            max_concurrent_clips: Max concurrent video generations (default: 5)
+            max_concurrent_clips: Max outstanding WaveSpeed predictions, submitted or being generated (default: 5)
             clip_duration: Duration per clip in seconds (always 10s with Wan 2.5 Standard)
+            checkpoints: Optional checkpoint store used to resume interrupted pipelines
+            submit_rate_per_second: Max WaveSpeed submissions per second (<= 0: unlimited)
+            submit_burst: Submissions allowed in a burst before the rate applies
+            favor_near_completion: Give freed slots to the pipeline with the fewest clips left on ties
+            retry_policy: Per-scene retry policy (attempts, backoff, retryable errors)
+            download_concurrency: Max clips downloaded at once (shared by all pipelines)
+            hls_enabled: Package the assembled video as adaptive HLS (1080p/720p/480p ladder)
+            hls_segment_seconds: HLS segment duration
         """
         # Load API keys from environment or parameters
         self.wavespeed_api_key = wavespeed_api_key or os.getenv("WAVESPEED_API_KEY")
@@ -95,7 +132,16 @@ class WanVideoOrchestrator:
         # Configuration
         self.max_concurrent_clips = max_concurrent_clips
         self.clip_duration = clip_duration  # Toujours 10s par scène avec Wan 2.5 Standard
-        self.semaphore = asyncio.Semaphore(max_concurrent_clips)
+        # One slot per outstanding prediction, held until its clip is done (provider-side quota).
+        # Slots rotate across concurrent pipelines so a long animation cannot starve a short one.
+        # Submitting is only rate limited, so every scene of an animation can be in flight at once.
+        self.clip_scheduler = FairClipScheduler(max_concurrent_clips, favor_near_completion=favor_near_completion)
+        self.submit_limiter = AsyncTokenBucket(rate=submit_rate_per_second, burst=submit_burst)
+        self.checkpoints = checkpoints
+        self.retry_policy = retry_policy or ClipRetryPolicy()
+        self.download_semaphore = asyncio.Semaphore(max(1, download_concurrency))
+        self.hls_enabled = hls_enabled
+        self.hls_segment_seconds = hls_segment_seconds
         
         # Text model for script generation
         self.text_model = os.getenv("TEXT_MODEL", "gpt-4o-mini")
@@ -103,7 +149,10 @@ class WanVideoOrchestrator:
         # Validate required API keys
         self._validate_config()
         
-        logger.info(f"✅ WanVideoOrchestrator initialized - Max concurrent: {max_concurrent_clips}, Clip duration: {clip_duration}s")
+        logger.info(
+            f"✅ WanVideoOrchestrator initialized - Max outstanding predictions: {max_concurrent_clips}, "
+            f"Submit rate: {submit_rate_per_second}/s, Clip duration: {clip_duration}s"
+        )
     
     def _validate_config(self) -> None:
         """Validate that all required API keys are configured."""
@@ -136,8 +185,7 @@ class WanVideoOrchestrator:
             Tuple of (is_safe, reason_if_flagged)
         """
         try:
-            import openai
-            client = openai.AsyncOpenAI(api_key=self.openai_api_key)
+            client = get_async_openai(self.openai_api_key)
             
             response = await client.moderations.create(input=text)
             result = response.results[0]
@@ -209,8 +257,7 @@ class WanVideoOrchestrator:
         
         # Step 3: Generate Character Sheet and Script via OpenAI
         try:
-            import openai
-            client = openai.AsyncOpenAI(api_key=self.openai_api_key)
+            client = get_async_openai(self.openai_api_key)
             
             # System prompt for Series Bible approach
             system_prompt = self._build_script_system_prompt(num_scenes, style)
@@ -613,34 +660,41 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
     # PRODUCTION - Video Clip Generation with Wan 2.5
     # =========================================================================
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=2, min=4, max=60),
-        retry=retry_if_exception_type((httpx.HTTPError, asyncio.TimeoutError))
-    )
     async def generate_clip_task(
         self,
         scene: Scene,
         character_sheet: Optional[CharacterSheet] = None,
         aspect_ratio: str = "16:9",
-        resolution: str = "720p"
+        resolution: str = "720p",
+        checkpoint_id: Optional[str] = None,
+        pipeline_id: Optional[str] = None
     ) -> Scene:
         """
-        Generate a single video clip using WaveSpeed Wan 2.5 API.
+        Generate a single video clip using WaveSpeed Wan 2.5 API (single attempt).
         
-        Decorated with @retry for exponential backoff on failures.
-        Uses semaphore to limit concurrent requests.
+        Retries are handled per scene by generate_all_clips according to the
+        retry policy, outside of any prediction slot.
+        Holds an outstanding-prediction slot from submission until the clip is ready;
+        the submission itself goes through the submission rate limiter.
+        If the scene already has a prediction_id (restored from a checkpoint),
+        the existing prediction is polled instead of submitting a new one.
         
         Args:
             scene: Scene object with prompt
             character_sheet: Optional character sheet for consistency
             aspect_ratio: Video aspect ratio (default: 16:9 for horizontal)
             resolution: Video resolution (default: 720p)
+            checkpoint_id: Pipeline checkpoint to record the prediction ID and video URL in
+            pipeline_id: Pipeline the clip belongs to (fair share of prediction slots)
             
         Returns:
             Updated Scene object with video_url
         """
-        async with self.semaphore:
+        async with self.clip_scheduler.slot(pipeline_id or checkpoint_id or "default"):
+            if scene.prediction_id:
+                logger.info(f"♻️ Resuming Scene {scene.scene_number}: polling existing prediction {scene.prediction_id}")
+                return await self._complete_clip(scene, scene.prediction_id, checkpoint_id)
+
             logger.info(f"🎬 Generating clip for Scene {scene.scene_number}: {scene.visual_description[:50]}...")
             
             try:
@@ -687,34 +741,36 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
                 logger.info(f"📡 POST {api_url} [Wan 2.5 Standard - 10s]")
                 logger.info(f"📦 Payload: size={size}, duration=10s")
                 
-                # Make the request
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    response = await client.post(api_url, json=payload, headers=headers)
+                # Webhook mode: WaveSpeed calls us back when the clip is ready
+                webhook_url = wavespeed_poller.callback_url()
+                params = {"webhook": webhook_url} if webhook_url else None
+                
+                # Make the request (rate limited: WaveSpeed queues the work server-side)
+                await self.submit_limiter.acquire()
+                client = get_http_client("wavespeed")
+                response = await client.post(api_url, json=payload, headers=headers, params=params)
                     
-                    if response.status_code != 200:
-                        error_text = response.text
-                        logger.error(f"❌ WaveSpeed API error ({response.status_code}): {error_text}")
-                        raise httpx.HTTPError(f"WaveSpeed API error: {response.status_code} - {error_text}")
+                if response.status_code != 200:
+                    error_text = response.text
+                    logger.error(f"❌ WaveSpeed API error ({response.status_code}): {error_text}")
+                    raise ClipGenerationError(
+                        f"WaveSpeed API error: {response.status_code} - {error_text}",
+                        status_code=response.status_code
+                    )
                     
-                    result = response.json()
-                    logger.info(f"📨 WaveSpeed response: {result}")
+                result = response.json()
+                logger.info(f"📨 WaveSpeed response: {result}")
                     
-                    prediction_id = result.get("data", {}).get("id") or result.get("id")
+                prediction_id = result.get("data", {}).get("id") or result.get("id")
                     
-                    if not prediction_id:
-                        raise ValueError(f"No prediction ID in response: {result}")
+                if not prediction_id:
+                    raise ValueError(f"No prediction ID in response: {result}")
                     
-                    logger.info(f"✅ Prediction created: {prediction_id}")
-                
-                # Wait for the video to be generated
-                video_url = await self._wait_for_wavespeed_result(prediction_id)
+                logger.info(f"✅ Prediction created: {prediction_id}")
                 
-                # Update scene
-                scene.video_url = video_url
-                scene.status = GenerationStatus.COMPLETED
-                
-                logger.info(f"✅ Scene {scene.scene_number} completed: {video_url[:50]}...")
-                return scene
+                # Checkpoint the prediction before waiting: a restart resumes polling it
+                scene.prediction_id = prediction_id
+                await self._checkpoint_scene(checkpoint_id, scene)
                 
             except Exception as e:
                 logger.error(f"❌ Failed to generate Scene {scene.scene_number}: {e}")
@@ -722,20 +778,46 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
                 scene.error_message = str(e)
                 scene.retry_count += 1
                 raise
+            
+            return await self._complete_clip(scene, prediction_id, checkpoint_id)
+    
+    async def _complete_clip(self, scene: Scene, prediction_id: str, checkpoint_id: Optional[str]) -> Scene:
+        """Wait for a submitted prediction and record the resulting video URL."""
+        try:
+            # Wait for the video to be generated
+            video_url = await self._wait_for_wavespeed_result(prediction_id)
+        except Exception as e:
+            logger.error(f"❌ Failed to generate Scene {scene.scene_number}: {e}")
+            scene.status = GenerationStatus.FAILED
+            scene.error_message = str(e)
+            scene.retry_count += 1
+            # The prediction is unusable: the next attempt submits a new one
+            scene.prediction_id = None
+            await self._checkpoint_scene(checkpoint_id, scene)
+            raise
+        
+        # Update scene
+        scene.video_url = video_url
+        scene.status = GenerationStatus.COMPLETED
+        await self._checkpoint_scene(checkpoint_id, scene)
+        
+        logger.info(f"✅ Scene {scene.scene_number} completed: {video_url[:50]}...")
+        return scene
     
     async def _wait_for_wavespeed_result(
         self,
         prediction_id: str,
-        max_wait: int = 600,  # 10 minutes max for standard model (10s clips take longer)
-        poll_interval: int = 8
+        max_wait: int = 600  # 10 minutes max for standard model (10s clips take longer)
     ) -> str:
         """
-        Poll WaveSpeed API until video generation is complete.
+        Wait until WaveSpeed video generation is complete.
+        
+        Polling is delegated to the shared poller, which tracks the predictions of
+        all pipelines and adapts its interval to the expected completion time.
         
         Args:
             prediction_id: WaveSpeed prediction ID
             max_wait: Maximum wait time in seconds (600s for standard 10s model)
-            poll_interval: Polling interval in seconds
             
         Returns:
             Video URL
@@ -745,110 +827,122 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
             "Authorization": f"Bearer {self.wavespeed_api_key}",
             "Content-Type": "application/json"
         }
-        
-        start_time = asyncio.get_event_loop().time()
-        attempt = 0
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            while asyncio.get_event_loop().time() - start_time < max_wait:
-                attempt += 1
-                
-                try:
-                    response = await client.get(result_url, headers=headers)
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        status = result.get("status") or result.get("data", {}).get("status")
-                        
-                        if status in ["completed", "COMPLETED", "succeeded", "SUCCEEDED"]:
-                            # Get video URL from response
-                            video_url = (
-                                result.get("data", {}).get("outputs", [None])[0] or
-                                result.get("output", {}).get("video_url") or
-                                result.get("video_url") or
-                                result.get("data", {}).get("video_url")
-                            )
-                            
-                            if video_url:
-                                return video_url
-                            else:
-                                logger.warning(f"⚠️ No video URL in completed result: {result}")
-                        
-                        elif status in ["failed", "FAILED", "error", "ERROR"]:
-                            error = result.get("error") or result.get("data", {}).get("error", "Unknown error")
-                            raise Exception(f"WaveSpeed generation failed: {error}")
-                        
-                        else:
-                            progress = result.get("progress") or result.get("data", {}).get("progress", 0)
-                            logger.info(f"⏳ Waiting for WaveSpeed (attempt {attempt}): status={status}, progress={progress}%")
-                    
-                    elif response.status_code == 202:
-                        # Still processing
-                        logger.info(f"⏳ WaveSpeed still processing (attempt {attempt})...")
-                    
-                    else:
-                        logger.warning(f"⚠️ Unexpected status code: {response.status_code}")
-                
-                except httpx.HTTPError as e:
-                    logger.warning(f"⚠️ HTTP error during polling: {e}")
-                
-                await asyncio.sleep(poll_interval)
-        
-        raise TimeoutError(f"WaveSpeed generation timed out after {max_wait}s")
+        return await wavespeed_poller.wait(prediction_id, result_url, headers, max_wait=max_wait)
     
     async def generate_all_clips(
         self,
         script: Script,
         aspect_ratio: str = "16:9",
         resolution: str = "720p",
-        on_progress: Optional[callable] = None
+        on_progress: Optional[callable] = None,
+        checkpoint_id: Optional[str] = None,
+        on_clip_ready: Optional[Callable[[Scene], None]] = None
     ) -> List[Scene]:
         """
         Generate all video clips in parallel with rate limiting.
         
-        Uses asyncio.gather with semaphore to limit concurrent requests.
+        Uses asyncio.gather; concurrency is bounded by the outstanding-prediction
+        limit and the submission rate, not by the number of scenes.
+        Scenes that fail with a retryable error are regenerated in targeted passes
+        (only the failed scenes, with exponential backoff) up to the retry policy's
+        max attempts; completed clips are handed to on_clip_ready as soon as they
+        are ready, so their download can start during the regeneration passes.
         Implements graceful degradation: if <20% fail, continue with successful clips.
+        Scenes restored from a checkpoint with a video_url are not generated again.
         
         Args:
             script: Script with scenes to generate
             aspect_ratio: Video aspect ratio (16:9 or 9:16)
             resolution: Video resolution (720p or 1080p)
             on_progress: Optional callback for progress updates
+            checkpoint_id: Pipeline checkpoint to record each scene in
+            on_clip_ready: Optional callback invoked with each completed scene
             
         Returns:
             List of updated Scene objects
         """
         logger.info(f"🎬 Starting parallel generation of {len(script.scenes)} clips...")
+        # Fair-share key: all clips of this run compete together for prediction slots
+        pipeline_id = checkpoint_id or uuid.uuid4().hex
+        completed: Dict[int, Scene] = {}
         
-        # Create tasks for all scenes
-        tasks = [
-            self.generate_clip_task(
-                scene=scene,
-                character_sheet=script.main_character,
-                aspect_ratio=aspect_ratio,
-                resolution=resolution
-            )
-            for scene in script.scenes
-        ]
+        async def produce_clip(scene: Scene) -> Scene:
+            if scene.video_url:
+                logger.info(f"♻️ Scene {scene.scene_number} restored from checkpoint")
+            else:
+                scene = await self.generate_clip_task(
+                    scene=scene,
+                    character_sheet=script.main_character,
+                    aspect_ratio=aspect_ratio,
+                    resolution=resolution,
+                    checkpoint_id=checkpoint_id,
+                    pipeline_id=pipeline_id
+                )
+            completed[scene.scene_number] = scene
+            if on_clip_ready:
+                on_clip_ready(scene)
+            if on_progress:
+                progress = int((len(completed) / len(script.scenes)) * 100)
+                await on_progress(progress, f"Generated clip {len(completed)}/{len(script.scenes)}")
+            return scene
+        
+        async def produce_or_stop(scene: Scene) -> Scene:
+            try:
+                return await produce_clip(scene)
+            except JobCancelled:
+                # Cancelled from another worker: stop submitting the other scenes now
+                for task in tasks:
+                    if task is not asyncio.current_task():
+                        task.cancel()
+                raise
         
-        # Run all tasks with error handling
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        pending = list(script.scenes)
+        failures: Dict[int, Exception] = {}
+        attempt = 1
+        while True:
+            tasks = [asyncio.create_task(produce_or_stop(scene)) for scene in pending]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            # Cancellation is never a scene failure: it ends the whole generation
+            for result in results:
+                if isinstance(result, JobCancelled):
+                    raise result
+            for result in results:
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+            
+            retryable = []
+            for scene, result in zip(pending, results):
+                if isinstance(result, Exception):
+                    failures[scene.scene_number] = result
+                    if attempt < self.retry_policy.max_attempts and self.retry_policy.is_retryable(result):
+                        retryable.append(scene)
+                else:
+                    failures.pop(scene.scene_number, None)
+            
+            if not retryable:
+                break
+            
+            delay = self.retry_policy.delay(attempt)
+            attempt += 1
+            logger.warning(
+                f"🔁 Regenerating {len(retryable)} failed scene(s) "
+                f"(attempt {attempt}/{self.retry_policy.max_attempts}) in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+            for scene in retryable:
+                scene.status = GenerationStatus.PENDING
+                scene.error_message = None
+            pending = retryable
         
         # Process results
-        successful_scenes = []
-        failed_count = 0
-        
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                logger.error(f"❌ Scene {i+1} failed: {result}")
-                script.scenes[i].status = GenerationStatus.FAILED
-                script.scenes[i].error_message = str(result)
-                failed_count += 1
-            else:
-                successful_scenes.append(result)
-                if on_progress:
-                    progress = int((len(successful_scenes) / len(script.scenes)) * 100)
-                    await on_progress(progress, f"Generated clip {len(successful_scenes)}/{len(script.scenes)}")
+        for scene in script.scenes:
+            error = failures.get(scene.scene_number)
+            if error is not None:
+                logger.error(f"❌ Scene {scene.scene_number} failed: {error}")
+                scene.status = GenerationStatus.FAILED
+                scene.error_message = str(error)
+        successful_scenes = [completed[scene.scene_number] for scene in script.scenes if scene.scene_number in completed]
+        failed_count = len(failures)
         
         # Check failure threshold (>20% = abort)
         failure_rate = failed_count / len(script.scenes)
@@ -870,99 +964,92 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
         self,
         video_urls: List[str],
         output_format: str = "mp4",
-        normalize_audio: bool = True
+        normalize_audio: bool = True,
+        work_dir: Optional[str] = None,
+        downloads: Optional[Dict[str, "asyncio.Task[Optional[str]]"]] = None,
+        on_progress: Optional[Callable[[float], Any]] = None,
+        job_id: Optional[str] = None,
+        on_queued: Optional[Callable[[float], Any]] = None
     ) -> Tuple[str, List[str]]:
         """
-        Télécharge et assemble les clips vidéo en une seule vidéo avec moviepy.
+        Télécharge et assemble les clips vidéo en une seule vidéo avec ffmpeg.
         
         Args:
             video_urls: List of video clip URLs from WaveSpeed
             output_format: Output format (mp4)
             normalize_audio: Whether to normalize audio loudness
+            work_dir: Working directory (created here when not given)
+            downloads: Downloads already started per URL (task returning the local path or None)
+            on_progress: Optional async callback with the assembled fraction (0 to 1)
+            job_id: Encode job id (expected finish time via encode_scheduler.eta)
+            on_queued: Optional async callback with the expected finish time (seconds)
+                when the encode has to wait for free cores
             
         Returns:
             Tuple of (path to assembled video file, list of temp clip paths for cleanup)
         """
         import tempfile
-        import httpx
         
         logger.info(f"🎬 Assemblage de {len(video_urls)} clips vidéo...")
         
         if not video_urls:
             raise ValueError("No video URLs to stitch")
         
-        temp_dir = tempfile.mkdtemp(prefix="cartoon_")
+        temp_dir = work_dir or tempfile.mkdtemp(prefix="cartoon_")
         temp_clips = []
         
         try:
-            # Step 1: Download all clips
+            # Step 1: Download all clips in parallel, reusing downloads started as each scene completed
             logger.info(f"📥 Téléchargement de {len(video_urls)} clips...")
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                for idx, url in enumerate(video_urls):
-                    logger.info(f"📥 Téléchargement clip {idx + 1}/{len(video_urls)}...")
-                    response = await client.get(url)
-                    
-                    if response.status_code != 200:
-                        logger.warning(f"⚠️ Échec téléchargement clip {idx + 1}: HTTP {response.status_code}")
-                        continue
-                    
-                    clip_path = os.path.join(temp_dir, f"clip_{idx:03d}.mp4")
-                    with open(clip_path, 'wb') as f:
-                        f.write(response.content)
-                    temp_clips.append(clip_path)
-                    logger.info(f"✅ Clip {idx + 1} téléchargé: {len(response.content) / 1024:.1f} KB")
+            started = []
+            clip_downloads = []
+            for idx, url in enumerate(video_urls):
+                download = (downloads or {}).get(url)
+                if download is None:
+                    download = asyncio.create_task(self._download_clip(url, os.path.join(temp_dir, f"clip_{idx:03d}.mp4")))
+                    started.append(download)
+                clip_downloads.append(download)
+            try:
+                clip_paths = await asyncio.gather(*clip_downloads)
+            except BaseException:
+                for download in started:
+                    download.cancel()
+                raise
+            temp_clips = [clip_path for clip_path in clip_paths if clip_path]
             
             if len(temp_clips) == 0:
                 raise ValueError("Aucun clip n'a pu être téléchargé")
             
-            if len(temp_clips) == 1:
+            if len(temp_clips) == 1 and not normalize_audio:
                 logger.info("✅ Un seul clip, pas d'assemblage nécessaire")
                 return temp_clips[0], temp_clips
             
-            # Step 2: Concatenate with moviepy
-            logger.info(f"🔧 Assemblage de {len(temp_clips)} clips avec moviepy...")
-            
-            from moviepy.editor import VideoFileClip, concatenate_videoclips
-            
-            # Load all clips
-            clips = []
-            for clip_path in temp_clips:
-                try:
-                    clip = VideoFileClip(clip_path)
-                    clips.append(clip)
-                except Exception as e:
-                    logger.warning(f"⚠️ Erreur chargement clip {clip_path}: {e}")
-            
-            if len(clips) == 0:
-                raise ValueError("Aucun clip n'a pu être chargé pour l'assemblage")
+            # Step 2: Concatenate with ffmpeg (stream copy when the clips share their parameters,
+            # loudness normalization in the same pass), within the instance CPU budget
+            logger.info(f"🔧 Assemblage de {len(temp_clips)} clips avec ffmpeg...")
+            output_path = os.path.join(temp_dir, f"animation_complete.{output_format}")
+            poster_path, sprite_path = self._preview_paths(output_path)
+            encode_job_id = job_id or uuid.uuid4().hex
             
-            # Concatenate all clips
-            final_clip = concatenate_videoclips(clips, method="compose")
+            def encode_slot(reencode: bool, media_seconds: float):
+                return encode_scheduler.slot(encode_job_id, reencode, media_seconds, on_queued=on_queued)
             
-            # Export final video
-            output_path = os.path.join(temp_dir, f"animation_complete.{output_format}")
-            logger.info(f"📼 Export de la vidéo finale ({final_clip.duration:.1f}s)...")
-            
-            final_clip.write_videofile(
-                output_path,
-                codec='libx264',
-                audio_codec='aac',
-                fps=24,
-                preset='medium',
-                threads=4,
-                logger=None  # Disable moviepy's verbose logging
+            await concat_clips(
+                temp_clips, output_path, normalize_audio=normalize_audio,
+                on_progress=on_progress, encode_slot=encode_slot,
+                poster_path=poster_path, sprite_path=sprite_path
             )
             
-            # Close all clips to free memory
-            for clip in clips:
-                clip.close()
-            final_clip.close()
-            
             logger.info(f"✅ Vidéo assemblée: {output_path}")
             logger.info(f"📺 Durée totale: {len(temp_clips) * self.clip_duration}s")
             
             return output_path, temp_clips
             
+        except asyncio.CancelledError:
+            # Pipeline cancelled: do not leave downloaded clips behind
+            import shutil
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
         except Exception as e:
             logger.error(f"❌ Erreur assemblage vidéo: {e}")
             import traceback
@@ -1004,31 +1091,31 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
         
         start_time = asyncio.get_event_loop().time()
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            while asyncio.get_event_loop().time() - start_time < max_wait:
-                try:
-                    response = await client.get(result_url, headers=headers)
+        client = get_http_client("default")
+        while asyncio.get_event_loop().time() - start_time < max_wait:
+            try:
+                response = await client.get(result_url, headers=headers)
                     
-                    if response.status_code == 200:
-                        result = response.json()
-                        status = result.get("status", "").upper()
+                if response.status_code == 200:
+                    result = response.json()
+                    status = result.get("status", "").upper()
                         
-                        if status in ["COMPLETED", "SUCCEEDED"]:
-                            video_url = result.get("video_url") or result.get("output_url")
-                            if video_url:
-                                return video_url
+                    if status in ["COMPLETED", "SUCCEEDED"]:
+                        video_url = result.get("video_url") or result.get("output_url")
+                        if video_url:
+                            return video_url
                         
-                        elif status in ["FAILED", "ERROR"]:
-                            error = result.get("error", "Unknown error")
-                            raise Exception(f"FAL stitching failed: {error}")
+                    elif status in ["FAILED", "ERROR"]:
+                        error = result.get("error", "Unknown error")
+                        raise Exception(f"FAL stitching failed: {error}")
                         
-                        else:
-                            logger.info(f"⏳ FAL stitching in progress: {status}")
+                    else:
+                        logger.info(f"⏳ FAL stitching in progress: {status}")
                     
-                except httpx.HTTPError as e:
-                    logger.warning(f"⚠️ HTTP error during FAL polling: {e}")
+            except httpx.HTTPError as e:
+                logger.warning(f"⚠️ HTTP error during FAL polling: {e}")
                 
-                await asyncio.sleep(poll_interval)
+            await asyncio.sleep(poll_interval)
         
         raise TimeoutError(f"FAL stitching timed out after {max_wait}s")
     
@@ -1039,7 +1126,9 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
     async def run_pipeline(
         self,
         request: GenerationRequest,
-        on_progress: Optional[callable] = None
+        on_progress: Optional[callable] = None,
+        checkpoint_id: Optional[str] = None,
+        on_preview: Optional[Callable[[List[Dict[str, Any]]], Any]] = None
     ) -> GenerationResult:
         """
         Run the complete cartoon generation pipeline.
@@ -1051,18 +1140,36 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
         4. Stitch clips into final video
         5. Update Supabase with results
         
+        When a checkpoint_id is given, each step is checkpointed (script, scene
+        prediction IDs and video URLs, stitched file, final URL). Running the
+        pipeline again with the same checkpoint_id after an interruption resumes
+        from the last completed step instead of starting over.
+        
+        Finished scene clips are published (result.preview_clips, on_preview)
+        as soon as they extend the run of consecutive ready scenes, so playback
+        can start with scene 1 while later scenes are still rendering.
+        
         Args:
             request: GenerationRequest with user parameters
             on_progress: Optional callback for progress updates
+            checkpoint_id: Optional checkpoint identifier (the API task ID)
+            on_preview: Optional async callback with the playable scene clips, in scene order
             
         Returns:
             GenerationResult with final video URL and metadata
         """
-        task_id = str(uuid.uuid4())
+        checkpoint = None
+        if checkpoint_id and self.checkpoints:
+            checkpoint = await self.checkpoints.load(checkpoint_id)
+        
+        task_id = (checkpoint or {}).get("pipeline_task_id") or str(uuid.uuid4())
         started_at = datetime.now()
         
+        if checkpoint_id and self.checkpoints and checkpoint is None:
+            await self.checkpoints.start(checkpoint_id, pipeline_task_id=task_id)
+        
         logger.info(f"\n{'='*80}")
-        logger.info(f"🚀 STARTING CARTOON GENERATION PIPELINE")
+        logger.info(f"🚀 {'RESUMING' if checkpoint else 'STARTING'} CARTOON GENERATION PIPELINE")
         logger.info(f"Task ID: {task_id}")
         logger.info(f"User: {request.user_id}")
         logger.info(f"Theme: {request.theme}")
@@ -1079,39 +1186,49 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
             started_at=started_at
         )
         
+        work_dir: Optional[str] = None
+        downloads: Dict[str, asyncio.Task] = {}
+        
         try:
-            # Step 1: Update status to moderating
-            result.status = GenerationStatus.MODERATING
-            await self._update_progress(result, 5, "Vérification du contenu...", on_progress)
+            script = self._restore_script(checkpoint)
             
-            # Step 1.5: Get user history to avoid duplicates
-            user_history = []
-            if request.user_id and self.supabase:
-                try:
-                    user_history = await uniqueness_service.get_user_history(
-                        self.supabase,
-                        request.user_id,
-                        "animation",
-                        theme=request.theme,
-                        limit=5
-                    )
-                    if user_history:
-                        logger.info(f"📜 Found {len(user_history)} previous animations for user on theme '{request.theme}'")
-                except Exception as e:
-                    logger.warning(f"⚠️ Could not fetch user history: {e}")
-            
-            # Step 2: Generate script
-            result.status = GenerationStatus.GENERATING_SCRIPT
-            await self._update_progress(result, 10, "Création du scénario...", on_progress)
-            
-            script = await self.generate_script(
-                theme=request.theme,
-                duration_seconds=request.duration_seconds,
-                style=request.style,
-                custom_prompt=request.custom_prompt,
-                character_name=request.character_name,
-                user_history=user_history
-            )
+            if script is None:
+                # Step 1: Update status to moderating
+                result.status = GenerationStatus.MODERATING
+                await self._update_progress(result, 5, "Vérification du contenu...", on_progress)
+                
+                # Step 1.5: Get user history to avoid duplicates
+                user_history = []
+                if request.user_id and self.supabase:
+                    try:
+                        user_history = await uniqueness_service.get_user_history(
+                            self.supabase,
+                            request.user_id,
+                            "animation",
+                            theme=request.theme,
+                            limit=5
+                        )
+                        if user_history:
+                            logger.info(f"📜 Found {len(user_history)} previous animations for user on theme '{request.theme}'")
+                    except Exception as e:
+                        logger.warning(f"⚠️ Could not fetch user history: {e}")
+                
+                # Step 2: Generate script
+                result.status = GenerationStatus.GENERATING_SCRIPT
+                await self._update_progress(result, 10, "Création du scénario...", on_progress)
+                
+                script = await self.generate_script(
+                    theme=request.theme,
+                    duration_seconds=request.duration_seconds,
+                    style=request.style,
+                    custom_prompt=request.custom_prompt,
+                    character_name=request.character_name,
+                    user_history=user_history
+                )
+                await self._save_checkpoint(checkpoint_id, script=script.model_dump(mode="json"))
+            else:
+                restored_clips = sum(1 for scene in script.scenes if scene.video_url)
+                logger.info(f"♻️ Script restored from checkpoint: '{script.title}' ({restored_clips}/{len(script.scenes)} clips already generated)")
             
             result.script = script
             result.title = script.title
@@ -1123,46 +1240,114 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
             # Step 3: Generate video clips
             result.status = GenerationStatus.GENERATING_CLIPS
             
+            ready_clips: Dict[int, str] = {}
+            
             async def clip_progress(percent, message):
                 overall_progress = 20 + int(percent * 0.6)  # 20-80% for clips
+                await self._publish_preview(result, script, ready_clips, on_preview)
                 await self._update_progress(result, overall_progress, message, on_progress)
             
+            # Start downloading each clip as soon as it is ready (stitching still needed)
+            assembled_video_path = (checkpoint or {}).get("assembled_video_path")
+            needs_stitching = not (checkpoint or {}).get("final_video_url") and not (
+                assembled_video_path and os.path.exists(assembled_video_path)
+            )
+            if needs_stitching:
+                import tempfile
+                work_dir = tempfile.mkdtemp(prefix="cartoon_")
+            
+            def prefetch_clip(scene: Scene) -> None:
+                if scene.video_url:
+                    ready_clips[scene.scene_number] = scene.video_url
+                if needs_stitching and scene.video_url and scene.video_url not in downloads:
+                    downloads[scene.video_url] = asyncio.create_task(self._download_clip(
+                        scene.video_url, os.path.join(work_dir, f"scene_{scene.scene_number:03d}.mp4")
+                    ))
+            
             scenes = await self.generate_all_clips(
                 script=script,
                 aspect_ratio=request.aspect_ratio.value,
                 resolution=request.resolution.value,
-                on_progress=clip_progress
+                on_progress=clip_progress,
+                checkpoint_id=checkpoint_id,
+                on_clip_ready=prefetch_clip
             )
             
+            # Scenes that failed for good no longer hold back the preview of the following ones
+            await self._publish_preview(result, script, ready_clips, on_preview, skip_missing=True)
+            
             # Collect successful video URLs
             video_urls = [s.video_url for s in scenes if s.video_url]
             result.successful_clips = len(video_urls)
             result.failed_clips = result.total_clips - result.successful_clips
-            
-            await self._update_progress(result, 70, f"Clips générés: {len(video_urls)}/{result.total_clips}", on_progress)
-            
-            # Step 4: Assemble all clips into one video
-            result.status = GenerationStatus.STITCHING
-            await self._update_progress(result, 75, "Assemblage de la vidéo...", on_progress)
-            
-            assembled_video_path, temp_clips = await self.stitch_videos(video_urls, normalize_audio=True)
             result.duration_seconds = len(video_urls) * self.clip_duration
             
-            await self._update_progress(result, 85, "Vidéo assemblée, upload en cours...", on_progress)
+            await self._update_progress(result, 70, f"Clips générés: {len(video_urls)}/{result.total_clips}", on_progress)
             
-            # Step 5: Upload assembled video to Supabase Storage
-            final_url = await self._upload_final_video_to_supabase(
-                video_path=assembled_video_path,
-                user_id=request.user_id,
-                creation_id=task_id,
-                duration_seconds=result.duration_seconds
-            )
+            final_url = (checkpoint or {}).get("final_video_url")
+            assets = {key: (checkpoint or {}).get(key) for key in ("poster_url", "sprite_url", "hls_url")}
+            if final_url:
+                logger.info(f"♻️ Final video restored from checkpoint: {final_url[:80]}...")
+            else:
+                # Step 4: Assemble all clips into one video
+                result.status = GenerationStatus.STITCHING
+                await self._update_progress(result, 75, "Assemblage de la vidéo...", on_progress)
+                
+                temp_clips = (checkpoint or {}).get("temp_clips") or []
+                if not needs_stitching:
+                    logger.info(f"♻️ Stitched video restored from checkpoint: {assembled_video_path}")
+                else:
+                    async def stitch_progress(fraction: float) -> None:
+                        eta = encode_scheduler.eta(task_id)
+                        message = "Assemblage de la vidéo..." if eta is None else f"Assemblage de la vidéo (encore ~{eta:.0f}s)..."
+                        await self._update_progress(result, 75 + int(fraction * 9), message, on_progress)
+                    
+                    async def stitch_queued(eta: float) -> None:
+                        await self._update_progress(result, 75, f"Assemblage en file d'attente (fin estimée dans ~{eta:.0f}s)...", on_progress)
+                    
+                    assembled_video_path, temp_clips = await self.stitch_videos(
+                        video_urls, normalize_audio=True, work_dir=work_dir, downloads=downloads,
+                        on_progress=stitch_progress, job_id=task_id, on_queued=stitch_queued
+                    )
+                    await self._save_checkpoint(checkpoint_id, assembled_video_path=assembled_video_path, temp_clips=temp_clips)
+                
+                hls_files: List[str] = []
+                if self.hls_enabled:
+                    hls_files = await self._package_hls(result, assembled_video_path, task_id, on_progress)
+                
+                await self._update_progress(result, 85, "Vidéo assemblée, upload en cours...", on_progress)
+                
+                # Step 5: Upload assembled video, poster, sprite strip and HLS renditions to Supabase Storage
+                final_url, previews, hls_url = await asyncio.gather(
+                    self._upload_final_video_to_supabase(
+                        video_path=assembled_video_path,
+                        user_id=request.user_id,
+                        creation_id=task_id,
+                        duration_seconds=result.duration_seconds
+                    ),
+                    self._upload_previews_to_supabase(
+                        video_path=assembled_video_path,
+                        user_id=request.user_id,
+                        creation_id=task_id
+                    ),
+                    self._upload_hls_to_supabase(
+                        hls_files=hls_files,
+                        user_id=request.user_id,
+                        creation_id=task_id
+                    )
+                )
+                assets = {**previews, "hls_url": hls_url}
+                await self._save_checkpoint(checkpoint_id, final_video_url=final_url, **assets)
+                
+                # Cleanup temp files
+                await self._cleanup_temp_files(assembled_video_path, temp_clips)
             
             result.final_video_url = final_url
             result.video_urls = [final_url]  # Single assembled video
-            
-            # Cleanup temp files
-            await self._cleanup_temp_files(assembled_video_path, temp_clips)
+            result.poster_url = assets.get("poster_url")
+            result.sprite_url = assets.get("sprite_url")
+            result.sprite_tiles = SPRITE_TILES if result.sprite_url else None
+            result.hls_url = assets.get("hls_url")
             
             await self._update_progress(result, 95, "Animation sauvegardée!", on_progress)
             
@@ -1172,6 +1357,7 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
             result.generation_time_seconds = (result.completed_at - started_at).total_seconds()
             
             await self._update_progress(result, 100, "Animation terminée!", on_progress)
+            await self._clear_checkpoint(checkpoint_id)
             
             logger.info(f"\n{'='*80}")
             logger.info(f"✅ PIPELINE COMPLETED SUCCESSFULLY")
@@ -1184,6 +1370,10 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
             
             return result
             
+        except (asyncio.CancelledError, JobCancelled):
+            self._discard_work_dir(work_dir)
+            raise
+        
         except Exception as e:
             logger.error(f"\n{'='*80}")
             logger.error(f"❌ PIPELINE FAILED")
@@ -1196,10 +1386,130 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
             result.completed_at = datetime.now()
             result.generation_time_seconds = (result.completed_at - started_at).total_seconds()
             
+            # Definitive failure: nothing left to resume
+            await self._clear_checkpoint(checkpoint_id)
+            self._discard_work_dir(work_dir)
+            
             # Update Supabase with failure
             await self._update_supabase(result)
             
             return result
+        
+        finally:
+            # Downloads not consumed by stitching (failure, cancellation)
+            for download in downloads.values():
+                if not download.done():
+                    download.cancel()
+                elif not download.cancelled():
+                    download.exception()
+    
+    @staticmethod
+    def _discard_work_dir(work_dir: Optional[str]) -> None:
+        """Remove a pipeline working directory (prefetched clips, partial stitching output)."""
+        if work_dir:
+            import shutil
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    # =========================================================================
+    # CHECKPOINTS
+    # =========================================================================
+    
+    def _restore_script(self, checkpoint: Optional[Dict[str, Any]]) -> Optional[Script]:
+        """Rebuild the script and per-scene progress from a checkpoint (None if not yet generated)."""
+        if not checkpoint or not checkpoint.get("script"):
+            return None
+        try:
+            script = Script.model_validate(checkpoint["script"])
+        except Exception as e:
+            logger.warning(f"⚠️ Invalid script in checkpoint, generating a new one: {e}")
+            return None
+        
+        for scene in script.scenes:
+            state = checkpoint.get(scene_field(scene.scene_number)) or {}
+            scene.prediction_id = state.get("prediction_id")
+            scene.video_url = state.get("video_url")
+            scene.status = GenerationStatus.COMPLETED if scene.video_url else GenerationStatus.PENDING
+        return script
+    
+    async def _save_checkpoint(self, checkpoint_id: Optional[str], **fields: Any) -> None:
+        if checkpoint_id and self.checkpoints:
+            await self.checkpoints.save(checkpoint_id, **fields)
+    
+    async def _checkpoint_scene(self, checkpoint_id: Optional[str], scene: Scene) -> None:
+        if checkpoint_id and self.checkpoints:
+            await self.checkpoints.save_scene(
+                checkpoint_id, scene.scene_number,
+                prediction_id=scene.prediction_id,
+                video_url=scene.video_url
+            )
+    
+    async def _clear_checkpoint(self, checkpoint_id: Optional[str]) -> None:
+        if checkpoint_id and self.checkpoints:
+            await self.checkpoints.clear(checkpoint_id)
+    
+    # =========================================================================
+    # CANCELLATION
+    # =========================================================================
+    
+    async def cancel_pipeline(self, checkpoint_id: str) -> Dict[str, Any]:
+        """
+        Release what a cancelled pipeline left behind.
+        
+        Called after the pipeline's asyncio task has been cancelled (which already
+        released its prediction slots): best-effort cancellation of WaveSpeed
+        predictions still in flight, removal of stitched/temp files, and removal
+        of the checkpoint so the task is not resumed on the next startup.
+        
+        Args:
+            checkpoint_id: Checkpoint identifier passed to run_pipeline (the API task ID)
+            
+        Returns:
+            Summary of the cleanup (predictions cancelled, files removed)
+        """
+        summary = {"predictions_cancelled": 0, "predictions_abandoned": 0, "temp_files_removed": False}
+        if not self.checkpoints:
+            return summary
+        
+        checkpoint = await self.checkpoints.load(checkpoint_id)
+        if not checkpoint:
+            return summary
+        
+        pending_predictions = [
+            state["prediction_id"]
+            for field_name, state in checkpoint.items()
+            if field_name.startswith("scene_") and isinstance(state, dict)
+            and state.get("prediction_id") and not state.get("video_url")
+        ]
+        for prediction_id in pending_predictions:
+            if await self._cancel_wavespeed_prediction(prediction_id):
+                summary["predictions_cancelled"] += 1
+            else:
+                summary["predictions_abandoned"] += 1
+        
+        assembled_video_path = checkpoint.get("assembled_video_path")
+        if assembled_video_path:
+            await self._cleanup_temp_files(assembled_video_path, checkpoint.get("temp_clips") or [])
+            summary["temp_files_removed"] = True
+        
+        await self.checkpoints.clear(checkpoint_id)
+        logger.info(f"🛑 Pipeline {checkpoint_id} cancelled: {summary}")
+        return summary
+    
+    async def _cancel_wavespeed_prediction(self, prediction_id: str) -> bool:
+        """Ask WaveSpeed to stop a prediction (best effort, only if a cancel endpoint is configured)."""
+        if not self.WAVESPEED_CANCEL_URL_TEMPLATE:
+            return False
+        try:
+            client = get_http_client("wavespeed")
+            response = await client.post(
+                self.WAVESPEED_CANCEL_URL_TEMPLATE.format(prediction_id=prediction_id),
+                headers={"Authorization": f"Bearer {self.wavespeed_api_key}"},
+                timeout=10.0
+            )
+            return response.status_code < 400
+        except httpx.HTTPError as e:
+            logger.warning(f"⚠️ Could not cancel WaveSpeed prediction {prediction_id}: {e}")
+            return False
     
     async def _upload_final_video_to_supabase(
         self,
@@ -1254,6 +1564,162 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
             logger.error(f"❌ Erreur upload vidéo finale: {e}")
             raise
     
+    @staticmethod
+    def _preview_paths(video_path: str) -> Tuple[str, str]:
+        """Poster and sprite strip files produced next to the assembled video."""
+        base = os.path.splitext(video_path)[0]
+        return f"{base}_poster.jpg", f"{base}_sprite.jpg"
+    
+    async def _upload_previews_to_supabase(
+        self,
+        video_path: str,
+        user_id: str,
+        creation_id: str
+    ) -> Dict[str, Optional[str]]:
+        """
+        Upload the poster and sprite strip produced with the assembled video.
+        
+        Previews are optional: a missing file or a failed upload is logged and
+        the animation completes without it.
+        
+        Returns:
+            Dict with poster_url and sprite_url (None when unavailable)
+        """
+        from services.supabase_storage import get_storage_service
+        
+        storage = get_storage_service()
+        poster_path, sprite_path = self._preview_paths(video_path)
+        
+        async def upload(path: str, filename: str) -> Optional[str]:
+            if not storage or not os.path.exists(path):
+                return None
+            try:
+                result = await storage.upload_file(
+                    file_path=path,
+                    user_id=user_id or "anonymous",
+                    content_type="animation",
+                    creation_id=creation_id,
+                    custom_filename=filename
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Upload aperçu {filename} impossible: {e}")
+                return None
+            if not result.get("success"):
+                logger.warning(f"⚠️ Upload aperçu {filename} impossible: {result.get('error')}")
+                return None
+            return result.get("public_url")
+        
+        poster_url, sprite_url = await asyncio.gather(
+            upload(poster_path, f"animation_{creation_id}_poster.jpg"),
+            upload(sprite_path, f"animation_{creation_id}_sprite.jpg")
+        )
+        return {"poster_url": poster_url, "sprite_url": sprite_url}
+    
+    async def _package_hls(
+        self,
+        result: GenerationResult,
+        video_path: str,
+        task_id: str,
+        on_progress: Optional[callable]
+    ) -> List[str]:
+        """
+        Package the assembled video as adaptive HLS next to it (optional stage).
+        
+        The MP4 stays the reference output: a packaging failure is logged and
+        the animation completes without HLS.
+        
+        Returns:
+            HLS files to upload (master playlist first), empty on failure
+        """
+        async def hls_progress(fraction: float) -> None:
+            await self._update_progress(result, 84, f"Préparation de la diffusion adaptative ({int(fraction * 100)}%)...", on_progress)
+        
+        def encode_slot(reencode: bool, media_seconds: float):
+            return encode_scheduler.slot(f"{task_id}-hls", reencode, media_seconds)
+        
+        try:
+            master_path, files = await package_hls(
+                video_path, os.path.dirname(video_path),
+                segment_seconds=self.hls_segment_seconds,
+                on_progress=hls_progress, encode_slot=encode_slot
+            )
+        except (asyncio.CancelledError, JobCancelled):
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Packaging HLS impossible, diffusion MP4 seule: {e}")
+            return []
+        logger.info(f"📡 HLS prêt: {len(files)} fichiers")
+        return [master_path] + [path for path in files if path != master_path]
+    
+    async def _upload_hls_to_supabase(
+        self,
+        hls_files: List[str],
+        user_id: str,
+        creation_id: str
+    ) -> Optional[str]:
+        """
+        Upload HLS playlists and renditions under the creation folder.
+        
+        Playlists reference their files by relative name, so every file keeps
+        its name in the same folder. Optional like the previews.
+        
+        Returns:
+            Public URL of the master playlist (None when unavailable)
+        """
+        from services.supabase_storage import get_storage_service
+        
+        storage = get_storage_service()
+        if not storage or not hls_files:
+            return None
+        
+        urls = []
+        for path in hls_files:
+            upload = await storage.upload_file(
+                file_path=path,
+                user_id=user_id or "anonymous",
+                content_type="animation",
+                creation_id=creation_id,
+                custom_filename=os.path.basename(path)
+            )
+            if not upload.get("success"):
+                logger.warning(f"⚠️ Upload HLS {os.path.basename(path)} impossible: {upload.get('error')}")
+                return None
+            urls.append(upload.get("public_url"))
+        logger.info(f"✅ HLS uploadé: {urls[0][:80]}...")
+        return urls[0]
+    
+    async def _download_clip(self, url: str, path: str) -> Optional[str]:
+        """
+        Stream one clip to disk in chunks (bounded by download_semaphore).
+        
+        The file is written to "<path>.part" and renamed once complete, so a
+        partial download is never stitched.
+        
+        Returns:
+            The path, or None if the CDN did not serve the clip
+        """
+        part_path = f"{path}.part"
+        async with self.download_semaphore:
+            try:
+                size = 0
+                async with get_http_client("media").stream("GET", url) as response:
+                    if response.status_code != 200:
+                        logger.warning(f"⚠️ Échec téléchargement clip {os.path.basename(path)}: HTTP {response.status_code}")
+                        return None
+                    async with aiofiles.open(part_path, "wb") as f:
+                        async for chunk in response.aiter_bytes(self.DOWNLOAD_CHUNK_SIZE):
+                            await f.write(chunk)
+                            size += len(chunk)
+                os.replace(part_path, path)
+            except BaseException:
+                try:
+                    os.remove(part_path)
+                except OSError:
+                    pass
+                raise
+        logger.info(f"✅ Clip {os.path.basename(path)} téléchargé: {size / 1024:.1f} KB")
+        return path
+    
     async def _cleanup_temp_files(self, assembled_path: str, clip_paths: List[str]) -> None:
         """
         Clean up temporary video files after upload.
@@ -1294,6 +1760,39 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
         except Exception as e:
             logger.warning(f"⚠️ Erreur nettoyage fichiers temp: {e}")
 
+    async def _publish_preview(
+        self,
+        result: GenerationResult,
+        script: Script,
+        ready_clips: Dict[int, str],
+        on_preview: Optional[Callable[[List[Dict[str, Any]]], Any]],
+        skip_missing: bool = False
+    ) -> None:
+        """
+        Publish the scene clips playable in order (consecutive ready scenes from scene 1).
+        
+        Args:
+            ready_clips: WaveSpeed video URL per completed scene number
+            skip_missing: Skip scenes without a clip instead of stopping at them
+                (generation over, failed scenes will not come)
+        """
+        clips = []
+        for scene in sorted(script.scenes, key=lambda s: s.scene_number):
+            video_url = ready_clips.get(scene.scene_number)
+            if not video_url:
+                if skip_missing:
+                    continue
+                break
+            clips.append({"scene_number": scene.scene_number, "video_url": video_url, "duration": self.clip_duration})
+        if clips == result.preview_clips:
+            return
+        result.preview_clips = clips
+        if on_preview:
+            try:
+                await on_preview(clips)
+            except Exception as e:
+                logger.warning(f"⚠️ Preview callback error: {e}")
+    
     async def _update_progress(
         self,
         result: GenerationResult,
@@ -1307,6 +1806,8 @@ The result should feel like watching a real Disney/Pixar short film - fluid, coh
         if callback:
             try:
                 await callback(progress, message)
+            except JobCancelled:
+                raise
             except Exception as e:
                 logger.warning(f"⚠️ Progress callback error: {e}")
         
@@ -1373,7 +1874,17 @@ def get_wan_orchestrator() -> WanVideoOrchestrator:
     global _orchestrator_instance
     
     if _orchestrator_instance is None:
-        _orchestrator_instance = WanVideoOrchestrator()
+        _orchestrator_instance = WanVideoOrchestrator(
+            max_concurrent_clips=WAN25_MAX_OUTSTANDING_PREDICTIONS,
+            checkpoints=pipeline_checkpoints,
+            submit_rate_per_second=WAN25_SUBMIT_RATE_PER_SECOND,
+            submit_burst=WAN25_SUBMIT_BURST,
+            favor_near_completion=WAN25_FAVOR_NEAR_COMPLETION,
+            retry_policy=clip_retry_policy,
+            download_concurrency=WAN25_DOWNLOAD_CONCURRENCY,
+            hls_enabled=ANIMATION_HLS_ENABLED,
+            hls_segment_seconds=ANIMATION_HLS_SEGMENT_SECONDS
+        )
     
     return _orchestrator_instance
 
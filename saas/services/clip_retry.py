@@ -0,0 +1,73 @@
+"""
+Politique de nouvelle tentative des clips d'animation (scène par scène).
+
+Une erreur passagère de WaveSpeed (timeout, 429, 5xx, génération échouée côté
+fournisseur) ne doit pas faire perdre une scène, ni faire échouer une animation
+déjà payée au-delà du seuil de dégradation. Les erreurs sont classées :
+
+- réessayables : timeouts, erreurs réseau, HTTP 408/409/425/429/5xx, échec de
+  génération côté WaveSpeed ;
+- définitives : requête refusée (4xx), contenu refusé par la modération,
+  erreurs de programmation.
+
+Seules les scènes en échec réessayable sont régénérées, avec un délai
+exponentiel (et jitter) entre deux passes.
+"""
+
+import random
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+
+from config import (
+    WAN25_CLIP_MAX_ATTEMPTS, WAN25_CLIP_RETRY_BASE_DELAY_SECONDS, WAN25_CLIP_RETRY_MAX_DELAY_SECONDS
+)
+
+RETRYABLE_STATUS_CODES = (408, 409, 425, 429, 500, 502, 503, 504)
+# Refus de modération : régénérer le même prompt échouerait de nouveau
+CONTENT_POLICY_MARKERS = ("sensitive", "content policy", "nsfw", "moderation", "inappropriate")
+
+
+class ClipGenerationError(Exception):
+    """Échec de soumission ou de génération d'un clip chez le fournisseur"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retryable: Optional[bool] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        if retryable is None:
+            if status_code is not None:
+                retryable = status_code in RETRYABLE_STATUS_CODES
+            else:
+                retryable = not any(marker in message.lower() for marker in CONTENT_POLICY_MARKERS)
+        self.retryable = retryable
+
+
+@dataclass(frozen=True)
+class ClipRetryPolicy:
+    """Nombre de tentatives et délais entre passes de régénération"""
+    max_attempts: int = 3
+    base_delay: float = 4.0
+    max_delay: float = 60.0
+    multiplier: float = 2.0
+    jitter: float = 0.2
+
+    def is_retryable(self, error: BaseException) -> bool:
+        if isinstance(error, ClipGenerationError):
+            return error.retryable
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in RETRYABLE_STATUS_CODES
+        return isinstance(error, (TimeoutError, httpx.TransportError))
+
+    def delay(self, attempt: int) -> float:
+        """Délai avant la tentative attempt + 1 (attempt >= 1)"""
+        delay = min(self.base_delay * self.multiplier ** (attempt - 1), self.max_delay)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+# Politique par défaut des clips Wan 2.5
+clip_retry_policy = ClipRetryPolicy(
+    max_attempts=WAN25_CLIP_MAX_ATTEMPTS,
+    base_delay=WAN25_CLIP_RETRY_BASE_DELAY_SECONDS,
+    max_delay=WAN25_CLIP_RETRY_MAX_DELAY_SECONDS
+)
@@ -0,0 +1,139 @@
+"""
+Répartition équitable des places de génération de clips entre animations.
+
+L'orchestrateur Wan 2.5 est partagé par toutes les animations en cours : avec un
+simple sémaphore, les clips sont servis dans l'ordre d'arrivée et une animation
+de 12 clips peut bloquer pendant des minutes une animation de 3 clips lancée
+juste après.
+
+Ici, chaque place libérée est attribuée à l'animation (pipeline) qui en détient
+le moins à cet instant : les places tournent entre les pipelines actifs. À
+égalité, le pipeline le plus proche de la fin (le moins de clips restants) passe
+en premier, ce qui permet aux animations courtes de se terminer rapidement même
+quand des longues sont en cours.
+"""
+
+import asyncio
+import itertools
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Pipeline:
+    """Places détenues et demandes en attente d'un pipeline"""
+    order: int
+    held: int = 0
+    waiting: Deque[asyncio.Future] = field(default_factory=deque)
+
+    @property
+    def remaining(self) -> int:
+        """Clips pas encore terminés (tous les clips d'un pipeline sont demandés ensemble)"""
+        return self.held + len(self.waiting)
+
+
+class FairClipScheduler:
+    """Sémaphore à répartition équitable entre pipelines"""
+
+    def __init__(self, capacity: int, favor_near_completion: bool = True):
+        """
+        Args:
+            capacity: Nombre total de places (prédictions en cours simultanées)
+            favor_near_completion: À égalité de places détenues, servir d'abord le pipeline
+                qui a le moins de clips restants
+        """
+        self.capacity = max(1, capacity)
+        self.favor_near_completion = favor_near_completion
+        self._in_use = 0
+        self._pipelines: Dict[str, _Pipeline] = {}
+        self._order = itertools.count()
+        self.granted = 0
+        self.queued = 0
+
+    def _pipeline(self, pipeline_id: str) -> _Pipeline:
+        pipeline = self._pipelines.get(pipeline_id)
+        if pipeline is None:
+            pipeline = self._pipelines[pipeline_id] = _Pipeline(order=next(self._order))
+        return pipeline
+
+    def _forget_if_idle(self, pipeline_id: str) -> None:
+        pipeline = self._pipelines.get(pipeline_id)
+        if pipeline is not None and pipeline.remaining == 0:
+            del self._pipelines[pipeline_id]
+
+    def _next_pipeline(self) -> _Pipeline:
+        candidates = [p for p in self._pipelines.values() if p.waiting]
+        return min(candidates, key=lambda p: (
+            p.held,
+            p.remaining if self.favor_near_completion else 0,
+            p.order
+        ))
+
+    def _dispatch(self) -> None:
+        """Attribue les places libres aux pipelines en attente"""
+        while self._in_use < self.capacity and any(p.waiting for p in self._pipelines.values()):
+            pipeline = self._next_pipeline()
+            future = pipeline.waiting.popleft()
+            if future.done():
+                # Demande annulée entre-temps
+                continue
+            pipeline.held += 1
+            self._in_use += 1
+            self.granted += 1
+            future.set_result(None)
+
+    async def acquire(self, pipeline_id: str) -> None:
+        pipeline = self._pipeline(pipeline_id)
+        if self._in_use < self.capacity and not any(p.waiting for p in self._pipelines.values()):
+            pipeline.held += 1
+            self._in_use += 1
+            self.granted += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        pipeline.waiting.append(future)
+        self.queued += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # La place venait d'être attribuée : la rendre
+                self.release(pipeline_id)
+            else:
+                future.cancel()
+                if future in pipeline.waiting:
+                    pipeline.waiting.remove(future)
+                self._forget_if_idle(pipeline_id)
+            raise
+
+    def release(self, pipeline_id: str) -> None:
+        pipeline = self._pipelines.get(pipeline_id)
+        if pipeline is not None and pipeline.held > 0:
+            pipeline.held -= 1
+            self._in_use -= 1
+            self._forget_if_idle(pipeline_id)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, pipeline_id: str) -> AsyncIterator[None]:
+        """Place de génération pour un clip du pipeline, rendue à la sortie du bloc"""
+        await self.acquire(pipeline_id)
+        try:
+            yield
+        finally:
+            self.release(pipeline_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "in_use": self._in_use,
+            "waiting": sum(len(p.waiting) for p in self._pipelines.values()),
+            "pipelines": len(self._pipelines),
+            "granted": self.granted,
+            "queued": self.queued
+        }
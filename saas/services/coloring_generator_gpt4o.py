@@ -12,11 +12,12 @@ from typing import Dict, Any, Optional
 from PIL import Image, ImageDraw, ImageFont
 import io
 import requests
-from openai import AsyncOpenAI
-from google import genai
 from google.genai import types
 from dotenv import load_dotenv
 from services.supabase_storage import get_storage_service
+from services.ai_clients import get_async_openai, get_gemini_client
+from services.media_worker import media_worker
+from services.media_jobs import crop_png, fit_png, save_png
 
 load_dotenv()
 
@@ -42,7 +43,7 @@ class ColoringGeneratorGPT4o:
                 print("[ERROR] OPENAI_API_KEY non trouvee dans .env")
                 raise ValueError("OPENAI_API_KEY manquante")
             
-            self.client = AsyncOpenAI(api_key=self.api_key)
+            self.client = get_async_openai(self.api_key)
             
             # Configuration Gemini pour la génération d'images
             self.gemini_api_key = os.getenv("GEMINI_API_KEY")
@@ -50,7 +51,7 @@ class ColoringGeneratorGPT4o:
                 print("[ERROR] GEMINI_API_KEY non trouvee dans .env")
                 raise ValueError("GEMINI_API_KEY manquante")
             
-            self.gemini_client = genai.Client(api_key=self.gemini_api_key)
+            self.gemini_client = get_gemini_client(self.gemini_api_key)
             
             # URL de base pour les images (production Railway ou local)
             self.base_url = os.getenv("BASE_URL", "https://herbbie.com")
@@ -85,6 +86,20 @@ Scene description:
             # Erreur silencieuse lors de l'initialisation
             raise
     
+    def _log_fit(self, fit: dict) -> None:
+        """Affiche le redimensionnement effectué par media_jobs.fit_png"""
+        generated_width, generated_height = fit["generated"]
+        final_width, final_height = fit["final"]
+        print(f"[GENERATED] Image générée: {generated_width}x{generated_height} (ratio: {generated_width / generated_height:.2f})")
+        if fit["mode"] == "adjusted":
+            new_width, new_height = fit["resized"]
+            print(f"[WARNING] Différence de ratio détectée: {fit['ratio_diff']*100:.1f}%")
+            print(f"[ADJUSTED] Image centrée avec ratio préservé: {new_width}x{new_height} -> {final_width}x{final_height}")
+        elif fit["mode"] == "resized":
+            print(f"[RESIZED] Redimensionnement direct: {generated_width}x{generated_height} -> {final_width}x{final_height}")
+        else:
+            print(f"[NO RESIZE] Dimensions déjà correctes: {final_width}x{final_height}")
+    
     def _add_watermark(self, image: Image.Image) -> Image.Image:
         """
         Ajoute le watermark "Créé avec HERBBIE" en bas à gauche de l'image
@@ -441,59 +456,12 @@ CRITICAL: Recreate this exact scene as a black and white line drawing coloring p
                 print(f"[ERROR] Aucune image trouvée dans la réponse")
                 raise Exception("Format de réponse gemini-3-pro-image-preview inattendu - aucune image trouvée")
             
-            # Charger l'image générée
-            generated_img = Image.open(io.BytesIO(image_data))
-            generated_width, generated_height = generated_img.size
-            generated_ratio = generated_width / generated_height
-            
-            print(f"[GENERATED] Image générée: {generated_width}x{generated_height} (ratio: {generated_ratio:.2f})")
-            
-            # Déterminer la taille finale
-            min_size = 1536
-            if original_width and original_height:
-                if original_width < min_size or original_height < min_size:
-                    final_width = final_height = min_size
-                    print(f"[SMALL] Image originale petite ({original_width}x{original_height}), utilisation taille minimale {min_size}x{min_size}")
-                else:
-                    final_width, final_height = original_width, original_height
-                    print(f"[TARGET] Redimensionnement vers: {original_width}x{original_height}")
-            else:
-                # Si pas de dimensions originales, utiliser les dimensions générées ou minimum
-                final_width = max(generated_width, min_size)
-                final_height = max(generated_height, min_size)
-                print(f"[DEFAULT] Utilisation dimensions générées: {final_width}x{final_height}")
-            
-            # Redimensionner si nécessaire
-            if generated_width != final_width or generated_height != final_height:
-                target_ratio = final_width / final_height
-                ratio_diff = abs(generated_ratio - target_ratio) / target_ratio if target_ratio > 0 else 1
-                
-                if ratio_diff > 0.05:
-                    print(f"[WARNING] Différence de ratio détectée: {ratio_diff*100:.1f}%")
-                    # Adapter en préservant le ratio cible et en centrant
-                    if target_ratio > generated_ratio:
-                        new_width = final_width
-                        new_height = int(final_width / generated_ratio)
-                    else:
-                        new_height = final_height
-                        new_width = int(final_height * generated_ratio)
-                    
-                    temp_resized = generated_img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                    final_img = Image.new('RGB', (final_width, final_height), 'white')
-                    x_offset = (final_width - new_width) // 2
-                    y_offset = (final_height - new_height) // 2
-                    final_img.paste(temp_resized, (x_offset, y_offset))
-                    print(f"[ADJUSTED] Image centrée avec ratio préservé: {new_width}x{new_height} -> {final_width}x{final_height}")
-                else:
-                    final_img = generated_img.resize((final_width, final_height), Image.Resampling.LANCZOS)
-                    print(f"[RESIZED] Redimensionnement direct: {generated_width}x{generated_height} -> {final_width}x{final_height}")
-            else:
-                final_img = generated_img
-                print(f"[NO RESIZE] Dimensions déjà correctes: {final_width}x{final_height}")
-            
-            # Sauvegarder
+            # Redimensionner et sauvegarder dans le media worker (hors de la boucle d'événements)
             output_path = self.output_dir / f"coloring_photo_direct_{uuid.uuid4().hex[:8]}.png"
-            final_img.save(output_path, 'PNG', optimize=True)
+            original_size = (original_width, original_height) if original_width and original_height else None
+            fit = await media_worker.run("image_fit", fit_png, image_data, str(output_path), original_size)
+            self._log_fit(fit)
+            final_width, final_height = fit["final"]
             print(f"[OK] Coloriage photo sauvegardé ({final_width}x{final_height}): {output_path.name}")
             
             return str(output_path)
@@ -590,11 +558,10 @@ CRITICAL: Recreate this exact scene as a black and white line drawing coloring p
             if hasattr(image_result, 'url') and image_result.url:
                 # Télécharger l'image depuis l'URL
                 print(f"[DEBUG] Téléchargement depuis URL: {image_result.url}")
-                import httpx
-                async with httpx.AsyncClient() as client:
-                    image_response = await client.get(image_result.url)
-                    image_response.raise_for_status()
-                    image_data = image_response.content
+                from services.http_clients import get_http_client
+                image_response = await get_http_client("media").get(image_result.url)
+                image_response.raise_for_status()
+                image_data = image_response.content
             elif hasattr(image_result, 'b64_json') and image_result.b64_json:
                 # Décoder l'image depuis base64
                 print(f"[DEBUG] Décodage depuis base64")
@@ -605,33 +572,18 @@ CRITICAL: Recreate this exact scene as a black and white line drawing coloring p
             if not image_data:
                 raise Exception("Impossible de récupérer l'image générée")
             
-            # Charger l'image générée
-            generated_img = Image.open(io.BytesIO(image_data))
-            print(f"[DEBUG] Image générée: {generated_img.size}")
-            
             # L'image générée est en 1024x1024 (carré) par gpt-image-1
             # L'image originale était centrée dans ce carré aux coordonnées (x_offset, y_offset)
             # avec les dimensions (new_width, new_height)
             # On extrait cette zone et on la sauvegarde telle quelle, SANS redimensionnement
             # pour préserver les proportions exactes de l'image générée
+            crop_box = (x_offset, y_offset, x_offset + new_width, y_offset + new_height)
+            print(f"[DEBUG] Extraction zone originale: {crop_box}")
             
-            # Extraire la zone centrale qui correspond à l'image originale
-            crop_x = x_offset
-            crop_y = y_offset
-            crop_width = new_width
-            crop_height = new_height
-            
-            print(f"[DEBUG] Extraction zone originale: ({crop_x}, {crop_y}, {crop_x + crop_width}, {crop_y + crop_height})")
-            print(f"[DEBUG] Dimensions zone extraite: {crop_width}x{crop_height}")
-            
-            # Extraire la zone centrale de l'image générée (sans redimensionnement)
-            final_img = generated_img.crop((crop_x, crop_y, crop_x + crop_width, crop_y + crop_height))
-            print(f"[DEBUG] Image finale extraite: {final_img.size} (sans redimensionnement)")
-            
-            # Sauvegarder l'image telle quelle, sans redimensionnement
+            # Extraction et sauvegarde dans le media worker (hors de la boucle d'événements)
             output_path = self.output_dir / f"coloring_photo_gpt_image_1_{uuid.uuid4().hex[:8]}.png"
-            final_img.save(output_path, 'PNG', optimize=True)
-            print(f"[OK] Coloriage photo sauvegardé ({final_img.size[0]}x{final_img.size[1]}): {output_path.name}")
+            final_size = await media_worker.run("image_crop", crop_png, image_data, str(output_path), crop_box)
+            print(f"[OK] Coloriage photo sauvegardé ({final_size[0]}x{final_size[1]}): {output_path.name}")
             
             # Nettoyer les fichiers temporaires
             temp_input_path.unlink(missing_ok=True)
@@ -839,57 +791,13 @@ CRITICAL: Recreate this exact scene as a black and white line drawing coloring p
                             print(f"[TEXT] {part.text[:100]}...")
             
             if image_data:
-                # Charger l'image générée
-                generated_img = Image.open(io.BytesIO(image_data))
-                generated_width, generated_height = generated_img.size
-                generated_ratio = generated_width / generated_height
-                
-                print(f"[GENERATED] Image generee: {generated_width}x{generated_height} (ratio: {generated_ratio:.2f})")
                 print(f"[TARGET] Redimensionnement vers: {original_width}x{original_height} (ratio: {aspect_ratio:.2f})")
                 
-                # Déterminer la taille finale (au minimum 1536x1536 pour éviter les coupures)
-                min_size = 1536
-                if original_width < min_size or original_height < min_size:
-                    # Si l'image originale est petite, utiliser une taille carrée plus grande
-                    final_width = final_height = min_size
-                    print(f"[SMALL] Image originale petite ({original_width}x{original_height}), utilisation taille minimale {min_size}x{min_size}")
-                else:
-                    final_width, final_height = original_width, original_height
-
-                # Vérifier si les ratios sont similaires (tolérance de 5%)
-                target_ratio = final_width / final_height
-                ratio_diff = abs(generated_ratio - target_ratio) / target_ratio
-                if ratio_diff > 0.05:
-                    print(f"[WARNING] Difference de ratio detectee: {ratio_diff*100:.1f}%")
-                    # Adapter en préservant le ratio cible et en centrant
-                    if target_ratio > generated_ratio:
-                        # Image cible plus large -> adapter la largeur
-                        new_width = final_width
-                        new_height = int(final_width / generated_ratio)
-                    else:
-                        # Image cible plus haute -> adapter la hauteur
-                        new_height = final_height
-                        new_width = int(final_height * generated_ratio)
-
-                    # Redimensionner avec le ratio préservé
-                    temp_resized = generated_img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-                    # Créer une image blanche aux dimensions finales
-                    final_img = Image.new('RGB', (final_width, final_height), 'white')
-
-                    # Centrer l'image redimensionnée
-                    x_offset = (final_width - new_width) // 2
-                    y_offset = (final_height - new_height) // 2
-                    final_img.paste(temp_resized, (x_offset, y_offset))
-                    print(f"[ADJUSTED] Image centree avec ratio preserve: {new_width}x{new_height} -> {final_width}x{final_height}")
-                else:
-                    # Ratios similaires -> redimensionnement direct
-                    final_img = generated_img.resize((final_width, final_height), Image.Resampling.LANCZOS)
-                    print(f"[RESIZED] Redimensionnement direct: {generated_width}x{generated_height} -> {final_width}x{final_height}")
-
-                # Sauvegarder avec les dimensions finales
+                # Redimensionner et sauvegarder dans le media worker (au minimum 1536x1536 pour éviter les coupures)
                 output_path = self.output_dir / f"coloring_photo_direct_{uuid.uuid4().hex[:8]}.png"
-                final_img.save(output_path, 'PNG', optimize=True)
+                fit = await media_worker.run("image_fit", fit_png, image_data, str(output_path), (original_width, original_height))
+                self._log_fit(fit)
+                final_width, final_height = fit["final"]
                 print(f"[OK] Coloriage photo sauvegarde ({final_width}x{final_height}): {output_path.name}")
                 
                 return str(output_path)
@@ -1005,15 +913,12 @@ CRITICAL: Recreate this exact scene as a black and white line drawing coloring p
                 raise Exception("Format de reponse gemini-3-pro-image-preview inattendu - aucune image trouvée")
             
             if image_data:
-                # Charger l'image générée
-                generated_img = Image.open(io.BytesIO(image_data))
                 print(f"[OK] Image generee recue ({len(image_data)} bytes)")
-                print(f"[ORIGINAL] Dimensions generees: {generated_img.size}")
 
-                # Garder les dimensions naturelles de l'image générée par l'API
+                # Garder les dimensions naturelles de l'image générée par l'API (PNG optimisé dans le media worker)
                 output_path = self.output_dir / f"coloring_theme_{uuid.uuid4().hex[:8]}.png"
-                generated_img.save(output_path, 'PNG', optimize=True)
-                print(f"[OK] Coloriage theme sauvegarde ({generated_img.size[0]}x{generated_img.size[1]}): {output_path.name}")
+                size = await media_worker.run("image_save", save_png, image_data, str(output_path))
+                print(f"[OK] Coloriage theme sauvegarde ({size[0]}x{size[1]}): {output_path.name}")
 
                 return str(output_path)
             else:
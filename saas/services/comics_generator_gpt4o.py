@@ -7,8 +7,6 @@ Architecture:
 """
 
 import openai
-from openai import AsyncOpenAI
-from google import genai
 from google.genai import types
 import json
 import os
@@ -16,11 +14,15 @@ import uuid
 import base64
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Awaitable
 from PIL import Image, ImageDraw, ImageFont
 import io
 from dotenv import load_dotenv
 from services.supabase_storage import get_storage_service
+from services.ai_clients import get_async_openai, get_gemini_client
+from services.media_worker import media_worker
+from services.media_jobs import save_png
+from services.job_queue import JobCancelled
 
 load_dotenv()
 
@@ -36,14 +38,14 @@ class ComicsGeneratorGPT4o:
         if not self.openai_key:
             raise ValueError("OPENAI_API_KEY manquante dans les variables d'environnement")
         
-        self.client = AsyncOpenAI(api_key=self.openai_key)
+        self.client = get_async_openai(self.openai_key)
         
         # Client Gemini pour la génération d'images
         self.gemini_api_key = os.getenv("GEMINI_API_KEY")
         if not self.gemini_api_key:
             raise ValueError("GEMINI_API_KEY manquante dans les variables d'environnement")
         
-        self.gemini_client = genai.Client(api_key=self.gemini_api_key)
+        self.gemini_client = get_gemini_client(self.gemini_api_key)
         self.cache_dir = Path("static/cache/comics")
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
@@ -852,11 +854,10 @@ CRITIQUE ORTHOGRAPHE:
             image_data = None
             if hasattr(image_result, 'url') and image_result.url:
                 # Télécharger l'image depuis l'URL
-                import httpx
-                async with httpx.AsyncClient() as client:
-                    image_response = await client.get(image_result.url)
-                    image_response.raise_for_status()
-                    image_data = image_response.content
+                from services.http_clients import get_http_client
+                image_response = await get_http_client("media").get(image_result.url)
+                image_response.raise_for_status()
+                image_data = image_response.content
             elif hasattr(image_result, 'b64_json') and image_result.b64_json:
                 # Décoder l'image depuis base64
                 image_data = base64.b64decode(image_result.b64_json)
@@ -866,12 +867,9 @@ CRITIQUE ORTHOGRAPHE:
             if not image_data:
                 raise Exception("Impossible de récupérer l'image générée")
             
-            # Charger l'image générée
-            generated_img = Image.open(io.BytesIO(image_data))
-            
-            # Sauvegarder l'illustration de personnage
+            # Sauvegarder l'illustration de personnage (PNG optimisé dans le media worker)
             character_illustration_path = self.cache_dir / f"comic_character_{uuid.uuid4().hex[:8]}.png"
-            generated_img.save(character_illustration_path, 'PNG', optimize=True)
+            await media_worker.run("image_save", save_png, image_data, str(character_illustration_path))
             print(f"   ✅ Personnage BD créé: {character_illustration_path.name}")
             
             # Nettoyer les fichiers temporaires
@@ -893,11 +891,13 @@ CRITIQUE ORTHOGRAPHE:
         num_pages: int,
         character_photo_path: Optional[str] = None,
         user_id: Optional[str] = None,
-        character_description: Optional[str] = None
+        character_description: Optional[str] = None,
+        before_page: Optional[Callable[[int], Awaitable[None]]] = None
     ) -> tuple[List[Dict[str, Any]], str]:
         """
         Génère toutes les pages de BD avec gemini-3-pro-image-preview
         Si character_photo_path est fourni, utilise l'illustration transformée avec Gemini
+        before_page (numéro de page) est appelé avant chaque page et peut lever JobCancelled
         """
         
         print(f"🎨 Génération des {num_pages} page(s) BD avec gemini-3-pro-image-preview...")
@@ -932,6 +932,10 @@ CRITIQUE ORTHOGRAPHE:
             page_num = page_data.get("page_number", len(generated_pages) + 1)
             panels = page_data.get("panels", [])
             
+            # Annulation éventuelle entre deux pages (hors du try : ne pas la transformer en erreur de page)
+            if before_page:
+                await before_page(page_num)
+            
             try:
                 print(f"📄 Génération page {page_num}/{num_pages} avec {len(panels)} cases ({rows}x{cols})...")
                 
@@ -1482,14 +1486,10 @@ The character from the provided image must be the main character performing all
             if image_data:
                 print(f"   [OK] Image reçue ({len(image_data)} bytes)")
                 
-                # Vérifier les dimensions réelles de l'image générée
-                img = Image.open(io.BytesIO(image_data))
-                actual_width, actual_height = img.size
-                print(f"   [DIMENSIONS] Image générée: {actual_width}x{actual_height}")
-                
-                # Sauvegarder
+                # Sauvegarder (PNG optimisé dans le media worker) et vérifier les dimensions réelles
                 output_path = output_dir / f"page_{page_num}.png"
-                img.save(output_path, 'PNG', optimize=True)
+                actual_width, actual_height = await media_worker.run("image_save", save_png, image_data, str(output_path))
+                print(f"   [DIMENSIONS] Image générée: {actual_width}x{actual_height}")
                 
                 print(f"   ✅ Planche sauvegardée: {output_path.name} ({actual_width}x{actual_height})")
                 return output_path
@@ -1516,12 +1516,14 @@ The character from the provided image must be the main character performing all
         art_style: str,
         custom_prompt: Optional[str] = None,
         character_photo_path: Optional[str] = None,
-        user_id: Optional[str] = None
+        user_id: Optional[str] = None,
+        before_page: Optional[Callable[[int], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
         """
         Crée une bande dessinée complète (nombre variable de pages avec nombre variable de cases par page)
         1. Génère le scénario complet avec gpt-4o-mini
         2. Génère toutes les pages avec gemini-3-pro-image-preview en gardant la cohérence
+        before_page est transmis à generate_comic_pages (JobCancelled est propagé, pas converti en échec)
         """
         
         start_time = datetime.now()
@@ -1545,7 +1547,8 @@ The character from the provided image must be the main character performing all
                 art_style=art_style,
                 num_pages=num_pages,
                 character_photo_path=character_illustration_path,  # Utiliser l'illustration transformée
-                user_id=user_id  # Passer user_id pour upload Supabase Storage
+                user_id=user_id,  # Passer user_id pour upload Supabase Storage
+                before_page=before_page
             )
             
             generation_time = (datetime.now() - start_time).total_seconds()
@@ -1567,6 +1570,8 @@ The character from the provided image must be the main character performing all
             
             return result
             
+        except JobCancelled:
+            raise
         except Exception as e:
             print(f"❌ Erreur création BD: {e}")
             return {
@@ -0,0 +1,271 @@
+"""
+Ordonnancement des assemblages ffmpeg selon un budget CPU global.
+
+Sans coordination, chaque réencodage x264 prend tous les cœurs de la machine :
+trois animations assemblées en même temps sur une instance de 4 vCPU lancent
+une douzaine de threads d'encodage qui se disputent 4 cœurs, et chaque
+assemblage est plus lent que s'ils s'étaient succédé.
+
+Ici, chaque assemblage est admis contre le budget (cœurs de l'instance, quota
+cgroup compris, ou ENCODE_CPU_BUDGET) :
+
+- une concaténation sans réencodage (stream copy + loudnorm) coûte un cœur ;
+- un réencodage reçoit sa part du budget (cœurs / réencodages actifs ou en
+  attente, au moins ENCODE_MIN_THREADS) et un preset x264 d'autant plus rapide
+  que la file est longue ;
+- un assemblage qui ne tient pas dans les cœurs libres attend (ordre d'arrivée).
+
+Les vitesses observées (secondes de vidéo traitées par seconde) servent à
+estimer la fin de chaque assemblage, en attente ou en cours.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+from config import ENCODE_CPU_BUDGET, ENCODE_MIN_THREADS
+from services.ffmpeg_tools import EncodeSettings
+
+logger = logging.getLogger(__name__)
+
+# Vitesse relative des presets x264 utilisés (référence : veryfast)
+PRESET_SPEED = {"faster": 0.7, "veryfast": 1.0, "superfast": 1.6}
+# Vitesses initiales, avant la première mesure (secondes de vidéo par seconde)
+COPY_SPEED = 40.0  # Stream copy vidéo + loudnorm audio, un cœur
+REENCODE_SPEED_PER_THREAD = 1.0  # x264 veryfast, par thread
+SPEED_SMOOTHING = 0.3
+
+
+def detect_cpu_count() -> int:
+    """Cœurs utilisables : quota cgroup (conteneur) sinon affinité du processus"""
+    for quota_path, period_path in (
+        ("/sys/fs/cgroup/cpu.max", None),  # cgroup v2 : "quota période"
+        ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us"),  # cgroup v1
+    ):
+        try:
+            with open(quota_path) as f:
+                values = f.read().split()
+            if period_path:
+                with open(period_path) as f:
+                    values.append(f.read().strip())
+            quota, period = values[0], values[1]
+            if quota not in ("max", "-1"):
+                return max(1, int(int(quota) / int(period)))
+        except (OSError, ValueError, IndexError):
+            continue
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+@dataclass
+class _EncodeJob:
+    """Assemblage en attente ou en cours"""
+    job_id: str
+    reencode: bool
+    media_seconds: float
+    future: asyncio.Future
+    queued_at: float = field(default_factory=time.monotonic)
+    threads: int = 0
+    preset: str = "veryfast"
+    started_at: Optional[float] = None
+    expected_seconds: float = 0.0
+
+
+class EncodeScheduler:
+    """Admission des assemblages ffmpeg contre un budget de cœurs"""
+
+    def __init__(self, cpu_budget: int = 0, min_threads: int = 2):
+        """
+        Args:
+            cpu_budget: Cœurs réservés aux assemblages (0 : cœurs détectés)
+            min_threads: Threads minimum attribués à un réencodage
+        """
+        self.cpu_budget = cpu_budget if cpu_budget > 0 else detect_cpu_count()
+        self.min_threads = max(1, min(min_threads, self.cpu_budget))
+        self._in_use = 0
+        self._waiting: Deque[_EncodeJob] = deque()
+        self._running: List[_EncodeJob] = []
+        # Vitesses observées (lissées) : stream copy, et réencodage par thread au preset veryfast
+        self._copy_speed = COPY_SPEED
+        self._reencode_speed = REENCODE_SPEED_PER_THREAD
+        self.completed = 0
+        self.failed = 0
+        self.queued = 0
+
+    # --- Estimations ---
+
+    def _core_seconds(self, job: _EncodeJob) -> float:
+        """Travail d'un assemblage en secondes-cœur"""
+        if job.reencode:
+            return job.media_seconds / self._reencode_speed
+        return job.media_seconds / self._copy_speed
+
+    def _expected_seconds(self, job: _EncodeJob, threads: int, preset: str) -> float:
+        if job.reencode:
+            return job.media_seconds / (self._reencode_speed * threads * PRESET_SPEED.get(preset, 1.0))
+        return job.media_seconds / self._copy_speed
+
+    def _remaining_seconds(self, job: _EncodeJob, now: float) -> float:
+        return max(0.0, job.started_at + job.expected_seconds - now)
+
+    def eta(self, job_id: str) -> Optional[float]:
+        """Secondes avant la fin estimée de l'assemblage job_id (None si inconnu)"""
+        now = time.monotonic()
+        for job in self._running:
+            if job.job_id == job_id:
+                return self._remaining_seconds(job, now)
+        # En attente : cœurs libérés par les assemblages en cours et ceux qui le précèdent
+        backlog = sum(self._remaining_seconds(j, now) * j.threads for j in self._running)
+        for job in self._waiting:
+            if job.job_id == job_id:
+                threads = self._threads_for(job, self.cpu_budget)
+                return backlog / self.cpu_budget + self._expected_seconds(job, threads, self._preset_for(threads))
+            backlog += self._core_seconds(job)
+        return None
+
+    # --- Attribution des cœurs ---
+
+    def _threads_for(self, job: _EncodeJob, free: int) -> int:
+        if not job.reencode:
+            return 1
+        demand = sum(1 for j in self._running if j.reencode) + sum(1 for j in self._waiting if j.reencode)
+        share = self.cpu_budget // max(1, demand)
+        return max(self.min_threads, min(free, share))
+
+    def _preset_for(self, threads: int) -> str:
+        backlog = len(self._waiting)
+        if backlog == 0 and threads >= 4:
+            return "faster"
+        if backlog <= self.cpu_budget // self.min_threads:
+            return "veryfast"
+        return "superfast"
+
+    def _dispatch(self) -> None:
+        """Admet les assemblages en attente qui tiennent dans les cœurs libres"""
+        reencode_blocked = False
+        for job in list(self._waiting):
+            if job.future.done():
+                # Demande annulée entre-temps
+                self._waiting.remove(job)
+                continue
+            free = self.cpu_budget - self._in_use
+            needed = self.min_threads if job.reencode else 1
+            if free < needed or (job.reencode and reencode_blocked):
+                # Un réencodage bloqué garde son tour sur les suivants ; un stream copy peut passer
+                reencode_blocked = reencode_blocked or job.reencode
+                continue
+            threads = self._threads_for(job, free)
+            self._waiting.remove(job)
+            job.threads = threads
+            job.preset = self._preset_for(threads)
+            job.started_at = time.monotonic()
+            job.expected_seconds = self._expected_seconds(job, threads, job.preset)
+            self._in_use += threads
+            self._running.append(job)
+            job.future.set_result(EncodeSettings(threads=threads, preset=job.preset))
+
+    def _finish(self, job: _EncodeJob, ok: bool) -> None:
+        self._running.remove(job)
+        self._in_use -= job.threads
+        elapsed = time.monotonic() - job.started_at
+        if ok:
+            self.completed += 1
+            if elapsed > 0 and job.media_seconds > 0:
+                speed = job.media_seconds / elapsed
+                if job.reencode:
+                    per_thread = speed / job.threads / PRESET_SPEED.get(job.preset, 1.0)
+                    self._reencode_speed += SPEED_SMOOTHING * (per_thread - self._reencode_speed)
+                else:
+                    self._copy_speed += SPEED_SMOOTHING * (speed - self._copy_speed)
+        else:
+            self.failed += 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        job_id: str,
+        reencode: bool,
+        media_seconds: float,
+        on_queued: Optional[Callable[[float], Awaitable[None]]] = None
+    ) -> AsyncIterator[EncodeSettings]:
+        """
+        Réserve les cœurs d'un assemblage pour la durée du bloc.
+
+        Args:
+            job_id: Identifiant de l'assemblage (estimation de fin via eta())
+            reencode: Réencodage vidéo (sinon stream copy, un cœur)
+            media_seconds: Durée de la vidéo assemblée
+            on_queued: Callback async appelé avec la fin estimée si l'assemblage doit attendre
+        """
+        job = _EncodeJob(
+            job_id=job_id, reencode=reencode, media_seconds=media_seconds,
+            future=asyncio.get_running_loop().create_future()
+        )
+        self._waiting.append(job)
+        self._dispatch()
+        try:
+            if not job.future.done():
+                self.queued += 1
+                eta = self.eta(job_id)
+                logger.info(f"⏳ Assemblage {job_id[:8]} en attente de cœurs (fin estimée dans ~{eta:.0f}s)")
+                if on_queued:
+                    try:
+                        await on_queued(eta)
+                    except Exception as e:
+                        logger.warning(f"⚠️ Callback d'attente d'assemblage: {e}")
+            settings = await job.future
+        except asyncio.CancelledError:
+            if job.future.done() and not job.future.cancelled():
+                # Les cœurs venaient d'être attribués : les rendre
+                self._finish(job, ok=False)
+            else:
+                job.future.cancel()
+                if job in self._waiting:
+                    self._waiting.remove(job)
+                self._dispatch()
+            raise
+        ok = False
+        try:
+            yield settings
+            ok = True
+        finally:
+            self._finish(job, ok)
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "cpu_budget": self.cpu_budget,
+            "in_use": self._in_use,
+            "running": [
+                {
+                    "job_id": job.job_id,
+                    "threads": job.threads,
+                    "preset": job.preset,
+                    "eta_seconds": round(self._remaining_seconds(job, now), 1)
+                }
+                for job in self._running
+            ],
+            "waiting": [
+                {"job_id": job.job_id, "reencode": job.reencode, "eta_seconds": round(self.eta(job.job_id) or 0, 1)}
+                for job in self._waiting
+            ],
+            "speed": {
+                "copy": round(self._copy_speed, 2),
+                "reencode_per_thread": round(self._reencode_speed, 2)
+            },
+            "completed": self.completed,
+            "failed": self.failed,
+            "queued": self.queued
+        }
+
+
+# Instance globale
+encode_scheduler = EncodeScheduler(cpu_budget=ENCODE_CPU_BUDGET, min_threads=ENCODE_MIN_THREADS)
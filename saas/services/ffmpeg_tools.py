@@ -0,0 +1,408 @@
+"""
+Assemblage vidéo avec ffmpeg / ffprobe (binaires installés par nixpacks).
+
+Les commandes sont lancées en sous-processus asynchrones : la boucle d'événements
+n'est jamais bloquée pendant l'assemblage, dont l'avancement est lu sur la sortie
+-progress de ffmpeg. Les cœurs utilisés (threads, preset x264) sont attribués par
+l'appelant (services.encode_scheduler) une fois le type d'assemblage connu.
+
+Les clips WaveSpeed d'une même animation partagent codec, résolution et fps :
+ils sont alors concaténés sans réencodage vidéo (concat demuxer + stream copy),
+en une seconde environ. Le réencodage complet (mise à l'échelle, fps commun)
+n'a lieu que si les paramètres des clips diffèrent. La normalisation du volume
+(loudnorm) est appliquée dans la même passe ffmpeg ; seule la piste audio est
+alors réencodée.
+
+La même passe produit aussi le MP4 "faststart" (atome moov en tête, lecture
+avant la fin du téléchargement), l'affiche (première image, JPEG) et une bande
+de vignettes pour la navigation dans la vidéo.
+
+package_hls() prépare ensuite, si activé, la diffusion adaptative (HLS) de la
+vidéo assemblée.
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import shutil
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import AsyncContextManager, Awaitable, Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_BIN = shutil.which("ffmpeg") or "ffmpeg"
+FFPROBE_BIN = shutil.which("ffprobe") or "ffprobe"
+
+# Cible de volume des animations (EBU R128, adaptée aux plateformes de streaming)
+LOUDNORM_FILTER = "loudnorm=I=-16:TP=-1.5:LRA=11"
+AUDIO_SAMPLE_RATE = 48000
+# Bande de vignettes : SPRITE_TILES images réparties sur la vidéo, côte à côte
+SPRITE_TILES = 10
+SPRITE_TILE_WIDTH = 160
+# Échelle HLS : (petit côté en pixels, débit vidéo kbit/s, débit max kbit/s)
+HLS_LADDER = ((1080, 5000, 5350), (720, 2800, 3000), (480, 1200, 1300))
+HLS_AUDIO_BITRATE = "128k"
+
+ProgressCallback = Callable[[float], Awaitable[None]]
+
+
+class FFmpegError(Exception):
+    """Échec d'une commande ffmpeg / ffprobe"""
+
+
+@dataclass(frozen=True)
+class EncodeSettings:
+    """Réglages d'un encodage x264"""
+    threads: int = 0  # 0 : choix automatique de ffmpeg
+    preset: str = "veryfast"
+
+
+# Réservation des cœurs d'un assemblage : (réencodage vidéo ?, durée en secondes) -> réglages
+EncodeSlot = Callable[[bool, float], AsyncContextManager[EncodeSettings]]
+
+
+@dataclass(frozen=True)
+class ClipParams:
+    """Paramètres d'un clip qui doivent être identiques pour un stream copy"""
+    video_codec: str
+    width: int
+    height: int
+    frame_rate: str
+    pix_fmt: str
+    audio_codec: Optional[str]
+    sample_rate: Optional[int]
+    channels: Optional[int]
+    duration: float
+
+    @property
+    def concat_key(self) -> tuple:
+        return (
+            self.video_codec, self.width, self.height, self.frame_rate, self.pix_fmt,
+            self.audio_codec, self.sample_rate, self.channels
+        )
+
+
+async def _read_progress(stream: asyncio.StreamReader, total_seconds: float, on_progress: ProgressCallback) -> bytes:
+    """Lit la sortie de -progress pipe:1 et remonte la fraction traitée (par pas de 5 %)"""
+    reported = 0.0
+    async for line in stream:
+        key, _, value = line.decode(errors="replace").strip().partition("=")
+        if key == "out_time_us" and value.isdigit() and total_seconds > 0:
+            fraction = min(int(value) / 1_000_000 / total_seconds, 1.0)
+            if fraction - reported >= 0.05:
+                reported = fraction
+                await on_progress(fraction)
+    return b""
+
+
+async def run_command(
+    args: Sequence[str],
+    timeout: Optional[float] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    total_seconds: float = 0.0
+) -> bytes:
+    """
+    Exécute une commande et retourne sa sortie standard (FFmpegError si code retour non nul).
+
+    Avec on_progress (commandes ffmpeg), l'avancement est lu sur la sortie standard
+    (-progress pipe:1) et rapporté en fraction de total_seconds.
+    """
+    if on_progress is not None:
+        args = [args[0], "-progress", "pipe:1", "-nostats", *args[1:]]
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        if on_progress is None:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        else:
+            stdout, stderr, _ = await asyncio.wait_for(asyncio.gather(
+                _read_progress(process.stdout, total_seconds, on_progress),
+                process.stderr.read(),
+                process.wait()
+            ), timeout=timeout)
+    except BaseException:
+        # Timeout, annulation (y compris depuis le callback de progression) : ne pas laisser ffmpeg tourner
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        tail = stderr.decode(errors="replace").strip().splitlines()[-5:]
+        raise FFmpegError(f"{os.path.basename(args[0])} a échoué ({process.returncode}): {' | '.join(tail)}")
+    return stdout
+
+
+async def probe_clip(path: str) -> ClipParams:
+    """Lit codec, résolution, fps et piste audio d'un clip avec ffprobe"""
+    output = await run_command([
+        FFPROBE_BIN, "-v", "error",
+        "-show_entries", "stream=codec_type,codec_name,width,height,r_frame_rate,pix_fmt,sample_rate,channels",
+        "-show_entries", "format=duration",
+        "-of", "json", path
+    ], timeout=30)
+    info = json.loads(output or b"{}")
+    streams = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video is None:
+        raise FFmpegError(f"Aucune piste vidéo dans {os.path.basename(path)}")
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    return ClipParams(
+        video_codec=video.get("codec_name", ""),
+        width=int(video.get("width") or 0),
+        height=int(video.get("height") or 0),
+        frame_rate=video.get("r_frame_rate", ""),
+        pix_fmt=video.get("pix_fmt", ""),
+        audio_codec=audio.get("codec_name") if audio else None,
+        sample_rate=int(audio["sample_rate"]) if audio and audio.get("sample_rate") else None,
+        channels=int(audio["channels"]) if audio and audio.get("channels") else None,
+        duration=float(info.get("format", {}).get("duration") or 0)
+    )
+
+
+def _frame_rate_value(frame_rate: str) -> float:
+    try:
+        num, _, den = frame_rate.partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 24.0
+
+
+def _preview_graph(
+    source: str, video_label: Optional[str], total_seconds: float,
+    poster_path: Optional[str], sprite_path: Optional[str]
+) -> Tuple[List[str], List[str]]:
+    """
+    Filtres et sorties de l'affiche et de la bande de vignettes, dérivées du flux
+    vidéo source (video_label : branche gardée pour la vidéo réencodée).
+
+    Returns:
+        (filtres à ajouter au filter_complex, arguments des sorties supplémentaires)
+    """
+    branches, filters, outputs = [], [], []
+    if video_label:
+        branches.append(video_label)
+    if poster_path:
+        branches.append("[pv]")
+        filters.append("[pv]trim=end_frame=1[poster]")
+        outputs += ["-map", "[poster]", "-frames:v", "1", "-q:v", "3", "-update", "1", poster_path]
+    if sprite_path and total_seconds > 0:
+        branches.append("[sv]")
+        filters.append(
+            f"[sv]fps={SPRITE_TILES / total_seconds:.6f},scale={SPRITE_TILE_WIDTH}:-2,"
+            f"tile={SPRITE_TILES}x1[sprite]"
+        )
+        outputs += ["-map", "[sprite]", "-frames:v", "1", "-q:v", "5", "-update", "1", sprite_path]
+    if not branches:
+        return [], []
+    return [f"{source}split={len(branches)}{''.join(branches)}", *filters], outputs
+
+
+async def _concat_stream_copy(
+    clip_paths: List[str], output_path: str, normalize_audio: bool, has_audio: bool,
+    on_progress: Optional[ProgressCallback], total_seconds: float,
+    poster_path: Optional[str], sprite_path: Optional[str]
+) -> None:
+    list_path = f"{output_path}.txt"
+    with open(list_path, "w") as f:
+        for path in clip_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        args = [FFMPEG_BIN, "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path]
+        # Les aperçus décodent la vidéo ; la sortie principale reste en stream copy
+        filters, preview_outputs = _preview_graph("[0:v]", None, total_seconds, poster_path, sprite_path)
+        if filters:
+            args += ["-filter_complex", ";".join(filters)]
+        args += ["-map", "0:v:0"] + (["-map", "0:a:0"] if has_audio else []) + ["-c:v", "copy"]
+        if has_audio and normalize_audio:
+            args += ["-af", LOUDNORM_FILTER, "-c:a", "aac", "-b:a", "192k", "-ar", str(AUDIO_SAMPLE_RATE)]
+        elif has_audio:
+            args += ["-c:a", "copy"]
+        args += ["-movflags", "+faststart", output_path, *preview_outputs]
+        await run_command(args, on_progress=on_progress, total_seconds=total_seconds)
+    finally:
+        try:
+            os.remove(list_path)
+        except OSError:
+            pass
+
+
+async def _concat_reencode(
+    clips: List[ClipParams], clip_paths: List[str], output_path: str, normalize_audio: bool,
+    on_progress: Optional[ProgressCallback], total_seconds: float, settings: EncodeSettings,
+    poster_path: Optional[str], sprite_path: Optional[str]
+) -> None:
+    # Format cible : celui du premier clip
+    width, height = clips[0].width, clips[0].height
+    fps = _frame_rate_value(clips[0].frame_rate)
+    has_audio = any(c.audio_codec for c in clips)
+
+    args = [FFMPEG_BIN, "-y", "-v", "error"]
+    for path in clip_paths:
+        args += ["-i", path]
+
+    filters = []
+    concat_inputs = ""
+    for i, clip in enumerate(clips):
+        filters.append(
+            f"[{i}:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps},format=yuv420p[v{i}]"
+        )
+        concat_inputs += f"[v{i}]"
+        if has_audio:
+            if clip.audio_codec:
+                filters.append(f"[{i}:a]aresample={AUDIO_SAMPLE_RATE},aformat=channel_layouts=stereo[a{i}]")
+            else:
+                # Clip muet : silence de même durée pour garder l'audio synchronisé
+                filters.append(f"anullsrc=r={AUDIO_SAMPLE_RATE}:cl=stereo,atrim=duration={clip.duration}[a{i}]")
+            concat_inputs += f"[a{i}]"
+
+    filters.append(f"{concat_inputs}concat=n={len(clips)}:v=1:a={1 if has_audio else 0}[catv]" + ("[cata]" if has_audio else ""))
+    preview_filters, preview_outputs = _preview_graph("[catv]", "[outv]", total_seconds, poster_path, sprite_path)
+    filters += preview_filters
+    if has_audio:
+        filters.append(f"[cata]{LOUDNORM_FILTER if normalize_audio else 'anull'}[outa]")
+
+    if settings.threads:
+        args += ["-filter_complex_threads", str(settings.threads)]
+    args += ["-filter_complex", ";".join(filters), "-map", "[outv]"]
+    if has_audio:
+        args += ["-map", "[outa]", "-c:a", "aac", "-b:a", "192k"]
+    args += ["-c:v", "libx264", "-preset", settings.preset, "-crf", "20"]
+    if settings.threads:
+        args += ["-threads", str(settings.threads)]
+    args += ["-movflags", "+faststart", output_path, *preview_outputs]
+    await run_command(args, on_progress=on_progress, total_seconds=total_seconds)
+
+
+async def concat_clips(
+    clip_paths: List[str],
+    output_path: str,
+    normalize_audio: bool = True,
+    on_progress: Optional[ProgressCallback] = None,
+    encode_slot: Optional[EncodeSlot] = None,
+    poster_path: Optional[str] = None,
+    sprite_path: Optional[str] = None
+) -> str:
+    """
+    Concatène des clips en une vidéo.
+
+    Args:
+        clip_paths: Clips dans l'ordre de lecture (les clips illisibles sont ignorés)
+        output_path: Fichier de sortie (mp4 faststart)
+        normalize_audio: Normalisation du volume (loudnorm) dans la même passe
+        on_progress: Callback async appelé avec la fraction assemblée (0 à 1)
+        encode_slot: Réservation des cœurs, attendue avant de lancer ffmpeg
+            (sinon réglages par défaut, sans limite)
+        poster_path: Affiche à produire (première image, JPEG)
+        sprite_path: Bande de vignettes à produire (SPRITE_TILES images de
+            SPRITE_TILE_WIDTH pixels de large, JPEG)
+
+    Returns:
+        output_path
+    """
+    clips, paths = [], []
+    for path in clip_paths:
+        try:
+            clips.append(await probe_clip(path))
+            paths.append(path)
+        except FFmpegError as e:
+            logger.warning(f"⚠️ Clip ignoré ({os.path.basename(path)}): {e}")
+    if not clips:
+        raise FFmpegError("Aucun clip lisible à assembler")
+    total_seconds = sum(c.duration for c in clips)
+    reencode = len({c.concat_key for c in clips}) > 1
+
+    slot = encode_slot(reencode, total_seconds) if encode_slot else nullcontext(EncodeSettings())
+    async with slot as settings:
+        if not reencode:
+            logger.info(f"⚡ Concaténation sans réencodage de {len(paths)} clips")
+            await _concat_stream_copy(
+                paths, output_path, normalize_audio, clips[0].audio_codec is not None, on_progress, total_seconds,
+                poster_path, sprite_path
+            )
+        else:
+            logger.info(
+                f"🔧 Paramètres des clips différents : réencodage de {len(paths)} clips "
+                f"(preset {settings.preset}, {settings.threads or 'auto'} threads)"
+            )
+            await _concat_reencode(
+                clips, paths, output_path, normalize_audio, on_progress, total_seconds, settings,
+                poster_path, sprite_path
+            )
+    return output_path
+
+
+async def package_hls(
+    video_path: str,
+    output_dir: str,
+    name: str = "hls",
+    segment_seconds: float = 4.0,
+    on_progress: Optional[ProgressCallback] = None,
+    encode_slot: Optional[EncodeSlot] = None
+) -> Tuple[str, List[str]]:
+    """
+    Prépare la diffusion HLS adaptative d'une vidéo, en une seule commande ffmpeg.
+
+    Une rendition par palier de HLS_LADDER jusqu'à la résolution source (pas
+    d'agrandissement), avec images clés alignées sur les segments. Chaque
+    rendition est un seul fichier fMP4 adressé par plages d'octets : quelques
+    fichiers à stocker au lieu de centaines de segments.
+
+    Args:
+        video_path: Vidéo assemblée
+        output_dir: Dossier de sortie
+        name: Préfixe des fichiers (playlist maître : <name>.m3u8)
+        segment_seconds: Durée des segments
+        on_progress: Callback async appelé avec la fraction encodée (0 à 1)
+        encode_slot: Réservation des cœurs (réencodage de toutes les renditions)
+
+    Returns:
+        (playlist maître, tous les fichiers produits)
+    """
+    source = await probe_clip(video_path)
+    portrait = source.height > source.width
+    short_side = min(source.width, source.height)
+    ladder = [tier for tier in HLS_LADDER if tier[0] <= short_side] or [(short_side, *HLS_LADDER[-1][1:])]
+    has_audio = source.audio_codec is not None
+
+    filters = [f"[0:v]split={len(ladder)}" + "".join(f"[s{i}]" for i in range(len(ladder)))]
+    for i, (side, _, _) in enumerate(ladder):
+        scale = f"{side}:-2" if portrait else f"-2:{side}"
+        filters.append(f"[s{i}]scale={scale}[v{i}]")
+
+    slot = encode_slot(True, source.duration * len(ladder)) if encode_slot else nullcontext(EncodeSettings())
+    async with slot as settings:
+        args = [FFMPEG_BIN, "-y", "-v", "error", "-i", video_path, "-filter_complex", ";".join(filters)]
+        for i in range(len(ladder)):
+            args += ["-map", f"[v{i}]"] + (["-map", "0:a:0"] if has_audio else [])
+        args += ["-c:v", "libx264", "-preset", settings.preset, "-sc_threshold", "0",
+                 "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})"]
+        if settings.threads:
+            args += ["-threads", str(settings.threads)]
+        for i, (_, bitrate, maxrate) in enumerate(ladder):
+            args += [f"-b:v:{i}", f"{bitrate}k", f"-maxrate:v:{i}", f"{maxrate}k", f"-bufsize:v:{i}", f"{2 * bitrate}k"]
+        if has_audio:
+            args += ["-c:a", "copy"] if source.audio_codec == "aac" else ["-c:a", "aac", "-b:a", HLS_AUDIO_BITRATE]
+        var_stream_map = " ".join(
+            f"v:{i},a:{i},name:{side}p" if has_audio else f"v:{i},name:{side}p"
+            for i, (side, _, _) in enumerate(ladder)
+        )
+        args += [
+            "-f", "hls", "-hls_time", str(segment_seconds), "-hls_playlist_type", "vod",
+            "-hls_segment_type", "fmp4", "-hls_flags", "single_file+independent_segments",
+            "-hls_fmp4_init_filename", f"{name}_%v_init.mp4",
+            "-hls_segment_filename", os.path.join(output_dir, f"{name}_%v.mp4"),
+            "-master_pl_name", f"{name}.m3u8",
+            "-var_stream_map", var_stream_map,
+            os.path.join(output_dir, f"{name}_%v.m3u8")
+        ]
+        await run_command(args, on_progress=on_progress, total_seconds=source.duration)
+
+    master_path = os.path.join(output_dir, f"{name}.m3u8")
+    if not os.path.exists(master_path):
+        raise FFmpegError("Playlist HLS maître absente")
+    return master_path, sorted(glob.glob(os.path.join(output_dir, f"{name}*")))
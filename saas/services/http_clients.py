@@ -0,0 +1,189 @@
+"""
+Clients HTTP partagés (httpx.AsyncClient) pour tous les appels sortants.
+
+Un client par fournisseur, avec son propre pool de connexions (keep-alive, HTTP/2
+si le paquet h2 est installé), ses limites et ses timeouts. Les clients sont
+ouverts dans le lifespan FastAPI et fermés à l'arrêt ; les services les empruntent
+via get_http_client(provider) au lieu de créer un client par appel, ce qui évite
+une poignée de main TLS à chaque requête.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    """Configuration du pool de connexions d'un fournisseur"""
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry: float
+    connect_timeout: float
+    read_timeout: float
+    write_timeout: float
+    pool_timeout: float
+    http2: bool = True
+    follow_redirects: bool = False
+
+
+# Fournisseurs connus (les timeouts peuvent être surchargés par appel avec timeout=...)
+PROVIDERS: Dict[str, ProviderConfig] = {
+    # Supabase Auth / REST / Storage
+    "supabase": ProviderConfig(
+        max_connections=50, max_keepalive_connections=20, keepalive_expiry=60.0,
+        connect_timeout=5.0, read_timeout=15.0, write_timeout=15.0, pool_timeout=5.0
+    ),
+    # WaveSpeed (soumission et suivi des clips Wan 2.5)
+    "wavespeed": ProviderConfig(
+        max_connections=40, max_keepalive_connections=20, keepalive_expiry=60.0,
+        connect_timeout=10.0, read_timeout=60.0, write_timeout=30.0, pool_timeout=10.0
+    ),
+    # Suno (comptines)
+    "suno": ProviderConfig(
+        max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0,
+        connect_timeout=10.0, read_timeout=30.0, write_timeout=30.0, pool_timeout=10.0
+    ),
+    # Téléchargements de médias (clips, audio, images générées) : CDN divers, redirections
+    "media": ProviderConfig(
+        max_connections=40, max_keepalive_connections=20, keepalive_expiry=30.0,
+        connect_timeout=10.0, read_timeout=120.0, write_timeout=60.0, pool_timeout=30.0,
+        follow_redirects=True
+    ),
+    # Tout le reste (Resend...)
+    "default": ProviderConfig(
+        max_connections=20, max_keepalive_connections=5, keepalive_expiry=30.0,
+        connect_timeout=10.0, read_timeout=30.0, write_timeout=30.0, pool_timeout=10.0
+    ),
+}
+
+
+class _ProviderStats:
+    """Compteurs de requêtes d'un fournisseur (alimentés par les event hooks httpx)"""
+
+    def __init__(self):
+        self.requests = 0
+        self.responses: Dict[str, int] = {}
+        self.http_versions: Dict[str, int] = {}
+
+    async def on_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+
+    async def on_response(self, response: httpx.Response) -> None:
+        status_class = f"{response.status_code // 100}xx"
+        self.responses[status_class] = self.responses.get(status_class, 0) + 1
+        self.http_versions[response.http_version] = self.http_versions.get(response.http_version, 0) + 1
+
+
+class HTTPClientRegistry:
+    """Registre des clients HTTP partagés, un par fournisseur"""
+
+    def __init__(self, providers: Dict[str, ProviderConfig]):
+        self.providers = providers
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, _ProviderStats] = {}
+        self.started_at: Optional[float] = None
+
+    def _create_client(self, provider: str) -> httpx.AsyncClient:
+        config = self.providers[provider]
+        stats = self._stats.setdefault(provider, _ProviderStats())
+        return httpx.AsyncClient(
+            http2=config.http2 and HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(
+                connect=config.connect_timeout,
+                read=config.read_timeout,
+                write=config.write_timeout,
+                pool=config.pool_timeout
+            ),
+            follow_redirects=config.follow_redirects,
+            event_hooks={"request": [stats.on_request], "response": [stats.on_response]}
+        )
+
+    async def start(self) -> None:
+        """Ouvre les clients de tous les fournisseurs (appelé dans le lifespan FastAPI)"""
+        for provider in self.providers:
+            self.get(provider)
+        self.started_at = time.time()
+        logger.info(f"Clients HTTP partagés prêts ({', '.join(self.providers)}) - HTTP/2: {HTTP2_AVAILABLE}")
+
+    def get(self, provider: str = "default") -> httpx.AsyncClient:
+        """
+        Retourne le client partagé du fournisseur.
+        Créé à la demande si le lifespan n'a pas encore été exécuté (scripts, tâches planifiées).
+        """
+        if provider not in self.providers:
+            provider = "default"
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = self._create_client(provider)
+            self._clients[provider] = client
+        return client
+
+    async def aclose(self) -> None:
+        """Ferme tous les clients (appelé à l'arrêt de l'application)"""
+        for provider, client in list(self._clients.items()):
+            try:
+                await client.aclose()
+            except Exception as exc:
+                logger.warning(f"Fermeture du client HTTP {provider} impossible: {exc}")
+        self._clients.clear()
+
+    @staticmethod
+    def _pool_stats(client: httpx.AsyncClient) -> Dict[str, Any]:
+        """État du pool httpcore sous-jacent (best-effort, API interne de httpx)"""
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {}
+        return {
+            "connections": len(connections),
+            "idle": sum(1 for conn in connections if conn.is_idle()),
+            "http2": sum(1 for conn in connections if type(getattr(conn, "_connection", None)).__name__ == "AsyncHTTP2Connection"),
+            "queued_requests": len(getattr(pool, "_requests", []))
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques des pools et des requêtes par fournisseur"""
+        providers = {}
+        for provider, config in self.providers.items():
+            client = self._clients.get(provider)
+            stats = self._stats.get(provider)
+            providers[provider] = {
+                "open": client is not None and not client.is_closed,
+                "max_connections": config.max_connections,
+                "max_keepalive_connections": config.max_keepalive_connections,
+                "pool": self._pool_stats(client) if client is not None and not client.is_closed else {},
+                "requests": stats.requests if stats else 0,
+                "responses": dict(stats.responses) if stats else {},
+                "http_versions": dict(stats.http_versions) if stats else {}
+            }
+        return {
+            "http2_available": HTTP2_AVAILABLE,
+            "started_at": self.started_at,
+            "providers": providers
+        }
+
+
+# Instance globale
+http_clients = HTTPClientRegistry(PROVIDERS)
+
+
+def get_http_client(provider: str = "default") -> httpx.AsyncClient:
+    """Retourne le client HTTP partagé d'un fournisseur (supabase, wavespeed, suno, media, default)"""
+    return http_clients.get(provider)
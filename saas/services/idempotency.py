@@ -0,0 +1,196 @@
+"""
+Idempotence des endpoints de génération.
+
+Un double-clic ou une relance client ne doit pas lancer une seconde fois un
+pipeline coûteux (Gemini, WaveSpeed, Suno) :
+
+- Avec un header Idempotency-Key, la réponse est conservée dans le task store
+  (durée TASK_RETENTION_SECONDS, partagée entre workers avec sqlite/redis) et
+  rejouée telle quelle ; la même clé avec un corps différent est refusée (422).
+- Sans header, deux requêtes identiques (même utilisateur, même endpoint, même
+  corps) sont fusionnées tant que la première est en cours ; une fois terminée,
+  une requête identique relance la génération (bouton "regénérer").
+
+Une requête en double attend la requête d'origine et reçoit sa réponse (et donc
+le même task_id pour les générations en arrière-plan). Les erreurs ne sont pas
+mises en cache : une nouvelle tentative après un échec relance la génération.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from config import IDEMPOTENCY_CACHE_SECONDS, IDEMPOTENCY_CACHE_MAX_ENTRIES
+from services.supabase_auth import supabase_user_resolver
+from services.task_store import task_store
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_RECORDS = "idempotency"
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+def _sha256(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Empreinte du corps de la requête (indépendante de l'ordre des clés)"""
+    return _sha256(json.dumps(jsonable_encoder(payload), sort_keys=True, default=str))
+
+
+class IdempotencyRegistry:
+    """Réponses rejouables et requêtes en cours, par utilisateur et par endpoint"""
+
+    def __init__(self, cache_seconds: float = 30, max_entries: int = 10000):
+        """
+        Args:
+            cache_seconds: Cache local des réponses à clé explicite (devant le task store)
+            max_entries: Nombre maximum de réponses gardées en mémoire
+        """
+        self.cache_seconds = cache_seconds
+        # Réponses des requêtes avec Idempotency-Key uniquement
+        self._responses = TTLCache(maxsize=max_entries, ttl=cache_seconds)
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self.replayed = 0
+        self.coalesced = 0
+        self.executed = 0
+
+    async def _load(self, cache_key: str, explicit: bool) -> Optional[Dict[str, Any]]:
+        if not explicit:
+            return None
+        entry = self._responses.get(cache_key)
+        if entry is None:
+            try:
+                entry = await task_store.get(IDEMPOTENCY_RECORDS, cache_key)
+            except Exception as exc:
+                logger.warning(f"Lecture de la réponse idempotente impossible: {exc}")
+        return entry
+
+    async def _save(self, cache_key: str, entry: Dict[str, Any], explicit: bool) -> None:
+        # Sans clé, seule la requête en cours est partagée : rien n'est conservé après la fin
+        if not explicit:
+            return
+        self._responses.set(cache_key, entry)
+        try:
+            # Statut terminal : la rétention du task store s'applique
+            await task_store.create(IDEMPOTENCY_RECORDS, cache_key, {"status": "completed", **entry})
+        except Exception as exc:
+            logger.warning(f"Écriture de la réponse idempotente impossible: {exc}")
+
+    @staticmethod
+    def _check_fingerprint(entry: Dict[str, Any], fingerprint: str) -> None:
+        if entry.get("fingerprint") != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail=f"{IDEMPOTENCY_HEADER} déjà utilisée pour une requête différente"
+            )
+
+    @staticmethod
+    def _replay(response: Any) -> JSONResponse:
+        return JSONResponse(content=response, headers={REPLAYED_HEADER: "true"})
+
+    async def run(
+        self,
+        user_id: str,
+        scope: str,
+        payload: Any,
+        handler: Callable[[], Awaitable[Any]],
+        idempotency_key: Optional[str] = None
+    ) -> Any:
+        """
+        Exécute handler une seule fois pour une même requête.
+
+        Args:
+            user_id: Utilisateur authentifié (les clés sont propres à chaque utilisateur)
+            scope: Nom de l'endpoint
+            payload: Corps de la requête (avant toute modification par le handler)
+            handler: Génération à exécuter
+            idempotency_key: Valeur du header Idempotency-Key (None = déduplication automatique)
+        """
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} invalide (1 à {MAX_KEY_LENGTH} caractères)")
+
+        explicit = idempotency_key is not None
+        fingerprint = request_fingerprint(payload)
+        cache_key = _sha256(f"{user_id}:{scope}:{'key:' + idempotency_key if explicit else 'auto:' + fingerprint}")
+
+        entry = await self._load(cache_key, explicit)
+        if entry is not None:
+            self._check_fingerprint(entry, fingerprint)
+            self.replayed += 1
+            return self._replay(entry["response"])
+
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            inflight_fingerprint, future = inflight
+            self._check_fingerprint({"fingerprint": inflight_fingerprint}, fingerprint)
+            self.coalesced += 1
+            await asyncio.wait({future})
+            if future.cancelled():
+                # La requête d'origine a été annulée : relancer
+                return await self.run(user_id, scope, payload, handler, idempotency_key)
+            return self._replay(future.result())
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = (fingerprint, future)
+        try:
+            response = await handler()
+            self.executed += 1
+            encoded = jsonable_encoder(response)
+            await self._save(cache_key, {"fingerprint": fingerprint, "response": encoded}, explicit)
+            future.set_result(encoded)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Marquer l'exception comme récupérée s'il n'y a aucune requête en attente
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(cache_key, None)
+
+    async def handle(
+        self,
+        request: Optional[Request],
+        scope: str,
+        payload: Any,
+        handler: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Point d'entrée des endpoints : lit le header Authorization et Idempotency-Key.
+        Sans utilisateur authentifié, le handler est exécuté directement (il renverra 401).
+        """
+        headers = request.headers if request is not None else {}
+        user_id = await supabase_user_resolver.resolve_authorization(headers.get("authorization"))
+        if not user_id:
+            return await handler()
+        return await self.run(user_id, scope, payload, handler, headers.get(IDEMPOTENCY_HEADER.lower()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "cache_seconds": self.cache_seconds,
+            "cache": self._responses.get_stats(),
+            "inflight": len(self._inflight),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "coalesced": self.coalesced
+        }
+
+
+# Instance globale
+idempotency = IdempotencyRegistry(
+    cache_seconds=IDEMPOTENCY_CACHE_SECONDS,
+    max_entries=IDEMPOTENCY_CACHE_MAX_ENTRIES
+)
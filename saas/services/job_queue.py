@@ -0,0 +1,377 @@
+"""
+File d'attente bornée pour les générations longues (animations, BD).
+
+Chaque type de tâche dispose d'un nombre fixe de workers et d'une profondeur de
+file maximale : au-delà, la soumission est refusée (HTTP 429 avec Retry-After)
+au lieu de lancer un pipeline de plus. Les workers gardent une référence sur les
+tâches en cours (pas de asyncio.create_task orphelin) et la file expose la
+position et le temps d'attente estimé de chaque tâche.
+
+L'ordre de passage n'est pas FIFO : les jobs sont ordonnancés par weighted fair
+queuing entre utilisateurs (un utilisateur qui soumet dix animations n'en bloque
+pas dix autres), avec un poids plus élevé pour la voie prioritaire (abonnés) et
+un nombre maximal de jobs simultanés par utilisateur.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import (
+    JOB_QUEUE_ANIMATION_WORKERS, JOB_QUEUE_ANIMATION_MAX_DEPTH,
+    JOB_QUEUE_COMIC_WORKERS, JOB_QUEUE_COMIC_MAX_DEPTH,
+    JOB_QUEUE_ANIMATION_USER_MAX_RUNNING, JOB_QUEUE_COMIC_USER_MAX_RUNNING, JOB_QUEUE_USER_MAX_PENDING,
+    JOB_QUEUE_PRIORITY_WEIGHT, JOB_QUEUE_STANDARD_WEIGHT
+)
+from services.task_store import ANIMATION_TASKS, COMIC_TASKS
+from services.subscription_tiers import PRIORITY_TIER, STANDARD_TIER
+
+logger = logging.getLogger(__name__)
+
+# Poids des voies de priorité (part de la capacité quand les deux voies sont chargées)
+TIER_WEIGHTS = {
+    PRIORITY_TIER: JOB_QUEUE_PRIORITY_WEIGHT,
+    STANDARD_TIER: JOB_QUEUE_STANDARD_WEIGHT,
+}
+
+# Clé d'équité commune à tous les utilisateurs non authentifiés
+ANONYMOUS_USER = "anonymous"
+
+
+class JobCancelled(Exception):
+    """Annulation demandée pendant que le job tourne dans ce worker, détectée par le job lui-même
+    (statut "cancelled" écrit par un autre worker) : il s'arrête à sa prochaine étape"""
+
+
+class QueueFullError(Exception):
+    """File pleine pour ce type de tâche (ou trop de jobs en attente pour cet utilisateur)"""
+
+    def __init__(self, kind: str, retry_after: int, per_user: bool = False):
+        scope = "pour cet utilisateur" if per_user else "pleine"
+        super().__init__(f"File d'attente {kind} {scope}, réessayer dans {retry_after}s")
+        self.kind = kind
+        self.retry_after = retry_after
+        self.per_user = per_user
+
+
+@dataclass(frozen=True)
+class LaneConfig:
+    """Configuration d'une file (un type de tâche)"""
+    workers: int
+    max_depth: int
+    # Durée moyenne d'un job avant la première mesure (secondes)
+    initial_duration: float
+    # Jobs simultanés par utilisateur
+    user_max_running: int = 1
+    # Jobs en attente par utilisateur
+    user_max_pending: int = 5
+
+
+@dataclass
+class Job:
+    job_id: str
+    run: Callable[[], Awaitable[Any]]
+    user_id: Optional[str] = None
+    tier: str = STANDARD_TIER
+    cost: float = 1.0
+    # Tag de fin virtuel (weighted fair queuing) : plus petit = servi plus tôt
+    finish_tag: float = 0.0
+    enqueued_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    # Tâche asyncio du job en cours d'exécution (annulable)
+    task: Optional[asyncio.Task] = None
+
+    @property
+    def user_key(self) -> str:
+        return self.user_id or ANONYMOUS_USER
+
+
+class _Lane:
+    """Jobs en attente et workers d'un type de tâche"""
+
+    def __init__(self, kind: str, config: LaneConfig):
+        self.kind = kind
+        self.config = config
+        self.pending: Dict[str, Job] = {}
+        self.running: Dict[str, Job] = {}
+        self.workers: List[asyncio.Task] = []
+        self.wakeup = asyncio.Event()
+        # Temps virtuel de la file et dernier tag attribué par utilisateur
+        self.virtual_time = 0.0
+        self.user_last_tag: Dict[str, float] = {}
+        self.user_running: Dict[str, int] = {}
+        self.user_pending: Dict[str, int] = {}
+        # Moyenne glissante des durées (estimation des temps d'attente)
+        self.avg_duration = config.initial_duration
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.started_by_tier: Dict[str, int] = {}
+
+    def record_duration(self, seconds: float) -> None:
+        self.avg_duration = 0.8 * self.avg_duration + 0.2 * seconds
+
+    def enqueue(self, job: Job) -> None:
+        # Le tag d'un job suit celui du job précédent du même utilisateur : ses jobs
+        # s'intercalent avec ceux des autres au lieu de passer en bloc
+        weight = TIER_WEIGHTS.get(job.tier, JOB_QUEUE_STANDARD_WEIGHT)
+        start_tag = max(self.virtual_time, self.user_last_tag.get(job.user_key, 0.0))
+        job.finish_tag = start_tag + job.cost / weight
+        self.user_last_tag[job.user_key] = job.finish_tag
+        self.pending[job.job_id] = job
+        self.user_pending[job.user_key] = self.user_pending.get(job.user_key, 0) + 1
+
+    def ordered_pending(self) -> List[Job]:
+        return sorted(self.pending.values(), key=lambda job: (job.finish_tag, job.enqueued_at))
+
+    def pop_next(self) -> Optional[Job]:
+        """Prochain job éligible (plus petit tag parmi les utilisateurs sous leur plafond)"""
+        for job in self.ordered_pending():
+            if self.user_running.get(job.user_key, 0) < self.config.user_max_running:
+                self._remove_pending(job)
+                self.virtual_time = max(self.virtual_time, job.finish_tag - job.cost / TIER_WEIGHTS.get(job.tier, JOB_QUEUE_STANDARD_WEIGHT))
+                self.user_running[job.user_key] = self.user_running.get(job.user_key, 0) + 1
+                self.started_by_tier[job.tier] = self.started_by_tier.get(job.tier, 0) + 1
+                return job
+        return None
+
+    def _remove_pending(self, job: Job) -> None:
+        del self.pending[job.job_id]
+        remaining = self.user_pending.get(job.user_key, 0) - 1
+        if remaining > 0:
+            self.user_pending[job.user_key] = remaining
+        else:
+            self.user_pending.pop(job.user_key, None)
+
+    def finish(self, job: Job) -> None:
+        remaining = self.user_running.get(job.user_key, 0) - 1
+        if remaining > 0:
+            self.user_running[job.user_key] = remaining
+        else:
+            self.user_running.pop(job.user_key, None)
+        # Oublier les utilisateurs inactifs (leur tag est de toute façon dépassé)
+        if job.user_key not in self.user_pending and job.user_key not in self.user_running:
+            if self.user_last_tag.get(job.user_key, 0.0) <= self.virtual_time:
+                self.user_last_tag.pop(job.user_key, None)
+
+
+class JobQueue:
+    """Files d'attente et pools de workers par type de tâche"""
+
+    def __init__(self, lanes: Dict[str, LaneConfig]):
+        self._lanes = {kind: _Lane(kind, config) for kind, config in lanes.items()}
+        self.started = False
+
+    def _lane(self, kind: str) -> _Lane:
+        lane = self._lanes.get(kind)
+        if lane is None:
+            raise ValueError(f"Type de tâche inconnu pour la file d'attente: {kind}")
+        return lane
+
+    async def start(self) -> None:
+        """Démarre les workers de toutes les files (appelé dans le lifespan FastAPI)"""
+        if self.started:
+            return
+        for lane in self._lanes.values():
+            for index in range(lane.config.workers):
+                lane.workers.append(asyncio.create_task(self._worker(lane), name=f"job-worker-{lane.kind}-{index}"))
+        self.started = True
+        logger.info("File d'attente démarrée: " + ", ".join(
+            f"{kind}={lane.config.workers} workers/{lane.config.max_depth} max" for kind, lane in self._lanes.items()
+        ))
+
+    async def _worker(self, lane: _Lane) -> None:
+        while True:
+            job = lane.pop_next()
+            if job is None:
+                # Rien d'éligible : attendre une soumission ou la fin d'un job
+                lane.wakeup.clear()
+                await lane.wakeup.wait()
+                continue
+            job.started_at = time.time()
+            lane.running[job.job_id] = job
+            # Le job tourne dans sa propre tâche : cancel() l'interrompt sans arrêter le worker
+            job.task = asyncio.create_task(job.run(), name=f"job-{lane.kind}-{job.job_id}")
+            try:
+                await job.task
+                lane.completed += 1
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    # Arrêt du worker (fin de l'application)
+                    job.task.cancel()
+                    raise
+                lane.cancelled += 1
+                logger.info(f"Job {lane.kind} {job.job_id} annulé")
+            except JobCancelled:
+                lane.cancelled += 1
+                logger.info(f"Job {lane.kind} {job.job_id} annulé (demande reçue par un autre worker)")
+            except Exception as exc:
+                lane.failed += 1
+                logger.error(f"Job {lane.kind} {job.job_id} en échec: {exc}")
+            finally:
+                lane.running.pop(job.job_id, None)
+                lane.finish(job)
+                lane.record_duration(time.time() - job.started_at)
+                # Un job de cet utilisateur bloqué par son plafond peut maintenant partir
+                lane.wakeup.set()
+
+    async def submit(
+        self,
+        kind: str,
+        job_id: str,
+        run: Callable[[], Awaitable[Any]],
+        user_id: Optional[str] = None,
+        tier: str = STANDARD_TIER,
+        cost: float = 1.0
+    ) -> Dict[str, Any]:
+        """
+        Ajoute un job à la file de son type.
+
+        Args:
+            run: Fabrique de la coroutine à exécuter (appelée par le worker)
+            user_id: Utilisateur (équité et plafonds par utilisateur)
+            tier: Voie de priorité (priority ou standard)
+            cost: Coût relatif du job (ex: durée de l'animation), pèse sur le rang des jobs suivants de l'utilisateur
+
+        Returns:
+            {"queue_position": ..., "estimated_wait": ..., "priority": ...}
+
+        Raises:
+            QueueFullError: la file (ou la part de l'utilisateur) a atteint sa profondeur maximale
+        """
+        lane = self._lane(kind)
+        if not self.started:
+            await self.start()
+        if len(lane.pending) >= lane.config.max_depth:
+            lane.rejected += 1
+            raise QueueFullError(kind, self.retry_after(kind))
+        user_key = user_id or ANONYMOUS_USER
+        if lane.user_pending.get(user_key, 0) >= lane.config.user_max_pending:
+            lane.rejected += 1
+            raise QueueFullError(kind, self.retry_after(kind), per_user=True)
+
+        lane.enqueue(Job(job_id=job_id, run=run, user_id=user_id, tier=tier, cost=max(cost, 0.1)))
+        lane.submitted += 1
+        lane.wakeup.set()
+        position = self.position(kind, job_id) or 0
+        return {"queue_position": position, "estimated_wait": self.estimated_wait(kind, position), "priority": tier}
+
+    async def cancel(self, kind: str, job_id: str, timeout: float = 15.0) -> Optional[str]:
+        """
+        Annule un job : retiré de la file s'il attend, interrompu s'il est en cours
+        (la place du worker revient aussitôt au job suivant).
+
+        Args:
+            timeout: Attente maximale de la fin effective d'un job en cours (secondes)
+
+        Returns:
+            "queued" ou "running" selon l'état du job annulé, None si le job est inconnu de ce processus
+        """
+        lane = self._lane(kind)
+        job = lane.pending.get(job_id)
+        if job is not None:
+            lane._remove_pending(job)
+            lane.cancelled += 1
+            return "queued"
+
+        job = lane.running.get(job_id)
+        if job is None or job.task is None:
+            return None
+        job.task.cancel()
+        # Attendre que les finally du pipeline aient libéré leurs ressources (sémaphores, fichiers)
+        await asyncio.wait({job.task}, timeout=timeout)
+        return "running"
+
+    def job_ids(self, kind: str) -> List[str]:
+        """Jobs de ce processus, en attente ou en cours"""
+        lane = self._lane(kind)
+        return [*lane.pending, *lane.running]
+
+    def position(self, kind: str, job_id: str) -> Optional[int]:
+        """Position dans la file (1 = prochain job), 0 si en cours d'exécution, None si inconnu"""
+        lane = self._lanes.get(kind)
+        if lane is None:
+            return None
+        if job_id in lane.running:
+            return 0
+        job = lane.pending.get(job_id)
+        if job is None:
+            return None
+        return 1 + sum(
+            1 for other in lane.pending.values()
+            if (other.finish_tag, other.enqueued_at) < (job.finish_tag, job.enqueued_at)
+        )
+
+    def estimated_wait(self, kind: str, position: int) -> int:
+        """Temps d'attente estimé (secondes) avant le démarrage du job à cette position"""
+        lane = self._lane(kind)
+        if position <= 0:
+            return 0
+        # Jobs devant ce job qui doivent se terminer avant qu'un worker se libère
+        ahead = len(lane.running) + position - lane.config.workers
+        if ahead <= 0:
+            return 0
+        return math.ceil(ahead * lane.avg_duration / lane.config.workers)
+
+    def retry_after(self, kind: str) -> int:
+        """Délai conseillé avant une nouvelle soumission (une place se libère en moyenne)"""
+        lane = self._lane(kind)
+        return max(5, math.ceil(lane.avg_duration / lane.config.workers))
+
+    async def aclose(self) -> None:
+        """Arrête les workers (appelé à l'arrêt de l'application)"""
+        workers = [worker for lane in self._lanes.values() for worker in lane.workers]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        for lane in self._lanes.values():
+            lane.workers.clear()
+        self.started = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            kind: {
+                "workers": lane.config.workers,
+                "max_depth": lane.config.max_depth,
+                "user_max_running": lane.config.user_max_running,
+                "user_max_pending": lane.config.user_max_pending,
+                "pending": len(lane.pending),
+                "pending_by_tier": {
+                    tier: sum(1 for job in lane.pending.values() if job.tier == tier) for tier in TIER_WEIGHTS
+                },
+                "running": len(lane.running),
+                "active_users": len(set(lane.user_pending) | set(lane.user_running)),
+                "avg_duration": round(lane.avg_duration, 1),
+                "submitted": lane.submitted,
+                "rejected": lane.rejected,
+                "completed": lane.completed,
+                "failed": lane.failed,
+                "cancelled": lane.cancelled,
+                "started_by_tier": dict(lane.started_by_tier)
+            }
+            for kind, lane in self._lanes.items()
+        }
+
+
+# Instance globale
+job_queue = JobQueue({
+    ANIMATION_TASKS: LaneConfig(
+        workers=JOB_QUEUE_ANIMATION_WORKERS,
+        max_depth=JOB_QUEUE_ANIMATION_MAX_DEPTH,
+        initial_duration=360.0,
+        user_max_running=JOB_QUEUE_ANIMATION_USER_MAX_RUNNING,
+        user_max_pending=JOB_QUEUE_USER_MAX_PENDING
+    ),
+    COMIC_TASKS: LaneConfig(
+        workers=JOB_QUEUE_COMIC_WORKERS,
+        max_depth=JOB_QUEUE_COMIC_MAX_DEPTH,
+        initial_duration=120.0,
+        user_max_running=JOB_QUEUE_COMIC_USER_MAX_RUNNING,
+        user_max_pending=JOB_QUEUE_USER_MAX_PENDING
+    ),
+})
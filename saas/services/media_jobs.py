@@ -0,0 +1,89 @@
+"""
+Traitements d'images exécutés dans les processus du media worker.
+
+Fonctions de module, sans dépendance vers le reste de l'application : elles sont
+importées par les processus enfants (démarrage "spawn") et leurs arguments et
+résultats doivent être sérialisables (bytes, chemins, tuples).
+"""
+
+import io
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+
+def save_png(image_data: bytes, output_path: str) -> Tuple[int, int]:
+    """Enregistre l'image en PNG optimisé, aux dimensions d'origine"""
+    with Image.open(io.BytesIO(image_data)) as img:
+        img.save(output_path, 'PNG', optimize=True)
+        return img.size
+
+
+def crop_png(image_data: bytes, output_path: str, box: Tuple[int, int, int, int]) -> Tuple[int, int]:
+    """Extrait la zone box (gauche, haut, droite, bas) et l'enregistre en PNG optimisé"""
+    with Image.open(io.BytesIO(image_data)) as img:
+        cropped = img.crop(box)
+        cropped.save(output_path, 'PNG', optimize=True)
+        return cropped.size
+
+
+def fit_png(
+    image_data: bytes,
+    output_path: str,
+    original_size: Optional[Tuple[int, int]] = None,
+    min_size: int = 1536,
+    ratio_tolerance: float = 0.05
+) -> Dict[str, Any]:
+    """
+    Redimensionne l'image générée aux dimensions de la photo d'origine (au moins
+    min_size x min_size si la photo est petite) et l'enregistre en PNG optimisé.
+    Si les ratios diffèrent de plus de ratio_tolerance, l'image est redimensionnée
+    en conservant son ratio et centrée sur un fond blanc.
+
+    Returns:
+        generated, final (dimensions), mode ("none", "resized" ou "adjusted"), resized (dimensions intermédiaires)
+    """
+    with Image.open(io.BytesIO(image_data)) as generated_img:
+        generated_width, generated_height = generated_img.size
+        generated_ratio = generated_width / generated_height
+
+        if original_size and original_size[0] and original_size[1]:
+            original_width, original_height = original_size
+            if original_width < min_size or original_height < min_size:
+                final_width = final_height = min_size
+            else:
+                final_width, final_height = original_width, original_height
+        else:
+            final_width = max(generated_width, min_size)
+            final_height = max(generated_height, min_size)
+
+        info: Dict[str, Any] = {
+            "generated": (generated_width, generated_height),
+            "final": (final_width, final_height),
+            "mode": "none",
+            "resized": None
+        }
+
+        if (generated_width, generated_height) == (final_width, final_height):
+            generated_img.save(output_path, 'PNG', optimize=True)
+            return info
+
+        target_ratio = final_width / final_height
+        ratio_diff = abs(generated_ratio - target_ratio) / target_ratio if target_ratio > 0 else 1
+        if ratio_diff > ratio_tolerance:
+            if target_ratio > generated_ratio:
+                new_width = final_width
+                new_height = int(final_width / generated_ratio)
+            else:
+                new_height = final_height
+                new_width = int(final_height * generated_ratio)
+            temp_resized = generated_img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            final_img = Image.new('RGB', (final_width, final_height), 'white')
+            final_img.paste(temp_resized, ((final_width - new_width) // 2, (final_height - new_height) // 2))
+            info.update(mode="adjusted", resized=(new_width, new_height), ratio_diff=ratio_diff)
+        else:
+            final_img = generated_img.resize((final_width, final_height), Image.Resampling.LANCZOS)
+            info["mode"] = "resized"
+
+        final_img.save(output_path, 'PNG', optimize=True)
+        return info
@@ -0,0 +1,116 @@
+"""
+Media worker : traitements CPU (images, vidéo) hors du processus web.
+
+- Les traitements d'images Pillow (redimensionnement, PNG optimize=True) sont
+  exécutés dans un pool de processus (services.media_jobs) : la boucle
+  d'événements et le GIL du processus web restent libres pendant ce temps.
+- Les assemblages vidéo sont des sous-processus ffmpeg (services.ffmpeg_tools),
+  admis selon le budget CPU de l'instance (services.encode_scheduler).
+
+Le nombre de places (MEDIA_WORKER_PROCESSES) borne les traitements d'images
+simultanés d'une instance, indépendamment du nombre de requêtes servies.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from config import MEDIA_WORKER_PROCESSES
+
+logger = logging.getLogger(__name__)
+
+
+class _JobStats:
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+
+    def record(self, seconds: float, ok: bool) -> None:
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+        self.total_seconds += seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        done = self.completed + self.failed
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_seconds": round(self.total_seconds / done, 2) if done else None
+        }
+
+
+class MediaWorker:
+    """Pool de processus et places pour les traitements média"""
+
+    def __init__(self, processes: int = 2):
+        """
+        Args:
+            processes: Nombre de processus du pool et de traitements média simultanés
+        """
+        self.processes = max(1, processes)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(self.processes)
+        self._running = 0
+        self._waiting = 0
+        self._stats: Dict[str, _JobStats] = {}
+
+    def start(self) -> None:
+        """Démarre le pool (appelé dans le lifespan FastAPI, sinon au premier traitement)"""
+        if self._pool is None:
+            # spawn : les enfants n'héritent pas de la boucle ni des clients du processus web
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"🎞️ Media worker démarré ({self.processes} processus)")
+
+    @asynccontextmanager
+    async def slot(self, kind: str) -> AsyncIterator[None]:
+        """Place de traitement, rendue à la sortie du bloc"""
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._running += 1
+        started_at = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self._running -= 1
+            self._slots.release()
+            self._stats.setdefault(kind, _JobStats()).record(time.monotonic() - started_at, ok)
+
+    async def run(self, kind: str, func: Callable[..., Any], *args: Any) -> Any:
+        """Exécute func(*args) dans un processus du pool (func doit être une fonction de module)"""
+        self.start()
+        async with self.slot(kind):
+            return await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+
+    async def aclose(self) -> None:
+        """Arrête le pool (arrêt de l'application)"""
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "processes": self.processes,
+            "started": self._pool is not None,
+            "running": self._running,
+            "waiting": self._waiting,
+            "jobs": {kind: stats.as_dict() for kind, stats in self._stats.items()}
+        }
+
+
+# Instance globale
+media_worker = MediaWorker(processes=MEDIA_WORKER_PROCESSES)
@@ -7,9 +7,9 @@ import asyncio
 import os
 from datetime import datetime
 from typing import Dict, Any, Optional
-from openai import AsyncOpenAI
 from config import OPENAI_API_KEY, TEXT_MODEL
 from services.suno_service import suno_service, NURSERY_RHYME_STYLES
+from services.ai_clients import get_async_openai
 
 class MusicalNurseryRhymeService:
     def __init__(self):
@@ -116,7 +116,7 @@ class MusicalNurseryRhymeService:
             
             prompt = self._build_lyrics_prompt(rhyme_type, custom_request, style_info)
             
-            client = AsyncOpenAI(api_key=self.openai_key)
+            client = get_async_openai(self.openai_key)
             
             start_time = datetime.now()
             response = await client.chat.completions.create(
@@ -0,0 +1,95 @@
+"""
+Points de reprise du pipeline d'animation (WanVideoOrchestrator).
+
+Chaque étape coûteuse est enregistrée dans le task store au fil de l'eau : le
+scénario généré, l'identifiant de prédiction WaveSpeed et l'URL vidéo de chaque
+scène, la vidéo assemblée puis l'URL finale. Si le processus est interrompu
+(déploiement, redémarrage, OOM), le pipeline relancé avec le même identifiant
+reprend le suivi des prédictions existantes au lieu de les soumettre (et de les
+payer) une seconde fois.
+
+La reprise après redémarrage suppose un task store persistant (sqlite ou redis) ;
+avec le backend memory, les points de reprise ne servent qu'aux relances dans le
+même processus.
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+from services.task_store import TaskStore, task_store
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_CHECKPOINTS = "pipeline_checkpoint"
+
+
+def scene_field(scene_number: int) -> str:
+    """Champ du point de reprise d'une scène (un champ par scène : mises à jour concurrentes sans conflit)"""
+    return f"scene_{scene_number}"
+
+
+class PipelineCheckpoints:
+    """Lecture et écriture des points de reprise (les erreurs d'écriture ne font pas échouer le pipeline)"""
+
+    def __init__(self, store: TaskStore):
+        self.store = store
+        self.saved = 0
+        self.resumed = 0
+        self.errors = 0
+
+    @property
+    def persistent(self) -> bool:
+        return self.store.persistent
+
+    async def load(self, checkpoint_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            checkpoint = await self.store.get(PIPELINE_CHECKPOINTS, checkpoint_id)
+        except Exception as exc:
+            self.errors += 1
+            logger.warning(f"⚠️ Lecture du point de reprise {checkpoint_id} impossible: {exc}")
+            return None
+        if checkpoint:
+            self.resumed += 1
+        return checkpoint
+
+    async def start(self, checkpoint_id: str, **fields: Any) -> None:
+        """Crée le point de reprise d'un pipeline qui démarre"""
+        try:
+            await self.store.create(PIPELINE_CHECKPOINTS, checkpoint_id, {"status": "running", **fields})
+            self.saved += 1
+        except Exception as exc:
+            self.errors += 1
+            logger.warning(f"⚠️ Création du point de reprise {checkpoint_id} impossible: {exc}")
+
+    async def save(self, checkpoint_id: str, **fields: Any) -> None:
+        """Enregistre une étape terminée"""
+        try:
+            await self.store.update(PIPELINE_CHECKPOINTS, checkpoint_id, **fields)
+            self.saved += 1
+        except Exception as exc:
+            self.errors += 1
+            logger.warning(f"⚠️ Écriture du point de reprise {checkpoint_id} impossible: {exc}")
+
+    async def save_scene(self, checkpoint_id: str, scene_number: int, **state: Any) -> None:
+        """Enregistre l'état d'une scène (prediction_id, video_url)"""
+        await self.save(checkpoint_id, **{scene_field(scene_number): state})
+
+    async def clear(self, checkpoint_id: str) -> None:
+        """Supprime le point de reprise d'un pipeline terminé (succès ou échec définitif)"""
+        try:
+            await self.store.delete(PIPELINE_CHECKPOINTS, checkpoint_id)
+        except Exception as exc:
+            self.errors += 1
+            logger.warning(f"⚠️ Suppression du point de reprise {checkpoint_id} impossible: {exc}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "persistent": self.persistent,
+            "saved": self.saved,
+            "resumed": self.resumed,
+            "errors": self.errors
+        }
+
+
+# Instance globale
+pipeline_checkpoints = PipelineCheckpoints(task_store)
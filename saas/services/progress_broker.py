@@ -0,0 +1,338 @@
+"""
+Diffusion de la progression des tâches (animations, BD, comptines) vers les clients.
+
+Les tâches publient leurs changements d'état dans le broker ; chaque connexion
+(SSE ou WebSocket) s'abonne une seule fois pour un utilisateur et reçoit les
+événements de toutes ses tâches en cours, au lieu d'interroger /status/{task_id},
+/status_comic/{task_id} et /check_task_status/{task_id} en boucle.
+
+Les événements ne traversent pas les processus : pour une tâche exécutée par un
+autre worker, le flux relit périodiquement l'état dans le task store (snapshot).
+Les comptines sont suivies par un unique poller Suno par tâche, partagé par
+toutes les connexions.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+RHYME_TASKS = "rhyme"
+
+# Statuts finaux (plus aucun événement attendu ensuite)
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+TaskKey = Tuple[str, str]
+SnapshotFn = Callable[[str, str], Awaitable[Optional[Tuple[str, Dict[str, Any]]]]]
+RhymeFetchFn = Callable[[str, Optional[str]], Awaitable[Dict[str, Any]]]
+
+
+def make_event(
+    kind: str,
+    task_id: str,
+    data: Dict[str, Any],
+    status: Optional[str] = None,
+    event: str = "progress"
+) -> Dict[str, Any]:
+    """
+    Construit un événement de progression.
+
+    Args:
+        data: Même contenu que le champ "data" des endpoints de statut
+        status: Statut de la tâche (processing, completed, failed...), par défaut data["status"]
+    """
+    return {
+        "event": event,
+        "kind": kind,
+        "task_id": task_id,
+        "status": status or data.get("status"),
+        "data": data
+    }
+
+
+class _Subscription:
+    """File d'événements d'une connexion (les plus anciens sont abandonnés si le client est trop lent)"""
+
+    def __init__(self, user_id: str, maxsize: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def push(self, event: Dict[str, Any]) -> None:
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(event)
+
+
+class ProgressBroker:
+    """Bus d'événements de progression, par utilisateur"""
+
+    def __init__(
+        self,
+        queue_size: int = 100,
+        max_tasks_per_user: int = 50,
+        rhyme_poll_interval: float = 5.0,
+        rhyme_max_wait: float = 900.0
+    ):
+        """
+        Args:
+            queue_size: Nombre d'événements en attente par connexion
+            max_tasks_per_user: Nombre de tâches en cours mémorisées par utilisateur
+            rhyme_poll_interval: Intervalle de polling Suno (secondes)
+            rhyme_max_wait: Durée maximale de suivi d'une comptine (secondes)
+        """
+        self.queue_size = queue_size
+        self.max_tasks_per_user = max_tasks_per_user
+        self.rhyme_poll_interval = rhyme_poll_interval
+        self.rhyme_max_wait = rhyme_max_wait
+
+        self._subscriptions: Dict[str, Set[_Subscription]] = {}
+        self._user_tasks: Dict[str, "OrderedDict[TaskKey, None]"] = {}
+        self._task_owner: Dict[TaskKey, str] = {}
+
+        self._rhyme_fetch: Optional[RhymeFetchFn] = None
+        self._rhyme_watchers: Dict[str, asyncio.Task] = {}
+        self._rhyme_last: Dict[str, Dict[str, Any]] = {}
+
+        self.published = 0
+
+    # ------------------------------------------------------------------
+    # Publication
+    # ------------------------------------------------------------------
+
+    def register_task(self, user_id: Optional[str], kind: str, task_id: str) -> None:
+        """Associe une tâche à son utilisateur ; les flux ouverts de cet utilisateur commencent à la suivre"""
+        if not user_id:
+            return
+        key = (kind, task_id)
+        tasks = self._user_tasks.setdefault(user_id, OrderedDict())
+        tasks[key] = None
+        while len(tasks) > self.max_tasks_per_user:
+            old_key, _ = tasks.popitem(last=False)
+            self._task_owner.pop(old_key, None)
+        self._task_owner[key] = user_id
+        self._dispatch(user_id, make_event(kind, task_id, {"task_id": task_id, "status": "processing"}, event="registered"))
+
+    def publish(
+        self,
+        kind: str,
+        task_id: str,
+        data: Dict[str, Any],
+        status: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> None:
+        """Publie l'état courant d'une tâche auprès des connexions de son utilisateur"""
+        key = (kind, task_id)
+        user_id = user_id or self._task_owner.get(key)
+        if not user_id:
+            return
+        event = make_event(kind, task_id, data, status=status)
+        self._dispatch(user_id, event)
+
+        if event["status"] in FINAL_STATUSES:
+            self._user_tasks.get(user_id, {}).pop(key, None)
+            self._task_owner.pop(key, None)
+
+    def _dispatch(self, user_id: str, event: Dict[str, Any]) -> None:
+        for subscription in list(self._subscriptions.get(user_id, ())):
+            subscription.push(event)
+        self.published += 1
+
+    def user_tasks(self, user_id: str) -> List[TaskKey]:
+        """Tâches en cours connues de ce processus pour l'utilisateur"""
+        return list(self._user_tasks.get(user_id, {}))
+
+    # ------------------------------------------------------------------
+    # Comptines : un poller Suno partagé par tâche
+    # ------------------------------------------------------------------
+
+    def set_rhyme_fetcher(self, fetch: RhymeFetchFn) -> None:
+        """Fonction de récupération du statut d'une tâche Suno (suno_service.check_task_status)"""
+        self._rhyme_fetch = fetch
+
+    def watch_rhyme(self, task_id: str, user_id: Optional[str]) -> None:
+        """Démarre le suivi d'une comptine si aucun poller n'est déjà actif"""
+        if self._rhyme_fetch is None:
+            return
+        watcher = self._rhyme_watchers.get(task_id)
+        if watcher is not None and not watcher.done():
+            return
+        if self._rhyme_last.get(task_id, {}).get("status") in FINAL_STATUSES:
+            return
+        self._rhyme_watchers[task_id] = asyncio.create_task(self._poll_rhyme(task_id, user_id))
+
+    async def _poll_rhyme(self, task_id: str, user_id: Optional[str]) -> None:
+        deadline = time.monotonic() + self.rhyme_max_wait
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    data = await self._rhyme_fetch(task_id, user_id)
+                except Exception as exc:
+                    logger.warning(f"Suivi de la comptine {task_id} impossible: {exc}")
+                    data = {"status": "error", "error": str(exc)}
+
+                # Erreur transitoire (réseau, API) : ne pas l'annoncer comme un échec définitif
+                if data.get("status") != "error":
+                    self._rhyme_last[task_id] = data
+                    self.publish(RHYME_TASKS, task_id, data, user_id=user_id)
+                    if data.get("status") in FINAL_STATUSES:
+                        return
+
+                # Plus personne n'écoute : arrêter le polling
+                if user_id and not self._subscriptions.get(user_id):
+                    return
+                await asyncio.sleep(self.rhyme_poll_interval)
+        finally:
+            self._rhyme_watchers.pop(task_id, None)
+            # Garder un nombre borné de statuts de comptines
+            while len(self._rhyme_last) > self.max_tasks_per_user * 20:
+                self._rhyme_last.pop(next(iter(self._rhyme_last)))
+
+    def last_rhyme_status(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return self._rhyme_last.get(task_id)
+
+    # ------------------------------------------------------------------
+    # Abonnement
+    # ------------------------------------------------------------------
+
+    def subscribe(self, user_id: str) -> _Subscription:
+        subscription = _Subscription(user_id, self.queue_size)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: _Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    async def stream(
+        self,
+        user_id: str,
+        snapshot: SnapshotFn,
+        tasks: Optional[Iterable[TaskKey]] = None,
+        snapshot_interval: float = 3.0,
+        heartbeat_interval: float = 15.0
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Flux d'événements d'un utilisateur.
+
+        Args:
+            user_id: Utilisateur authentifié
+            snapshot: Lecture de l'état d'une tâche (kind, task_id) depuis le task store :
+                      (statut, data), ou None si la tâche est inconnue ou n'appartient pas à l'utilisateur
+            tasks: Tâches à suivre ; None = toutes les tâches de l'utilisateur, y compris
+                   celles lancées après l'ouverture du flux
+            snapshot_interval: Relecture du task store pour les tâches sans événement récent
+                               (tâches exécutées par un autre worker)
+            heartbeat_interval: Intervalle des heartbeats (None est produit)
+
+        Yields:
+            Événements (dict) ou None pour un heartbeat. Le flux se termine quand toutes
+            les tâches demandées explicitement sont terminées.
+        """
+        follow_all = tasks is None
+        subscription = self.subscribe(user_id)
+        tracked: Dict[TaskKey, Dict[str, Any]] = {}
+
+        def track(key: TaskKey) -> None:
+            if key not in tracked:
+                tracked[key] = {"fingerprint": None, "status": None, "last_event": 0.0}
+                if key[0] == RHYME_TASKS:
+                    self.watch_rhyme(key[1], user_id)
+
+        def accept(key: TaskKey, event: Dict[str, Any]) -> bool:
+            """Filtre les doublons (même contenu déjà envoyé)"""
+            state = tracked[key]
+            state["last_event"] = time.monotonic()
+            fingerprint = json.dumps(event.get("data"), sort_keys=True, default=str)
+            if fingerprint == state["fingerprint"]:
+                return False
+            state["fingerprint"] = fingerprint
+            state["status"] = event.get("status")
+            return True
+
+        async def read_snapshot(key: TaskKey) -> Optional[Dict[str, Any]]:
+            kind, task_id = key
+            if kind == RHYME_TASKS:
+                self.watch_rhyme(task_id, user_id)
+                data = self.last_rhyme_status(task_id)
+                return make_event(kind, task_id, data) if data else None
+            result = await snapshot(kind, task_id)
+            if result is None:
+                return None
+            status, data = result
+            return make_event(kind, task_id, data, status=status)
+
+        try:
+            for key in (tasks if tasks is not None else self.user_tasks(user_id)):
+                track(key)
+
+            for key in list(tracked):
+                event = await read_snapshot(key)
+                if event is None and not follow_all and key[0] != RHYME_TASKS:
+                    yield make_event(key[0], key[1], {"task_id": key[1], "status": "not_found"}, event="error")
+                    tracked.pop(key)
+                elif event is not None and accept(key, event):
+                    yield event
+
+            last_yield = time.monotonic()
+            while True:
+                if not follow_all and all(state["status"] in FINAL_STATUSES for state in tracked.values()):
+                    yield {"event": "done", "tasks": [task_id for _, task_id in tracked]}
+                    return
+
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=snapshot_interval)
+                except asyncio.TimeoutError:
+                    event = None
+
+                if event is not None:
+                    key = (event["kind"], event["task_id"])
+                    if key not in tracked:
+                        if not follow_all:
+                            continue
+                        track(key)
+                    if accept(key, event):
+                        last_yield = time.monotonic()
+                        yield event
+                    continue
+
+                # Aucun événement local récent : relire l'état partagé
+                now = time.monotonic()
+                for key, state in list(tracked.items()):
+                    if state["status"] in FINAL_STATUSES or now - state["last_event"] < snapshot_interval:
+                        continue
+                    snapshot_event = await read_snapshot(key)
+                    if snapshot_event is not None and accept(key, snapshot_event):
+                        last_yield = time.monotonic()
+                        yield snapshot_event
+
+                if time.monotonic() - last_yield >= heartbeat_interval:
+                    last_yield = time.monotonic()
+                    yield None
+        finally:
+            self.unsubscribe(subscription)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "users_connected": len(self._subscriptions),
+            "connections": sum(len(subs) for subs in self._subscriptions.values()),
+            "dropped_events": sum(sub.dropped for subs in self._subscriptions.values() for sub in subs),
+            "tracked_tasks": len(self._task_owner),
+            "rhyme_watchers": len(self._rhyme_watchers),
+            "published": self.published
+        }
+
+
+# Instance globale
+progress_broker = ProgressBroker()
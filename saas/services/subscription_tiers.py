@@ -0,0 +1,81 @@
+"""
+Niveau de priorité des utilisateurs pour la file d'attente des générations.
+
+Un utilisateur avec un abonnement actif (table subscriptions) passe dans la voie
+prioritaire, les autres (gratuit, anonyme) dans la voie standard. La requête
+Supabase est synchrone : elle est exécutée dans un thread et son résultat est
+mis en cache quelques minutes.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from config import SUBSCRIPTION_TIER_CACHE_TTL_SECONDS
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_TIER = "priority"
+STANDARD_TIER = "standard"
+
+
+class SubscriptionTierCache:
+    """Cache user_id -> voie de priorité (les erreurs Supabase ne sont pas mises en cache)"""
+
+    def __init__(self, ttl_seconds: float = 300, max_entries: int = 10000):
+        self._cache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self.errors = 0
+
+    @staticmethod
+    def _has_active_subscription(supabase_client, user_id: str) -> bool:
+        """Abonnement actif sur la période en cours (appel synchrone)"""
+        now = datetime.now(timezone.utc).isoformat()
+        response = (
+            supabase_client.table('subscriptions')
+            .select('id')
+            .eq('user_id', user_id)
+            .eq('status', 'active')
+            .gte('current_period_end', now)
+            .limit(1)
+            .execute()
+        )
+        return bool(response.data)
+
+    async def get_tier(self, supabase_client, user_id: Optional[str]) -> str:
+        """Voie de priorité de l'utilisateur (standard si inconnu ou en cas d'erreur)"""
+        if not user_id or supabase_client is None:
+            return STANDARD_TIER
+
+        tier = self._cache.get(user_id)
+        if tier is not None:
+            return tier
+
+        try:
+            subscribed = await asyncio.to_thread(self._has_active_subscription, supabase_client, user_id)
+        except Exception as exc:
+            self.errors += 1
+            logger.warning(f"Lecture de l'abonnement impossible pour {user_id}: {exc}")
+            return STANDARD_TIER
+
+        tier = PRIORITY_TIER if subscribed else STANDARD_TIER
+        self._cache.set(user_id, tier)
+        return tier
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """Invalide la voie d'un utilisateur, ou tout le cache si user_id est None"""
+        if user_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(user_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "cache": self._cache.get_stats(),
+            "errors": self.errors
+        }
+
+
+# Instance globale
+subscription_tiers = SubscriptionTierCache(ttl_seconds=SUBSCRIPTION_TIER_CACHE_TTL_SECONDS)
@@ -4,14 +4,15 @@ Utilise l'API Suno officielle pour créer des comptines avec musique de haute qu
 Documentation: https://docs.sunoapi.org/suno-api/generate-music
 """
 
-import aiohttp
 import asyncio
+import httpx
 import os
 import json
 import uuid
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 from config import SUNO_API_KEY, SUNO_BASE_URL
+from services.http_clients import get_http_client
 
 # Configuration optimisée pour les comptines enfant avec Suno
 NURSERY_RHYME_STYLES = {
@@ -203,56 +204,55 @@ class SunoService:
                 "Content-Type": "application/json"
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/generate",
-                    headers=headers,
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    response_text = await response.text()
-                    
-                    if response.status == 200:
-                        try:
-                            data = json.loads(response_text)
+            response = await get_http_client("suno").post(
+                f"{self.base_url}/generate",
+                headers=headers,
+                json=payload,
+                timeout=30.0
+            )
+            response_text = response.text
+            
+            if response.status_code == 200:
+                try:
+                    data = json.loads(response_text)
                             
-                            if data.get("code") == 200:
-                                task_id = data["data"]["taskId"]
+                    if data.get("code") == 200:
+                        task_id = data["data"]["taskId"]
                                 
-                                print(f"✅ Tâche Suno créée avec succès: {task_id}")
+                        print(f"✅ Tâche Suno créée avec succès: {task_id}")
                                 
-                                return {
-                                    "status": "success",
-                                    "task_id": task_id,
-                                    "message": "Génération musicale lancée avec Suno AI",
-                                    "style_used": base_style,
-                                    "model_used": style_config["model"],
-                                    "service": "suno"
-                                }
-                            else:
-                                error_msg = data.get("msg", "Erreur inconnue de l'API Suno")
-                                print(f"❌ Erreur API Suno (code {data.get('code')}): {error_msg}")
-                                return {
-                                    "status": "error",
-                                    "error": f"Erreur API Suno: {error_msg}",
-                                    "code": data.get("code")
-                                }
-                        except json.JSONDecodeError as e:
-                            print(f"❌ Erreur parsing JSON: {e}")
-                            print(f"   Réponse brute: {response_text[:500]}")
-                            return {
-                                "status": "error",
-                                "error": f"Erreur parsing réponse: {str(e)}"
-                            }
+                        return {
+                            "status": "success",
+                            "task_id": task_id,
+                            "message": "Génération musicale lancée avec Suno AI",
+                            "style_used": base_style,
+                            "model_used": style_config["model"],
+                            "service": "suno"
+                        }
                     else:
-                        print(f"❌ Erreur HTTP {response.status}")
-                        print(f"   Réponse: {response_text[:500]}")
+                        error_msg = data.get("msg", "Erreur inconnue de l'API Suno")
+                        print(f"❌ Erreur API Suno (code {data.get('code')}): {error_msg}")
                         return {
                             "status": "error",
-                            "error": f"Erreur HTTP {response.status}: {response_text[:200]}"
+                            "error": f"Erreur API Suno: {error_msg}",
+                            "code": data.get("code")
                         }
+                except json.JSONDecodeError as e:
+                    print(f"❌ Erreur parsing JSON: {e}")
+                    print(f"   Réponse brute: {response_text[:500]}")
+                    return {
+                        "status": "error",
+                        "error": f"Erreur parsing réponse: {str(e)}"
+                    }
+            else:
+                print(f"❌ Erreur HTTP {response.status_code}")
+                print(f"   Réponse: {response_text[:500]}")
+                return {
+                    "status": "error",
+                    "error": f"Erreur HTTP {response.status_code}: {response_text[:200]}"
+                }
             
-        except asyncio.TimeoutError:
+        except (asyncio.TimeoutError, httpx.TimeoutException):
             print("❌ Timeout lors de la requête à l'API Suno")
             return {
                 "status": "error",
@@ -295,42 +295,38 @@ class SunoService:
 
             # Télécharger le fichier
             print("🎵 [DOWNLOAD] Envoi requête HTTP...")
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    audio_url,
-                    timeout=aiohttp.ClientTimeout(total=60)  # Timeout plus long pour les gros fichiers
-                ) as response:
-                    print(f"🎵 [DOWNLOAD] Réponse HTTP: {response.status}")
-                    print(f"🎵 [DOWNLOAD] Headers: {dict(response.headers)}")
-
-                    if response.status == 200:
-                        print("🎵 [DOWNLOAD] Téléchargement en cours...")
-                        # Lire le contenu en chunks pour éviter la surcharge mémoire
-                        with open(local_path, 'wb') as f:
-                            chunk_count = 0
-                            async for chunk in response.content.iter_chunked(8192):
-                                f.write(chunk)
-                                chunk_count += 1
-                                if chunk_count % 10 == 0:  # Log tous les 10 chunks
-                                    print(f"🎵 [DOWNLOAD] Téléchargé {chunk_count * 8192} bytes...")
+            async with get_http_client("media").stream("GET", audio_url, timeout=60.0) as response:  # Timeout plus long pour les gros fichiers
+                print(f"🎵 [DOWNLOAD] Réponse HTTP: {response.status_code}")
+                print(f"🎵 [DOWNLOAD] Headers: {dict(response.headers)}")
 
-                        file_size = os.path.getsize(local_path)
-                        print(f"✅ [DOWNLOAD] Audio téléchargé et stocké: {file_size} bytes")
+                if response.status_code == 200:
+                    print("🎵 [DOWNLOAD] Téléchargement en cours...")
+                    # Lire le contenu en chunks pour éviter la surcharge mémoire
+                    with open(local_path, 'wb') as f:
+                        chunk_count = 0
+                        async for chunk in response.aiter_bytes(8192):
+                            f.write(chunk)
+                            chunk_count += 1
+                            if chunk_count % 10 == 0:  # Log tous les 10 chunks
+                                print(f"🎵 [DOWNLOAD] Téléchargé {chunk_count * 8192} bytes...")
 
-                        # Vérifier que le fichier n'est pas vide
-                        if file_size == 0:
-                            print("❌ [DOWNLOAD] Fichier vide, suppression")
-                            os.remove(local_path)
-                            return None
+                    file_size = os.path.getsize(local_path)
+                    print(f"✅ [DOWNLOAD] Audio téléchargé et stocké: {file_size} bytes")
 
-                        # Retourner le chemin relatif pour l'accès via l'API
-                        return f"audio/{unique_filename}"
-                    else:
-                        print(f"❌ [DOWNLOAD] Erreur HTTP: {response.status}")
-                        response_text = await response.text()
-                        print(f"❌ [DOWNLOAD] Réponse: {response_text[:200]}")
+                    # Vérifier que le fichier n'est pas vide
+                    if file_size == 0:
+                        print("❌ [DOWNLOAD] Fichier vide, suppression")
+                        os.remove(local_path)
                         return None
 
+                    # Retourner le chemin relatif pour l'accès via l'API
+                    return f"audio/{unique_filename}"
+                else:
+                    print(f"❌ [DOWNLOAD] Erreur HTTP: {response.status_code}")
+                    response_text = (await response.aread()).decode("utf-8", errors="replace")
+                    print(f"❌ [DOWNLOAD] Réponse: {response_text[:200]}")
+                    return None
+
         except Exception as e:
             print(f"❌ [DOWNLOAD] Erreur téléchargement: {e}")
             import traceback
@@ -362,165 +358,160 @@ class SunoService:
             url = f"{self.base_url}/generate/record-info?taskId={task_id}"
             print(f"🔍 Vérification statut Suno: {url}")
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    url,
-                    headers=headers,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    response_text = await response.text()
-                    
-                    if response.status == 200:
-                        try:
-                            data = json.loads(response_text)
+            response = await get_http_client("suno").get(url, headers=headers, timeout=30.0)
+            response_text = response.text
+            
+            if response.status_code == 200:
+                try:
+                    data = json.loads(response_text)
                             
-                            if data.get("code") == 200:
-                                task_data = data.get("data", {})
+                    if data.get("code") == 200:
+                        task_data = data.get("data", {})
                                 
-                                # Vérifier le statut global de la tâche
-                                # Documentation: status peut être "GENERATING", "SUCCESS", "FAILED", "PENDING"
-                                task_status = task_data.get("status", "")
+                        # Vérifier le statut global de la tâche
+                        # Documentation: status peut être "GENERATING", "SUCCESS", "FAILED", "PENDING"
+                        task_status = task_data.get("status", "")
                                 
-                                print(f"📊 Statut tâche Suno: {task_status}")
-                                print(f"📊 DEBUG - Structure complète:")
-                                print(f"   task_data keys: {list(task_data.keys())}")
-                                if task_data.get("response"):
-                                    resp = task_data.get('response', {})
-                                    print(f"   response keys: {list(resp.keys())}")
-                                    suno_data = resp.get('sunoData', []) or resp.get('data', [])
-                                    print(f"   sunoData length: {len(suno_data)}")
+                        print(f"📊 Statut tâche Suno: {task_status}")
+                        print(f"📊 DEBUG - Structure complète:")
+                        print(f"   task_data keys: {list(task_data.keys())}")
+                        if task_data.get("response"):
+                            resp = task_data.get('response', {})
+                            print(f"   response keys: {list(resp.keys())}")
+                            suno_data = resp.get('sunoData', []) or resp.get('data', [])
+                            print(f"   sunoData length: {len(suno_data)}")
                                 
-                                if task_status == "SUCCESS" or task_status == "TEXT_SUCCESS":
-                                    # Tâche terminée avec succès
-                                    response_data = task_data.get("response", {})
-                                    # IMPORTANT: L'API Suno retourne 'sunoData' et non 'data'
-                                    clips = response_data.get("sunoData", []) or response_data.get("data", [])
+                        if task_status == "SUCCESS" or task_status == "TEXT_SUCCESS":
+                            # Tâche terminée avec succès
+                            response_data = task_data.get("response", {})
+                            # IMPORTANT: L'API Suno retourne 'sunoData' et non 'data'
+                            clips = response_data.get("sunoData", []) or response_data.get("data", [])
                                     
-                                    if not clips:
-                                        return {
-                                            "status": "failed",
-                                            "error": "Aucun audio généré",
-                                            "message": "❌ Aucune chanson retournée"
-                                        }
-                                    # Prendre seulement la première chanson disponible
-                                    clip = clips[0] if clips else None
+                            if not clips:
+                                return {
+                                    "status": "failed",
+                                    "error": "Aucun audio généré",
+                                    "message": "❌ Aucune chanson retournée"
+                                }
+                            # Prendre seulement la première chanson disponible
+                            clip = clips[0] if clips else None
 
-                                    if not clip:
-                                        return {
-                                            "status": "failed",
-                                            "error": "Aucun audio généré",
-                                            "message": "❌ Aucune chanson retournée"
-                                        }
+                            if not clip:
+                                return {
+                                    "status": "failed",
+                                    "error": "Aucun audio généré",
+                                    "message": "❌ Aucune chanson retournée"
+                                }
 
-                                    audio_url_val = clip.get('audioUrl') or clip.get('streamAudioUrl')
-                                    print(f"🎵 Clip principal:")
-                                    print(f"   - id: {clip.get('id')}")
-                                    print(f"   - title: {clip.get('title')}")
-                                    print(f"   - audioUrl: {audio_url_val[:80] if audio_url_val else 'None'}...")
-                                    print(f"   - duration: {clip.get('duration')}")
+                            audio_url_val = clip.get('audioUrl') or clip.get('streamAudioUrl')
+                            print(f"🎵 Clip principal:")
+                            print(f"   - id: {clip.get('id')}")
+                            print(f"   - title: {clip.get('title')}")
+                            print(f"   - audioUrl: {audio_url_val[:80] if audio_url_val else 'None'}...")
+                            print(f"   - duration: {clip.get('duration')}")
 
-                                    if not audio_url_val:
-                                        return {
-                                            "status": "failed",
-                                            "error": "URL audio manquante",
-                                            "message": "❌ URL audio non disponible"
-                                        }
+                            if not audio_url_val:
+                                return {
+                                    "status": "failed",
+                                    "error": "URL audio manquante",
+                                    "message": "❌ URL audio non disponible"
+                                }
 
-                                    print(f"🎵 URL audio disponible: {audio_url_val[:100]}...")
+                            print(f"🎵 URL audio disponible: {audio_url_val[:100]}...")
                                     
-                                    # 📤 Télécharger et uploader vers Supabase Storage si user_id fourni
-                                    audio_path_supabase = None
-                                    if user_id:
-                                        try:
-                                            # Télécharger l'audio depuis Suno
-                                            temp_audio_path = await self.download_and_store_audio(audio_url_val, task_id)
+                            # 📤 Télécharger et uploader vers Supabase Storage si user_id fourni
+                            audio_path_supabase = None
+                            if user_id:
+                                try:
+                                    # Télécharger l'audio depuis Suno
+                                    temp_audio_path = await self.download_and_store_audio(audio_url_val, task_id)
                                             
-                                            if temp_audio_path:
-                                                # Uploader vers Supabase Storage
-                                                from services.supabase_storage import get_storage_service
-                                                storage_service = get_storage_service()
+                                    if temp_audio_path:
+                                        # Uploader vers Supabase Storage
+                                        from services.supabase_storage import get_storage_service
+                                        storage_service = get_storage_service()
                                                 
-                                                if storage_service:
-                                                    # Construire le chemin complet du fichier temporaire
-                                                    import os
-                                                    # temp_audio_path est déjà "audio/filename.mp3"
-                                                    full_temp_path = os.path.join(os.getcwd(), temp_audio_path)
+                                        if storage_service:
+                                            # Construire le chemin complet du fichier temporaire
+                                            import os
+                                            # temp_audio_path est déjà "audio/filename.mp3"
+                                            full_temp_path = os.path.join(os.getcwd(), temp_audio_path)
                                                     
-                                                    if os.path.exists(full_temp_path):
-                                                        upload_result = await storage_service.upload_file(
-                                                            file_path=full_temp_path,
-                                                            user_id=user_id,
-                                                            content_type="rhyme",
-                                                            custom_filename=f"comptine_{task_id}.mp3"
-                                                        )
+                                            if os.path.exists(full_temp_path):
+                                                upload_result = await storage_service.upload_file(
+                                                    file_path=full_temp_path,
+                                                    user_id=user_id,
+                                                    content_type="rhyme",
+                                                    custom_filename=f"comptine_{task_id}.mp3"
+                                                )
                                                         
-                                                        if upload_result.get("success"):
-                                                            audio_path_supabase = upload_result.get("signed_url")
-                                                            print(f"✅ Audio uploadé vers Supabase Storage: {audio_path_supabase[:100]}...")
+                                                if upload_result.get("success"):
+                                                    audio_path_supabase = upload_result.get("signed_url")
+                                                    print(f"✅ Audio uploadé vers Supabase Storage: {audio_path_supabase[:100]}...")
                                                             
-                                                            # Supprimer le fichier temporaire local
-                                                            try:
-                                                                os.remove(full_temp_path)
-                                                            except:
-                                                                pass
-                                                        else:
-                                                            print(f"⚠️ Échec upload Supabase Storage: {upload_result.get('error')}")
+                                                    # Supprimer le fichier temporaire local
+                                                    try:
+                                                        os.remove(full_temp_path)
+                                                    except:
+                                                        pass
                                                 else:
-                                                    print("⚠️ Service Supabase Storage non disponible")
-                                            else:
-                                                print("⚠️ Échec téléchargement audio depuis Suno")
-                                        except Exception as upload_error:
-                                            print(f"⚠️ Erreur upload audio vers Supabase Storage: {upload_error}")
-                                            import traceback
-                                            traceback.print_exc()
+                                                    print(f"⚠️ Échec upload Supabase Storage: {upload_result.get('error')}")
+                                        else:
+                                            print("⚠️ Service Supabase Storage non disponible")
+                                    else:
+                                        print("⚠️ Échec téléchargement audio depuis Suno")
+                                except Exception as upload_error:
+                                    print(f"⚠️ Erreur upload audio vers Supabase Storage: {upload_error}")
+                                    import traceback
+                                    traceback.print_exc()
                                     
-                                    return {
-                                        "status": "completed",
-                                        "task_id": task_id,
-                                        "audio_path": audio_path_supabase,  # URL Supabase Storage si upload réussi
-                                        "suno_url": audio_url_val,  # URL Suno originale (fallback)
-                                        "title": clip.get("title", "Comptine"),
-                                        "duration": clip.get("duration"),
-                                        "message": "✅ Comptine générée avec succès"
-                                    }
-                                elif task_status == "FAILED":
-                                    # Tâche échouée
-                                    error_message = task_data.get("errorMessage", "Erreur inconnue")
-                                    return {
-                                        "status": "failed",
-                                        "task_id": task_id,
-                                        "error": error_message,
-                                        "message": "❌ La génération a échoué"
-                                    }
-                                else:
-                                    # Génération en cours (GENERATING, PENDING)
-                                    return {
-                                        "status": "processing",
-                                        "task_id": task_id,
-                                        "message": f"🔄 Génération Suno en cours... (statut: {task_status})"
-                                    }
-                            else:
-                                error_msg = data.get("msg", "Erreur inconnue")
-                                return {
-                                    "status": "error",
-                                    "error": f"Erreur API Suno: {error_msg}",
-                                    "code": data.get("code")
-                                }
-                        except json.JSONDecodeError as e:
-                            print(f"❌ Erreur parsing JSON status: {e}")
-                            print(f"   Réponse brute: {response_text[:500]}")
                             return {
-                                "status": "error",
-                                "error": f"Erreur parsing réponse: {str(e)}"
+                                "status": "completed",
+                                "task_id": task_id,
+                                "audio_path": audio_path_supabase,  # URL Supabase Storage si upload réussi
+                                "suno_url": audio_url_val,  # URL Suno originale (fallback)
+                                "title": clip.get("title", "Comptine"),
+                                "duration": clip.get("duration"),
+                                "message": "✅ Comptine générée avec succès"
+                            }
+                        elif task_status == "FAILED":
+                            # Tâche échouée
+                            error_message = task_data.get("errorMessage", "Erreur inconnue")
+                            return {
+                                "status": "failed",
+                                "task_id": task_id,
+                                "error": error_message,
+                                "message": "❌ La génération a échoué"
+                            }
+                        else:
+                            # Génération en cours (GENERATING, PENDING)
+                            return {
+                                "status": "processing",
+                                "task_id": task_id,
+                                "message": f"🔄 Génération Suno en cours... (statut: {task_status})"
                             }
                     else:
-                        print(f"❌ Erreur HTTP {response.status} lors de la vérification")
+                        error_msg = data.get("msg", "Erreur inconnue")
                         return {
                             "status": "error",
-                            "error": f"Erreur HTTP {response.status}: {response_text[:200]}"
+                            "error": f"Erreur API Suno: {error_msg}",
+                            "code": data.get("code")
                         }
+                except json.JSONDecodeError as e:
+                    print(f"❌ Erreur parsing JSON status: {e}")
+                    print(f"   Réponse brute: {response_text[:500]}")
+                    return {
+                        "status": "error",
+                        "error": f"Erreur parsing réponse: {str(e)}"
+                    }
+            else:
+                print(f"❌ Erreur HTTP {response.status_code} lors de la vérification")
+                return {
+                    "status": "error",
+                    "error": f"Erreur HTTP {response.status_code}: {response_text[:200]}"
+                }
                         
-        except asyncio.TimeoutError:
+        except (asyncio.TimeoutError, httpx.TimeoutException):
             return {
                 "status": "error",
                 "error": "Timeout lors de la vérification du statut"
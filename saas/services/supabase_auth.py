@@ -0,0 +1,387 @@
+"""
+Service d'authentification Supabase - Vérification des JWT
+Vérifie localement la signature et l'expiration des tokens (secret JWT du projet
+ou JWKS mis en cache) et n'interroge l'endpoint /auth/v1/user que lorsque la
+vérification locale est impossible.
+
+Toutes les routes passent par le résolveur partagé (extract_user_id_from_jwt),
+qui met en cache la correspondance token -> user_id.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Dict, Any, Optional
+
+import httpx
+import jwt
+
+from config import (
+    SUPABASE_URL, SUPABASE_AUTH_API_KEY, SUPABASE_JWT_SECRET, SUPABASE_JWT_AUDIENCE,
+    SUPABASE_JWT_VERIFICATION, SUPABASE_JWKS_CACHE_SECONDS,
+    AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_NEGATIVE_TTL_SECONDS
+)
+from services.http_clients import get_http_client
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Algorithmes acceptés pour la vérification locale
+SYMMETRIC_ALGORITHMS = ("HS256",)
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+# Modes de vérification
+MODE_LOCAL = "local"            # Vérification locale, repli sur /auth/v1/user si impossible
+MODE_REMOTE = "remote"          # Toujours interroger /auth/v1/user (ancien comportement)
+MODE_LOCAL_ONLY = "local_only"  # Vérification locale uniquement, jamais d'appel réseau
+
+
+class LocalVerificationUnavailable(Exception):
+    """La vérification locale est impossible (secret absent, clé inconnue...) : il faut interroger Supabase Auth."""
+
+
+class AuthServiceUnavailable(Exception):
+    """Supabase Auth n'a pas pu se prononcer (erreur réseau, 5xx, 429) : le token n'est ni valide ni invalide."""
+
+
+class SupabaseJWTVerifier:
+    """
+    Vérifie les JWT émis par Supabase Auth.
+
+    - HS256 : signature vérifiée avec le secret JWT du projet (SUPABASE_JWT_SECRET)
+    - RS256/ES256 : signature vérifiée avec les clés publiques du JWKS du projet (mis en cache)
+    - Sinon : repli sur l'endpoint /auth/v1/user (sauf en mode local_only)
+
+    Un token dont la signature, l'expiration ou l'audience est invalide est rejeté
+    localement, sans appel réseau.
+    """
+
+    def __init__(
+        self,
+        supabase_url: str,
+        api_key: Optional[str],
+        jwt_secret: Optional[str] = None,
+        audience: Optional[str] = "authenticated",
+        mode: str = MODE_LOCAL,
+        jwks_cache_seconds: int = 600,
+        leeway_seconds: int = 30
+    ):
+        """
+        Args:
+            supabase_url: URL du projet Supabase
+            api_key: Clé API utilisée pour les appels à Supabase Auth
+            jwt_secret: Secret JWT du projet (tokens HS256)
+            audience: Audience attendue dans les tokens (None pour ne pas vérifier)
+            mode: local, remote ou local_only
+            jwks_cache_seconds: Durée de cache du JWKS en secondes
+            leeway_seconds: Tolérance sur l'horloge pour l'expiration
+        """
+        self.supabase_url = (supabase_url or "").rstrip('/')
+        self.api_key = api_key
+        self.jwt_secret = jwt_secret
+        self.audience = audience or None
+        self.mode = mode if mode in (MODE_LOCAL, MODE_REMOTE, MODE_LOCAL_ONLY) else MODE_LOCAL
+        self.jwks_cache_seconds = jwks_cache_seconds
+        self.leeway_seconds = leeway_seconds
+
+        self._jwks_client: Optional[jwt.PyJWKClient] = None
+
+        # Compteurs exposés dans /diagnostic
+        self.stats = {
+            "local_verified": 0,
+            "local_rejected": 0,
+            "remote_calls": 0,
+            "remote_failures": 0
+        }
+
+    @property
+    def jwks_url(self) -> str:
+        return f"{self.supabase_url}/auth/v1/.well-known/jwks.json"
+
+    def _get_jwks_client(self) -> jwt.PyJWKClient:
+        """Retourne le client JWKS (créé à la première utilisation, JWKS mis en cache)"""
+        if self._jwks_client is None:
+            headers = {"apikey": self.api_key} if self.api_key else None
+            self._jwks_client = jwt.PyJWKClient(
+                self.jwks_url,
+                cache_jwk_set=True,
+                lifespan=self.jwks_cache_seconds,
+                headers=headers,
+                timeout=5
+            )
+        return self._jwks_client
+
+    async def decode_locally(self, token: str) -> Dict[str, Any]:
+        """
+        Vérifie la signature, l'expiration et l'audience du token sans appeler Supabase Auth.
+
+        Returns:
+            Les claims du token
+
+        Raises:
+            jwt.InvalidTokenError: token invalide (signature, expiration, audience, format)
+            LocalVerificationUnavailable: impossible de vérifier localement
+        """
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get("alg")
+
+        if algorithm in SYMMETRIC_ALGORITHMS:
+            if not self.jwt_secret:
+                raise LocalVerificationUnavailable("SUPABASE_JWT_SECRET non configuré")
+            key = self.jwt_secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            try:
+                # PyJWKClient fait des appels HTTP synchrones : ne pas bloquer la boucle d'événements
+                signing_key = await asyncio.to_thread(self._get_jwks_client().get_signing_key_from_jwt, token)
+            except (jwt.PyJWKClientError, jwt.PyJWKError) as exc:
+                raise LocalVerificationUnavailable(f"Clé JWKS indisponible: {exc}")
+            key = signing_key.key
+        else:
+            raise LocalVerificationUnavailable(f"Algorithme non supporté: {algorithm}")
+
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=self.audience,
+            leeway=self.leeway_seconds,
+            options={
+                "require": ["exp", "sub"],
+                "verify_aud": self.audience is not None
+            }
+        )
+
+    async def fetch_user_id_remote(self, token: str) -> Optional[str]:
+        """
+        Valide le JWT via l'endpoint /auth/v1/user de Supabase et retourne l'identifiant utilisateur.
+
+        Returns:
+            user_id, ou None si Supabase rejette le token (401/403)
+
+        Raises:
+            AuthServiceUnavailable: erreur réseau ou réponse non définitive (5xx, 429...)
+        """
+        if not token or not self.supabase_url or not self.api_key:
+            return None
+
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "apikey": self.api_key
+        }
+
+        self.stats["remote_calls"] += 1
+        try:
+            response = await get_http_client("supabase").get(
+                f"{self.supabase_url}/auth/v1/user", headers=headers, timeout=10.0
+            )
+
+            if response.status_code == 200:
+                data = response.json()
+                return data.get("id") or data.get("user", {}).get("id")
+        except httpx.HTTPError as exc:
+            self.stats["remote_failures"] += 1
+            print(f"[SECURITY] Erreur lors de la validation JWT : {exc}")
+            raise AuthServiceUnavailable(str(exc)) from exc
+
+        if response.status_code in (401, 403):
+            print(f"[SECURITY] JWT invalide (status={response.status_code})")
+            return None
+
+        self.stats["remote_failures"] += 1
+        print(f"[SECURITY] Supabase Auth indisponible (status={response.status_code})")
+        raise AuthServiceUnavailable(f"status={response.status_code}")
+
+    async def get_user_id(self, token: str) -> Optional[str]:
+        """
+        Retourne l'identifiant utilisateur (claim 'sub') d'un JWT Supabase valide.
+
+        Args:
+            token: JWT brut (sans le préfixe "Bearer ")
+
+        Returns:
+            user_id ou None si le token est absent ou invalide
+
+        Raises:
+            AuthServiceUnavailable: Supabase Auth injoignable (repli distant uniquement)
+        """
+        if not token:
+            return None
+
+        if self.mode != MODE_REMOTE:
+            try:
+                claims = await self.decode_locally(token)
+                self.stats["local_verified"] += 1
+                return claims.get("sub")
+            except LocalVerificationUnavailable as exc:
+                if self.mode == MODE_LOCAL_ONLY:
+                    print(f"[SECURITY] Vérification locale du JWT impossible : {exc}")
+                    return None
+                logger.debug(f"Vérification locale du JWT impossible, repli sur Supabase Auth: {exc}")
+            except jwt.InvalidTokenError as exc:
+                self.stats["local_rejected"] += 1
+                print(f"[SECURITY] JWT invalide (vérification locale) : {exc}")
+                return None
+
+        return await self.fetch_user_id_remote(token)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Configuration et compteurs de vérification (diagnostic admin)"""
+        return {
+            "mode": self.mode,
+            "jwt_secret_configured": bool(self.jwt_secret),
+            "jwks_url": self.jwks_url,
+            **self.stats
+        }
+
+
+# Instance globale du vérificateur
+supabase_jwt_verifier = SupabaseJWTVerifier(
+    supabase_url=SUPABASE_URL,
+    api_key=SUPABASE_AUTH_API_KEY,
+    jwt_secret=SUPABASE_JWT_SECRET,
+    audience=SUPABASE_JWT_AUDIENCE,
+    mode=SUPABASE_JWT_VERIFICATION,
+    jwks_cache_seconds=SUPABASE_JWKS_CACHE_SECONDS
+)
+
+
+# Sentinelle pour distinguer "absent du cache" d'un résultat négatif (None) en cache
+_MISSING = object()
+
+
+class SupabaseUserResolver:
+    """
+    Résolveur token -> user_id partagé par toutes les routes.
+
+    - Cache TTL + LRU indexé par le hash SHA-256 du token (le token brut n'est jamais conservé)
+    - Cache négatif (TTL court) pour les tokens invalides ; une indisponibilité de Supabase Auth n'est jamais mise en cache
+    - Single-flight : des requêtes concurrentes avec le même token ne déclenchent qu'une vérification
+
+    Les clients interrogent /check_task_status et /status_comic toutes les quelques secondes
+    avec le même token : le taux de hit est proche de 100%.
+    """
+
+    def __init__(
+        self,
+        verifier: SupabaseJWTVerifier,
+        max_entries: int = 10000,
+        ttl_seconds: float = 300,
+        negative_ttl_seconds: float = 30
+    ):
+        """
+        Args:
+            verifier: Vérificateur de JWT utilisé en cas de miss
+            max_entries: Nombre maximum de tokens en cache
+            ttl_seconds: Durée de cache d'un token valide (plafonnée à son expiration)
+            negative_ttl_seconds: Durée de cache d'un token invalide
+        """
+        self.verifier = verifier
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._cache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.coalesced_requests = 0
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _positive_ttl(self, token: str) -> float:
+        """TTL d'un token valide : jamais au-delà de son expiration"""
+        try:
+            exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+        except jwt.InvalidTokenError:
+            exp = None
+        if not exp:
+            return self.ttl_seconds
+        return min(self.ttl_seconds, float(exp) - time.time())
+
+    async def resolve_token(self, token: str) -> Optional[str]:
+        """
+        Retourne le user_id associé au token (None si invalide), en passant par le cache.
+
+        Args:
+            token: JWT brut (sans le préfixe "Bearer ")
+        """
+        if not token:
+            return None
+
+        key = self._token_key(token)
+        cached = self._cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        # Une vérification est déjà en cours pour ce token : attendre son résultat
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced_requests += 1
+            await asyncio.wait({inflight})
+            if inflight.cancelled():
+                # La requête "leader" a été annulée : refaire la résolution
+                return await self.resolve_token(token)
+            return inflight.result()
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            try:
+                user_id = await self.verifier.get_user_id(token)
+            except AuthServiceUnavailable as exc:
+                # Ni valide ni invalide : refuser cette requête sans mémoriser le résultat
+                logger.warning(f"Supabase Auth indisponible, token non mis en cache: {exc}")
+                future.set_result(None)
+                return None
+            if user_id:
+                self._cache.set(key, user_id, ttl=self._positive_ttl(token))
+            else:
+                self._cache.set(key, None, ttl=self.negative_ttl_seconds)
+            future.set_result(user_id)
+            return user_id
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Marquer l'exception comme récupérée s'il n'y a aucun follower
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def resolve_authorization(self, authorization: Optional[str]) -> Optional[str]:
+        """Retourne le user_id depuis un header Authorization "Bearer <token>" (None si absent ou invalide)"""
+        if not authorization or not authorization.startswith("Bearer "):
+            return None
+        return await self.resolve_token(authorization.split(" ")[1])
+
+    def invalidate_token(self, token: str) -> None:
+        """Retire un token du cache (ex: déconnexion)"""
+        self._cache.pop(self._token_key(token))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques du cache et du vérificateur (diagnostic admin)"""
+        return {
+            "verifier": self.verifier.get_stats(),
+            "cache": self._cache.get_stats(),
+            "negative_ttl_seconds": self.negative_ttl_seconds,
+            "inflight": len(self._inflight),
+            "coalesced_requests": self.coalesced_requests
+        }
+
+
+# Instance globale du résolveur
+supabase_user_resolver = SupabaseUserResolver(
+    supabase_jwt_verifier,
+    max_entries=AUTH_CACHE_MAX_ENTRIES,
+    ttl_seconds=AUTH_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=AUTH_CACHE_NEGATIVE_TTL_SECONDS
+)
+
+
+async def extract_user_id_from_jwt(authorization: Optional[str] = None) -> Optional[str]:
+    """
+    Valide le JWT Supabase du header Authorization et retourne l'identifiant utilisateur.
+    Retourne None si le header est absent ou si le token est invalide.
+    """
+    return await supabase_user_resolver.resolve_authorization(authorization)
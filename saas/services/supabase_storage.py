@@ -316,43 +316,42 @@ class SupabaseStorageService:
         Returns:
             Dict avec 'success', 'public_url', 'storage_path', etc.
         """
-        import httpx
         import tempfile
         import os
+        from services.http_clients import get_http_client
         
         try:
             print(f"📥 Téléchargement depuis: {source_url[:60]}...")
             
             # Télécharger le fichier depuis l'URL
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.get(source_url)
-                
-                if response.status_code != 200:
-                    return {
-                        "success": False,
-                        "error": f"Failed to download: HTTP {response.status_code}"
-                    }
-                
-                file_data = response.content
-                file_size = len(file_data)
-                
-                # Déterminer l'extension depuis le Content-Type ou l'URL
-                content_type_header = response.headers.get("content-type", "")
-                if "mp4" in content_type_header or source_url.endswith(".mp4"):
-                    extension = "mp4"
-                    mime_type = "video/mp4"
-                elif "webm" in content_type_header or source_url.endswith(".webm"):
-                    extension = "webm"
-                    mime_type = "video/webm"
-                elif "png" in content_type_header or source_url.endswith(".png"):
-                    extension = "png"
-                    mime_type = "image/png"
-                elif "jpg" in content_type_header or "jpeg" in content_type_header:
-                    extension = "jpg"
-                    mime_type = "image/jpeg"
-                else:
-                    extension = "mp4"  # Par défaut pour les vidéos
-                    mime_type = "video/mp4"
+            response = await get_http_client("media").get(source_url, timeout=120.0)
+            
+            if response.status_code != 200:
+                return {
+                    "success": False,
+                    "error": f"Failed to download: HTTP {response.status_code}"
+                }
+            
+            file_data = response.content
+            file_size = len(file_data)
+            
+            # Déterminer l'extension depuis le Content-Type ou l'URL
+            content_type_header = response.headers.get("content-type", "")
+            if "mp4" in content_type_header or source_url.endswith(".mp4"):
+                extension = "mp4"
+                mime_type = "video/mp4"
+            elif "webm" in content_type_header or source_url.endswith(".webm"):
+                extension = "webm"
+                mime_type = "video/webm"
+            elif "png" in content_type_header or source_url.endswith(".png"):
+                extension = "png"
+                mime_type = "image/png"
+            elif "jpg" in content_type_header or "jpeg" in content_type_header:
+                extension = "jpg"
+                mime_type = "image/jpeg"
+            else:
+                extension = "mp4"  # Par défaut pour les vidéos
+                mime_type = "video/mp4"
             
             # Générer le chemin de stockage
             filename = custom_filename or f"video.{extension}"
@@ -439,6 +438,36 @@ class SupabaseStorageService:
                 "error": str(e)
             }
     
+    async def delete_prefix(self, storage_path_prefix: str, content_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Supprime les fichiers d'un dossier dont le nom commence par un préfixe
+        (ex: playlists et renditions HLS d'une animation)
+        
+        Args:
+            storage_path_prefix: Dossier et début du nom (ex: user_id/animations/id/hls)
+            content_type: Type de contenu pour déterminer le bon bucket (optionnel)
+        
+        Returns:
+            Dict avec 'success', 'deleted' (chemins supprimés) et optionnellement 'error'
+        """
+        try:
+            bucket_name = self._get_bucket_for_type(content_type) if content_type else "audio"
+            bucket = self.client.storage.from_(bucket_name)
+            
+            folder, _, prefix = storage_path_prefix.rpartition('/')
+            files = bucket.list(path=folder) or []
+            paths = [f"{folder}/{f['name']}" for f in files if f.get('name', '').startswith(prefix)]
+            if paths:
+                bucket.remove(paths)
+                print(f"🗑️ {len(paths)} fichiers supprimés: {storage_path_prefix}* (bucket: {bucket_name})")
+            return {"success": True, "deleted": paths}
+        except Exception as e:
+            print(f"❌ Erreur suppression fichiers {storage_path_prefix}*: {e}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
     async def delete_folder(self, user_id: str, content_type: str, creation_id: str) -> Dict[str, Any]:
         """
         Supprime tous les fichiers d'une création (dossier complet)
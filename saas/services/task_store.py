@@ -0,0 +1,664 @@
+"""
+Stockage des tâches de génération (animations, BD...).
+
+Remplace les dictionnaires en mémoire du module main (task_storage, comic_task_storage)
+par une interface commune avec plusieurs backends :
+
+- memory : dictionnaire du processus (un seul worker, comportement historique)
+- sqlite : fichier SQLite en mode WAL, partagé entre les workers d'une même machine
+- redis  : serveur compatible Redis, partagé entre workers et réplicas
+
+Le backend est choisi avec TASK_STORE_BACKEND. Les enregistrements sont des
+dictionnaires sérialisables en JSON ; update() fusionne les champs fournis
+dans l'enregistrement existant.
+
+Rétention : une tâche terminée (completed, failed, cancelled) est supprimée après
+TASK_RETENTION_SECONDS. Le nombre d'enregistrements et leur taille totale sont
+plafonnés ; au-delà, les tâches terminées les plus anciennes sont évincées en premier.
+
+Propriété : une tâche en cours porte le worker qui l'exécute (owner) et la date de
+son dernier heartbeat (heartbeat_at). claim() prend ou renouvelle ce bail de façon
+atomique entre processus ; une tâche ne peut être reprise par un autre worker
+qu'une fois son heartbeat périmé.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (
+    TASK_STORE_BACKEND, TASK_STORE_SQLITE_PATH, TASK_STORE_REDIS_URL,
+    TASK_RETENTION_SECONDS, TASK_ACTIVE_TTL_SECONDS, TASK_STORE_MAX_RECORDS, TASK_STORE_MAX_BYTES
+)
+
+logger = logging.getLogger(__name__)
+
+# Espaces de noms des tâches
+ANIMATION_TASKS = "animation"
+COMIC_TASKS = "comic"
+
+# Statuts à partir desquels le délai de rétention démarre
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Limites de conservation des enregistrements"""
+    retention_seconds: float = 3600       # Après la fin de la tâche
+    active_ttl_seconds: float = 86400     # Tâche jamais terminée (processus arrêté en cours de route)
+    max_records: int = 2000
+    max_bytes: int = 64 * 1024 * 1024
+
+
+def _record_size(record: Dict[str, Any]) -> int:
+    return len(json.dumps(record, default=str))
+
+
+def _finishing(fields: Dict[str, Any]) -> bool:
+    return fields.get("status") in TERMINAL_STATUSES
+
+
+# Identifiant de ce processus comme propriétaire de tâches (le pid change après un fork)
+_HOSTNAME = socket.gethostname()
+_INSTANCE_ID = uuid.uuid4().hex[:8]
+
+
+def worker_id() -> str:
+    return f"{_HOSTNAME}:{os.getpid()}:{_INSTANCE_ID}"
+
+
+def _claimable(record: Optional[Dict[str, Any]], owner: str, now: float, lease_seconds: float) -> bool:
+    """Tâche en cours sans propriétaire, déjà à owner, ou dont le propriétaire ne renouvelle plus son bail"""
+    if record is None or record.get("status") in TERMINAL_STATUSES:
+        return False
+    current = record.get("owner")
+    if not current or current == owner:
+        return True
+    return (record.get("heartbeat_at") or 0) + lease_seconds <= now
+
+
+class TaskStore(ABC):
+    """Interface commune des backends de stockage des tâches"""
+
+    backend_name = "abstract"
+    # Les enregistrements survivent-ils à un redémarrage du processus ?
+    persistent = False
+
+    def __init__(self, policy: RetentionPolicy):
+        self.policy = policy
+        # Compteurs d'éviction (par processus)
+        self.evictions = {"expired": 0, "max_records": 0, "max_bytes": 0, "active_evicted": 0}
+
+    @abstractmethod
+    async def create(self, namespace: str, task_id: str, record: Dict[str, Any]) -> None:
+        """Crée (ou remplace) l'enregistrement d'une tâche"""
+
+    @abstractmethod
+    async def get(self, namespace: str, task_id: str) -> Optional[Dict[str, Any]]:
+        """Retourne une copie de l'enregistrement, ou None si la tâche est inconnue ou expirée"""
+
+    @abstractmethod
+    async def update(self, namespace: str, task_id: str, **fields: Any) -> None:
+        """Fusionne les champs dans l'enregistrement (ignoré si la tâche est inconnue)"""
+
+    @abstractmethod
+    async def delete(self, namespace: str, task_id: str) -> None:
+        """Supprime l'enregistrement d'une tâche"""
+
+    @abstractmethod
+    async def list_active(self, namespace: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Tâches non terminées d'un espace de noms : [(task_id, enregistrement)] (reprise au démarrage)"""
+
+    @abstractmethod
+    async def claim(self, namespace: str, task_id: str, owner: str, lease_seconds: float) -> bool:
+        """
+        Prend ou renouvelle le bail d'une tâche en cours (owner, heartbeat_at), de façon atomique.
+        Retourne False si la tâche est inconnue, terminée, ou tenue par un autre worker
+        dont le heartbeat date de moins de lease_seconds.
+        """
+
+    async def purge(self) -> None:
+        """Applique la politique de rétention (appelé périodiquement)"""
+
+    async def close(self) -> None:
+        """Libère les ressources du backend"""
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend_name,
+            "retention_seconds": self.policy.retention_seconds,
+            "max_records": self.policy.max_records,
+            "max_bytes": self.policy.max_bytes,
+            "evictions": dict(self.evictions)
+        }
+
+
+class MemoryTaskStore(TaskStore):
+    """Stockage en mémoire du processus (non partagé entre workers)"""
+
+    backend_name = "memory"
+
+    def __init__(self, policy: RetentionPolicy):
+        super().__init__(policy)
+        # Ordre d'insertion = ordre de création
+        self._records: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._sizes: Dict[Tuple[str, str], int] = {}
+        # Tâches terminées, dans l'ordre de fin (la plus ancienne en premier)
+        self._finished: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        # Tâches en cours, dans l'ordre de dernière mise à jour (active_ttl_seconds)
+        self._active: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._bytes = 0
+
+    def _store(self, key: Tuple[str, str], record: Dict[str, Any]) -> None:
+        size = _record_size(record)
+        self._bytes += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+        self._records[key] = record
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        self._records.pop(key, None)
+        self._finished.pop(key, None)
+        self._active.pop(key, None)
+        self._bytes -= self._sizes.pop(key, 0)
+
+    def _enforce(self) -> None:
+        now = time.time()
+        while self._finished:
+            key, finished_at = next(iter(self._finished.items()))
+            if finished_at + self.policy.retention_seconds > now:
+                break
+            self._remove(key)
+            self.evictions["expired"] += 1
+
+        while self._active:
+            key, updated_at = next(iter(self._active.items()))
+            if updated_at + self.policy.active_ttl_seconds > now:
+                break
+            self._remove(key)
+            self.evictions["expired"] += 1
+
+        while self._records and (
+            len(self._records) > self.policy.max_records or self._bytes > self.policy.max_bytes
+        ):
+            reason = "max_records" if len(self._records) > self.policy.max_records else "max_bytes"
+            if self._finished:
+                key = next(iter(self._finished))
+            else:
+                # Uniquement des tâches en cours : évincer la plus ancienne
+                key = next(iter(self._records))
+                self.evictions["active_evicted"] += 1
+            self._remove(key)
+            self.evictions[reason] += 1
+
+    async def create(self, namespace: str, task_id: str, record: Dict[str, Any]) -> None:
+        key = (namespace, task_id)
+        self._remove(key)
+        record = dict(record)
+        self._store(key, record)
+        if _finishing(record):
+            self._finished[key] = time.time()
+        else:
+            self._active[key] = time.time()
+        self._enforce()
+
+    async def get(self, namespace: str, task_id: str) -> Optional[Dict[str, Any]]:
+        key = (namespace, task_id)
+        finished_at = self._finished.get(key)
+        if finished_at is not None and finished_at + self.policy.retention_seconds <= time.time():
+            self._remove(key)
+            self.evictions["expired"] += 1
+            return None
+        record = self._records.get(key)
+        return dict(record) if record is not None else None
+
+    async def update(self, namespace: str, task_id: str, **fields: Any) -> None:
+        key = (namespace, task_id)
+        record = self._records.get(key)
+        if record is None:
+            return
+        record.update(fields)
+        self._store(key, record)
+        if _finishing(fields) and key not in self._finished:
+            self._active.pop(key, None)
+            self._finished[key] = time.time()
+        elif key in self._active:
+            self._active[key] = time.time()
+            self._active.move_to_end(key)
+        self._enforce()
+
+    async def delete(self, namespace: str, task_id: str) -> None:
+        self._remove((namespace, task_id))
+
+    async def list_active(self, namespace: str) -> List[Tuple[str, Dict[str, Any]]]:
+        return [
+            (task_id, dict(record)) for (record_namespace, task_id), record in self._records.items()
+            if record_namespace == namespace and (record_namespace, task_id) not in self._finished
+        ]
+
+    async def claim(self, namespace: str, task_id: str, owner: str, lease_seconds: float) -> bool:
+        # Aucun await entre la lecture et l'écriture : atomique dans la boucle d'événements
+        now = time.time()
+        if not _claimable(self._records.get((namespace, task_id)), owner, now, lease_seconds):
+            return False
+        await self.update(namespace, task_id, owner=owner, heartbeat_at=now)
+        return True
+
+    async def purge(self) -> None:
+        self._enforce()
+
+    def get_stats(self) -> Dict[str, Any]:
+        records: Dict[str, int] = {}
+        for namespace, _ in self._records:
+            records[namespace] = records.get(namespace, 0) + 1
+        stats = super().get_stats()
+        stats.update({
+            "records": records,
+            "finished": len(self._finished),
+            "bytes": self._bytes
+        })
+        return stats
+
+
+class SQLiteTaskStore(TaskStore):
+    """
+    Stockage SQLite en mode WAL : plusieurs processus peuvent lire pendant qu'un autre écrit.
+    Les requêtes sont exécutées dans un thread pour ne pas bloquer la boucle d'événements.
+    """
+
+    backend_name = "sqlite"
+    persistent = True
+
+    def __init__(self, path: str, policy: RetentionPolicy):
+        super().__init__(policy)
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                namespace TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                finished_at REAL,
+                size INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (namespace, task_id)
+            )
+            """
+        )
+        # Bases créées avant l'ajout de la rétention
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+        if "finished_at" not in columns:
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN finished_at REAL")
+        if "size" not in columns:
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_finished_at ON tasks (finished_at)")
+
+    def _execute(self, func, *args):
+        with self._lock:
+            return func(*args)
+
+    def _create(self, namespace: str, task_id: str, record: Dict[str, Any]) -> None:
+        now = time.time()
+        data = json.dumps(record)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO tasks (namespace, task_id, data, updated_at, finished_at, size) VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, task_id, data, now, now if _finishing(record) else None, len(data))
+        )
+        self._enforce()
+
+    def _get(self, namespace: str, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT data, finished_at FROM tasks WHERE namespace = ? AND task_id = ?",
+            (namespace, task_id)
+        ).fetchone()
+        if not row:
+            return None
+        data, finished_at = row
+        if finished_at is not None and finished_at + self.policy.retention_seconds <= time.time():
+            return None
+        return json.loads(data)
+
+    def _update(self, namespace: str, task_id: str, fields: Dict[str, Any]) -> None:
+        # BEGIN IMMEDIATE : verrou d'écriture pris avant la lecture (lecture-modification-écriture atomique entre processus)
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            record = self._get(namespace, task_id)
+            if record is not None:
+                record.update(fields)
+                now = time.time()
+                data = json.dumps(record)
+                self._conn.execute(
+                    "UPDATE tasks SET data = ?, updated_at = ?, size = ?, finished_at = COALESCE(finished_at, ?) "
+                    "WHERE namespace = ? AND task_id = ?",
+                    (data, now, len(data), now if _finishing(fields) else None, namespace, task_id)
+                )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        if _finishing(fields):
+            self._enforce()
+
+    def _claim(self, namespace: str, task_id: str, owner: str, lease_seconds: float) -> bool:
+        # Même verrou d'écriture que _update : un seul processus peut gagner le bail
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            record = self._get(namespace, task_id)
+            claimed = _claimable(record, owner, now, lease_seconds)
+            if claimed:
+                record.update(owner=owner, heartbeat_at=now)
+                data = json.dumps(record)
+                self._conn.execute(
+                    "UPDATE tasks SET data = ?, updated_at = ?, size = ? WHERE namespace = ? AND task_id = ?",
+                    (data, now, len(data), namespace, task_id)
+                )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return claimed
+
+    def _delete(self, namespace: str, task_id: str) -> None:
+        self._conn.execute("DELETE FROM tasks WHERE namespace = ? AND task_id = ?", (namespace, task_id))
+
+    def _list_active(self, namespace: str) -> List[Tuple[str, Dict[str, Any]]]:
+        rows = self._conn.execute(
+            "SELECT task_id, data FROM tasks WHERE namespace = ? AND finished_at IS NULL ORDER BY updated_at",
+            (namespace,)
+        ).fetchall()
+        return [(task_id, json.loads(data)) for task_id, data in rows]
+
+    def _enforce(self) -> None:
+        now = time.time()
+        cursor = self._conn.execute(
+            "DELETE FROM tasks WHERE finished_at IS NOT NULL AND finished_at <= ?",
+            (now - self.policy.retention_seconds,)
+        )
+        self.evictions["expired"] += cursor.rowcount
+        cursor = self._conn.execute(
+            "DELETE FROM tasks WHERE finished_at IS NULL AND updated_at <= ?",
+            (now - self.policy.active_ttl_seconds,)
+        )
+        self.evictions["expired"] += cursor.rowcount
+
+        count, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tasks").fetchone()
+        if count <= self.policy.max_records and total_bytes <= self.policy.max_bytes:
+            return
+
+        # Tâches terminées d'abord (les plus anciennes), puis tâches en cours les plus anciennes
+        victims = self._conn.execute(
+            "SELECT namespace, task_id, size, finished_at FROM tasks "
+            "ORDER BY finished_at IS NULL, COALESCE(finished_at, updated_at)"
+        )
+        to_delete = []
+        for namespace, task_id, size, finished_at in victims:
+            if count <= self.policy.max_records and total_bytes <= self.policy.max_bytes:
+                break
+            reason = "max_records" if count > self.policy.max_records else "max_bytes"
+            self.evictions[reason] += 1
+            if finished_at is None:
+                self.evictions["active_evicted"] += 1
+            to_delete.append((namespace, task_id))
+            count -= 1
+            total_bytes -= size
+        self._conn.executemany("DELETE FROM tasks WHERE namespace = ? AND task_id = ?", to_delete)
+
+    async def create(self, namespace: str, task_id: str, record: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._execute, self._create, namespace, task_id, record)
+
+    async def get(self, namespace: str, task_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._execute, self._get, namespace, task_id)
+
+    async def update(self, namespace: str, task_id: str, **fields: Any) -> None:
+        await asyncio.to_thread(self._execute, self._update, namespace, task_id, fields)
+
+    async def delete(self, namespace: str, task_id: str) -> None:
+        await asyncio.to_thread(self._execute, self._delete, namespace, task_id)
+
+    async def list_active(self, namespace: str) -> List[Tuple[str, Dict[str, Any]]]:
+        return await asyncio.to_thread(self._execute, self._list_active, namespace)
+
+    async def claim(self, namespace: str, task_id: str, owner: str, lease_seconds: float) -> bool:
+        return await asyncio.to_thread(self._execute, self._claim, namespace, task_id, owner, lease_seconds)
+
+    async def purge(self) -> None:
+        await asyncio.to_thread(self._execute, self._enforce)
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._execute, self._conn.close)
+
+    def _summary(self) -> Dict[str, Any]:
+        rows = self._conn.execute("SELECT namespace, COUNT(*) FROM tasks GROUP BY namespace").fetchall()
+        finished, total_bytes = self._conn.execute(
+            "SELECT COUNT(finished_at), COALESCE(SUM(size), 0) FROM tasks"
+        ).fetchone()
+        return {
+            "records": {namespace: count for namespace, count in rows},
+            "finished": finished,
+            "bytes": total_bytes
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats["path"] = self.path
+        stats.update(self._execute(self._summary))
+        return stats
+
+
+class RedisTaskStore(TaskStore):
+    """
+    Stockage Redis (ou compatible) : un hash par tâche, chaque champ encodé en JSON.
+    update() est un script Lua : test d'existence, HSET des seuls champs modifiés et EXPIRE
+    en une seule opération (une tâche supprimée ou expirée entre-temps n'est jamais recréée).
+
+    La rétention repose sur EXPIRE (TASK_ACTIVE_TTL_SECONDS à la création, TASK_RETENTION_SECONDS
+    une fois la tâche terminée). Le nombre d'enregistrements est plafonné via un index trié
+    par date de création ; la taille totale relève de la politique maxmemory du serveur.
+    """
+
+    backend_name = "redis"
+    persistent = True
+
+    # KEYS[1] = tâche ; ARGV = TTL actif, TTL de rétention, statuts terminaux (JSON), puis champ, valeur...
+    UPDATE_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+    redis.call('HSET', KEYS[1], unpack(ARGV, 4))
+    local ttl = ARGV[1]
+    local status = redis.call('HGET', KEYS[1], 'status')
+    if status then
+        status = cjson.decode(status)
+        for _, terminal in ipairs(cjson.decode(ARGV[3])) do
+            if status == terminal then ttl = ARGV[2] end
+        end
+    end
+    redis.call('EXPIRE', KEYS[1], ttl)
+    return 1
+    """
+
+    # KEYS[1] = tâche ; ARGV = owner (JSON), maintenant, durée du bail, TTL actif, statuts terminaux...
+    CLAIM_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+    local status = redis.call('HGET', KEYS[1], 'status')
+    if status then
+        status = cjson.decode(status)
+        for i = 5, #ARGV do
+            if status == ARGV[i] then return 0 end
+        end
+    end
+    local owner = redis.call('HGET', KEYS[1], 'owner')
+    if owner and owner ~= 'null' and owner ~= ARGV[1] then
+        local heartbeat = tonumber(redis.call('HGET', KEYS[1], 'heartbeat_at') or '0') or 0
+        if heartbeat + tonumber(ARGV[3]) > tonumber(ARGV[2]) then return 0 end
+    end
+    redis.call('HSET', KEYS[1], 'owner', ARGV[1], 'heartbeat_at', ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+    return 1
+    """
+
+    def __init__(self, url: str, policy: RetentionPolicy, key_prefix: str = "tasks"):
+        super().__init__(policy)
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError:
+            raise RuntimeError("Le paquet 'redis' est requis pour TASK_STORE_BACKEND=redis")
+
+        self.url = url
+        self.key_prefix = key_prefix
+        self._index_key = f"{key_prefix}:index"
+        # from_url ne se connecte pas : vérifier le serveur maintenant pour que create_task_store
+        # puisse se replier sur la mémoire (le task store global est importé tel quel par les modules)
+        self._ping(url)
+        self._redis = redis_asyncio.from_url(url, decode_responses=True)
+        self._update_script = self._redis.register_script(self.UPDATE_SCRIPT)
+        self._claim_script = self._redis.register_script(self.CLAIM_SCRIPT)
+
+    @staticmethod
+    def _ping(url: str) -> None:
+        import redis
+        client = redis.Redis.from_url(url, socket_connect_timeout=5, socket_timeout=5)
+        try:
+            client.ping()
+        finally:
+            client.close()
+
+    def _key(self, namespace: str, task_id: str) -> str:
+        return f"{self.key_prefix}:{namespace}:{task_id}"
+
+    @staticmethod
+    def _encode(fields: Dict[str, Any]) -> Dict[str, str]:
+        return {name: json.dumps(value) for name, value in fields.items()}
+
+    async def create(self, namespace: str, task_id: str, record: Dict[str, Any]) -> None:
+        key = self._key(namespace, task_id)
+        ttl = self.policy.retention_seconds if _finishing(record) else self.policy.active_ttl_seconds
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            if record:
+                pipe.hset(key, mapping=self._encode(record))
+                pipe.expire(key, int(ttl))
+                pipe.zadd(self._index_key, {key: time.time()})
+            await pipe.execute()
+        await self._enforce()
+
+    async def get(self, namespace: str, task_id: str) -> Optional[Dict[str, Any]]:
+        data = await self._redis.hgetall(self._key(namespace, task_id))
+        if not data:
+            return None
+        return {name: json.loads(value) for name, value in data.items()}
+
+    async def update(self, namespace: str, task_id: str, **fields: Any) -> None:
+        if not fields:
+            return
+        # Ne pas recréer une tâche supprimée ou expirée entre-temps ; le TTL suit le statut de la tâche
+        args = [
+            int(self.policy.active_ttl_seconds), int(self.policy.retention_seconds), json.dumps(TERMINAL_STATUSES)
+        ]
+        for name, value in self._encode(fields).items():
+            args.extend((name, value))
+        await self._update_script(keys=[self._key(namespace, task_id)], args=args)
+
+    async def delete(self, namespace: str, task_id: str) -> None:
+        key = self._key(namespace, task_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.zrem(self._index_key, key)
+            await pipe.execute()
+
+    async def list_active(self, namespace: str) -> List[Tuple[str, Dict[str, Any]]]:
+        prefix = self._key(namespace, "")
+        active = []
+        for key in await self._redis.zrange(self._index_key, 0, -1):
+            if not key.startswith(prefix):
+                continue
+            data = await self._redis.hgetall(key)
+            if not data:
+                continue
+            record = {name: json.loads(value) for name, value in data.items()}
+            if record.get("status") not in TERMINAL_STATUSES:
+                active.append((key[len(prefix):], record))
+        return active
+
+    async def claim(self, namespace: str, task_id: str, owner: str, lease_seconds: float) -> bool:
+        # Script Lua : lecture du bail et écriture en une seule opération côté serveur
+        claimed = await self._claim_script(
+            keys=[self._key(namespace, task_id)],
+            args=[json.dumps(owner), json.dumps(time.time()), lease_seconds,
+                  int(self.policy.active_ttl_seconds), *TERMINAL_STATUSES]
+        )
+        return bool(claimed)
+
+    async def _enforce(self) -> None:
+        # Entrées de l'index dont la clé a forcément expiré
+        await self._redis.zremrangebyscore(
+            self._index_key, 0, time.time() - max(self.policy.active_ttl_seconds, self.policy.retention_seconds)
+        )
+        excess = await self._redis.zcard(self._index_key) - self.policy.max_records
+        if excess <= 0:
+            return
+        oldest = await self._redis.zpopmin(self._index_key, excess)
+        keys = [key for key, _ in oldest]
+        if keys:
+            deleted = await self._redis.delete(*keys)
+            self.evictions["max_records"] += deleted
+
+    async def purge(self) -> None:
+        await self._enforce()
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats["key_prefix"] = self.key_prefix
+        return stats
+
+
+def create_task_store(backend: str = TASK_STORE_BACKEND) -> TaskStore:
+    """
+    Crée le backend configuré. En cas d'échec (paquet manquant, fichier ou serveur Redis
+    injoignable), repli sur le stockage en mémoire pour ne pas empêcher le démarrage.
+    """
+    policy = RetentionPolicy(
+        retention_seconds=TASK_RETENTION_SECONDS,
+        active_ttl_seconds=TASK_ACTIVE_TTL_SECONDS,
+        max_records=TASK_STORE_MAX_RECORDS,
+        max_bytes=TASK_STORE_MAX_BYTES
+    )
+    backend = (backend or "memory").lower()
+    try:
+        if backend == "sqlite":
+            store = SQLiteTaskStore(TASK_STORE_SQLITE_PATH, policy)
+        elif backend == "redis":
+            if not TASK_STORE_REDIS_URL:
+                raise RuntimeError("TASK_STORE_REDIS_URL (ou REDIS_URL) non configurée")
+            store = RedisTaskStore(TASK_STORE_REDIS_URL, policy)
+        else:
+            store = MemoryTaskStore(policy)
+    except Exception as exc:
+        print(f"⚠️ Task store '{backend}' indisponible ({exc}) - repli sur le stockage en mémoire (un seul worker)")
+        store = MemoryTaskStore(policy)
+
+    print(f"✅ Task store: {store.backend_name}")
+    return store
+
+
+# Instance globale
+task_store = create_task_store()
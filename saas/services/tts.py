@@ -1,8 +1,8 @@
 import os
 from datetime import datetime
 from unidecode import unidecode
-import openai
 from services.supabase_storage import get_storage_service
+from services.ai_clients import get_openai
 
 # Mapping des voix OpenAI TTS-1 pour différenciation homme/femme
 # Versions premium : alloy (féminin claire/professionnelle) + onyx (masculin profonde)
@@ -16,10 +16,10 @@ VOICE_MAP = {
 def generate_speech(text, voice=None, filename=None, user_id=None):
     """Génération audio avec OpenAI TTS-1 et upload vers Supabase Storage"""
     try:
-        # Configuration OpenAI
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        if not openai.api_key:
+        # Client OpenAI partagé (ne modifie plus la configuration globale du module openai)
+        if not os.getenv("OPENAI_API_KEY"):
             raise ValueError("OPENAI_API_KEY not configured")
+        client = get_openai()
 
         # Utilisation du mapping des voix
         voice_id = VOICE_MAP.get(voice, "alloy")
@@ -43,7 +43,7 @@ def generate_speech(text, voice=None, filename=None, user_id=None):
 
         try:
             # Génération audio avec OpenAI TTS-1 (modèle standard, voix plus douces)
-            response = openai.audio.speech.create(
+            response = client.audio.speech.create(
                 model="tts-1",  # Modèle standard (plus rapide et moins cher que HD)
                 voice=voice_id,
                 input=input_text,
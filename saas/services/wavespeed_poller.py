@@ -0,0 +1,432 @@
+"""
+Suivi partagé des prédictions WaveSpeed (clips Wan 2.5).
+
+Au lieu d'une boucle de polling par scène à intervalle fixe, un seul poller suit
+toutes les prédictions en cours, tous pipelines confondus :
+
+- une seule boucle se réveille à la prochaine échéance et interroge ensemble
+  (concurrence bornée, client HTTP partagé) toutes les prédictions arrivées à
+  échéance ;
+- l'intervalle de chaque prédiction s'adapte au temps de génération attendu :
+  peu de requêtes au début, des requêtes rapprochées autour de la fin estimée
+  (moyenne glissante des durées observées, ou progression renvoyée par
+  WaveSpeed), puis un recul progressif si la génération prend du retard ;
+- un jitter évite que les scènes soumises ensemble soient interrogées en rafale.
+
+Mode webhook (WAVESPEED_WEBHOOK_URL + WAVESPEED_WEBHOOK_SECRET, l'un ne va pas
+sans l'autre) : l'URL de /webhooks/wavespeed, avec son jeton, est transmise à
+chaque soumission et le callback de WaveSpeed résout directement le futur de la
+prédiction (resolve), si son URL vidéo pointe vers un hôte WaveSpeed
+(WAVESPEED_OUTPUT_HOSTS). Le polling ne sert plus que de filet de sécurité, à
+intervalle lent (WAN25_WEBHOOK_SAFETY_POLL_SECONDS), pour les callbacks perdus ou
+reçus par un autre worker.
+
+Chaque scène attend simplement le futur de sa prédiction (wait).
+"""
+
+import asyncio
+import logging
+import random
+import secrets
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlparse
+
+import httpx
+
+from config import (
+    WAN25_EXPECTED_CLIP_SECONDS, WAN25_POLL_MIN_INTERVAL_SECONDS,
+    WAN25_POLL_MAX_INTERVAL_SECONDS, WAN25_POLL_CONCURRENCY,
+    WAVESPEED_WEBHOOK_URL, WAVESPEED_WEBHOOK_SECRET, WAVESPEED_OUTPUT_HOSTS, WAN25_WEBHOOK_SAFETY_POLL_SECONDS
+)
+from services.clip_retry import ClipGenerationError
+from services.http_clients import get_http_client
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+COMPLETED_STATUSES = ("completed", "COMPLETED", "succeeded", "SUCCEEDED")
+FAILED_STATUSES = ("failed", "FAILED", "error", "ERROR")
+
+
+def parse_wavespeed_result(result: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], Optional[str], float]:
+    """
+    Extrait (statut, URL vidéo, erreur, progression) d'une réponse /predictions/{id}/result
+    ou d'un callback webhook (mêmes champs, sans l'enveloppe "data")
+    """
+    data = result.get("data") or {}
+    status = result.get("status") or data.get("status")
+    video_url = None
+    error = None
+    if status in COMPLETED_STATUSES:
+        video_url = (
+            (data.get("outputs") or [None])[0] or
+            (result.get("outputs") or [None])[0] or
+            (result.get("output") or {}).get("video_url") or
+            result.get("video_url") or
+            data.get("video_url")
+        )
+    elif status in FAILED_STATUSES:
+        error = result.get("error") or data.get("error", "Unknown error")
+    progress = result.get("progress") or data.get("progress") or 0
+    try:
+        progress = float(progress)
+    except (TypeError, ValueError):
+        progress = 0.0
+    return status, video_url, error, progress
+
+
+@dataclass
+class _Prediction:
+    """Prédiction suivie (partagée par toutes les scènes qui l'attendent)"""
+    prediction_id: str
+    result_url: str
+    headers: Dict[str, str]
+    registered_at: float
+    deadline: float
+    future: asyncio.Future
+    next_poll_at: float = 0.0
+    attempts: int = 0
+    overdue_polls: int = 0
+    progress: float = 0.0
+    waiters: int = field(default=0)
+
+
+class WaveSpeedPoller:
+    """Poller unique des prédictions WaveSpeed, intervalle adaptatif par prédiction"""
+
+    def __init__(
+        self,
+        expected_duration: float = 120,
+        min_interval: float = 2,
+        max_interval: float = 20,
+        max_concurrency: int = 10,
+        jitter: float = 0.2,
+        webhook_url: Optional[str] = None,
+        webhook_secret: Optional[str] = None,
+        safety_poll_interval: float = 60,
+        output_hosts: Optional[List[str]] = None
+    ):
+        """
+        Args:
+            expected_duration: Durée de génération attendue d'un clip avant toute mesure (secondes)
+            min_interval: Intervalle minimal entre deux requêtes pour une même prédiction
+            max_interval: Intervalle maximal (début de génération, génération en retard)
+            max_concurrency: Requêtes de suivi simultanées
+            jitter: Variation aléatoire relative appliquée à chaque intervalle
+            webhook_url: URL publique de /webhooks/wavespeed (None = polling seul)
+            webhook_secret: Jeton ajouté à l'URL du webhook et vérifié à la réception (obligatoire en mode webhook)
+            safety_poll_interval: Intervalle du polling de secours en mode webhook
+            output_hosts: Hôtes acceptés pour l'URL vidéo d'un callback
+        """
+        self.expected_duration = expected_duration
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.jitter = jitter
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.safety_poll_interval = safety_poll_interval
+        self.output_hosts = [host.lower() for host in (output_hosts or [])]
+        if webhook_url and not webhook_secret:
+            logger.warning("⚠️ WAVESPEED_WEBHOOK_URL without WAVESPEED_WEBHOOK_SECRET: webhook disabled, polling only")
+        # Callbacks reçus avant l'enregistrement de la prédiction (soumission très rapide)
+        self._early_results = TTLCache(maxsize=1000, ttl=600)
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._tracked: Dict[str, _Prediction] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.polls = 0
+        self.batches = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.http_errors = 0
+        self.callbacks = 0
+        self.callbacks_unmatched = 0
+        self.callbacks_rejected = 0
+
+    @property
+    def webhook_enabled(self) -> bool:
+        # Un webhook sans secret accepterait n'importe quel résultat : polling seul
+        return bool(self.webhook_url and self.webhook_secret)
+
+    # --- Planification ---
+
+    def _clamp(self, interval: float) -> float:
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def _next_interval(self, prediction: _Prediction, now: float) -> float:
+        """Moitié du temps restant estimé, puis recul exponentiel une fois l'estimation dépassée"""
+        if self.webhook_enabled:
+            # Le callback résout la prédiction : polling de secours uniquement
+            return self.safety_poll_interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        elapsed = now - prediction.registered_at
+        if 0 < prediction.progress < 100:
+            remaining = elapsed * (100 - prediction.progress) / prediction.progress
+        else:
+            remaining = self.expected_duration - elapsed
+
+        if remaining > 0:
+            prediction.overdue_polls = 0
+            interval = self._clamp(remaining / 2)
+        else:
+            prediction.overdue_polls += 1
+            interval = self._clamp(self.min_interval * 2 ** prediction.overdue_polls)
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _record_duration(self, prediction: _Prediction, now: float) -> None:
+        """Moyenne glissante des durées de génération observées"""
+        observed = now - prediction.registered_at
+        self.expected_duration = 0.8 * self.expected_duration + 0.2 * observed
+
+    def _untrack(self, prediction: _Prediction) -> None:
+        if self._tracked.get(prediction.prediction_id) is prediction:
+            del self._tracked[prediction.prediction_id]
+
+    def _settle(self, prediction: _Prediction, status: Optional[str], video_url: Optional[str], error: Optional[str]) -> bool:
+        """Résout le futur si le résultat est définitif ; retourne True dans ce cas"""
+        if prediction.future.done():
+            return True
+        if status in COMPLETED_STATUSES and video_url:
+            self.completed += 1
+            self._record_duration(prediction, asyncio.get_running_loop().time())
+            self._untrack(prediction)
+            prediction.future.set_result(video_url)
+            return True
+        if status in FAILED_STATUSES:
+            self.failed += 1
+            self._untrack(prediction)
+            prediction.future.set_exception(ClipGenerationError(f"WaveSpeed generation failed: {error}"))
+            return True
+        if status in COMPLETED_STATUSES:
+            logger.warning(f"⚠️ No video URL in completed result for {prediction.prediction_id}")
+        return False
+
+    # --- API ---
+
+    def callback_url(self) -> Optional[str]:
+        """URL de webhook à transmettre à WaveSpeed lors de la soumission (None = mode polling)"""
+        if not self.webhook_enabled:
+            return None
+        separator = "&" if "?" in self.webhook_url else "?"
+        return f"{self.webhook_url}{separator}{urlencode({'token': self.webhook_secret})}"
+
+    def verify_token(self, token: Optional[str]) -> bool:
+        """Vérifie le jeton d'un callback (toujours refusé si aucun secret n'est configuré)"""
+        if not self.webhook_secret:
+            return False
+        return bool(token) and secrets.compare_digest(token, self.webhook_secret)
+
+    def is_trusted_output(self, video_url: Optional[str]) -> bool:
+        """L'URL vidéo d'un callback est-elle servie en HTTPS par un hôte WaveSpeed ?"""
+        if not video_url:
+            return False
+        parsed = urlparse(video_url)
+        host = (parsed.hostname or "").lower()
+        return parsed.scheme == "https" and any(
+            host == allowed or host.endswith(f".{allowed}") for allowed in self.output_hosts
+        )
+
+    def resolve(self, payload: Dict[str, Any]) -> str:
+        """
+        Traite un callback WaveSpeed.
+
+        Returns:
+            "resolved" (futur résolu), "pending" (statut intermédiaire),
+            "early" (prédiction pas encore suivie, résultat gardé) ou "ignored"
+        """
+        self.callbacks += 1
+        data = payload.get("data") or {}
+        prediction_id = payload.get("id") or data.get("id")
+        if not prediction_id:
+            return "ignored"
+
+        status, video_url, error, progress = parse_wavespeed_result(payload)
+        if status in COMPLETED_STATUSES and not self.is_trusted_output(video_url):
+            # Résultat non vérifiable : le polling de secours interrogera l'API WaveSpeed
+            self.callbacks_rejected += 1
+            logger.warning(f"⚠️ WaveSpeed callback for {prediction_id} rejected: untrusted video URL {video_url!r}")
+            return "ignored"
+        prediction = self._tracked.get(prediction_id)
+        if prediction is None:
+            if status in COMPLETED_STATUSES + FAILED_STATUSES:
+                # Soumission pas encore enregistrée ici, ou prédiction suivie par un autre worker
+                self.callbacks_unmatched += 1
+                self._early_results.set(prediction_id, (status, video_url, error))
+                return "early"
+            return "ignored"
+
+        if self._settle(prediction, status, video_url, error):
+            self._wakeup.set()
+            return "resolved"
+        prediction.progress = progress
+        return "pending"
+
+    async def wait(
+        self,
+        prediction_id: str,
+        result_url: str,
+        headers: Dict[str, str],
+        max_wait: float = 600
+    ) -> str:
+        """
+        Attend la fin d'une prédiction et retourne l'URL de la vidéo.
+
+        Raises:
+            ClipGenerationError: La génération a échoué côté WaveSpeed
+            TimeoutError: Pas de résultat après max_wait secondes
+        """
+        loop = asyncio.get_running_loop()
+        prediction = self._tracked.get(prediction_id)
+        if prediction is None:
+            early = self._early_results.pop(prediction_id)
+            if early is not None:
+                status, video_url, error = early
+                if status in COMPLETED_STATUSES and video_url:
+                    self.completed += 1
+                    return video_url
+                if status in FAILED_STATUSES:
+                    self.failed += 1
+                    raise ClipGenerationError(f"WaveSpeed generation failed: {error}")
+
+            now = loop.time()
+            prediction = _Prediction(
+                prediction_id=prediction_id,
+                result_url=result_url,
+                headers=headers,
+                registered_at=now,
+                deadline=now + max_wait,
+                future=loop.create_future()
+            )
+            prediction.next_poll_at = now + self._next_interval(prediction, now)
+            self._tracked[prediction_id] = prediction
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._run())
+            self._wakeup.set()
+
+        prediction.waiters += 1
+        try:
+            # shield : l'annulation d'une scène ne doit pas annuler le futur partagé
+            return await asyncio.shield(prediction.future)
+        finally:
+            prediction.waiters -= 1
+            if prediction.waiters == 0 and not prediction.future.done():
+                # Plus personne n'attend (pipeline annulé) : arrêter le suivi
+                self._untrack(prediction)
+                prediction.future.cancel()
+
+    async def _run(self) -> None:
+        """Boucle unique : interroge les prédictions arrivées à échéance, puis dort jusqu'à la suivante"""
+        loop = asyncio.get_running_loop()
+        while self._tracked:
+            self._wakeup.clear()
+            now = loop.time()
+
+            for prediction in list(self._tracked.values()):
+                if now >= prediction.deadline:
+                    self.timeouts += 1
+                    self._untrack(prediction)
+                    if not prediction.future.done():
+                        prediction.future.set_exception(TimeoutError(
+                            f"WaveSpeed generation timed out after {int(prediction.deadline - prediction.registered_at)}s"
+                        ))
+
+            # Regrouper les échéances proches : un réveil pour plusieurs prédictions
+            horizon = now + self.min_interval / 2
+            due = [p for p in self._tracked.values() if p.next_poll_at <= horizon]
+            if due:
+                self.batches += 1
+                await asyncio.gather(*(self._poll(p) for p in due))
+                continue
+
+            if not self._tracked:
+                break
+            delay = min(
+                min(p.next_poll_at for p in self._tracked.values()),
+                min(p.deadline for p in self._tracked.values())
+            ) - now
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(delay, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, prediction: _Prediction) -> None:
+        """Une requête de suivi ; ne lève jamais (la boucle partagée doit continuer)"""
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            if prediction.future.done():
+                return
+            prediction.attempts += 1
+            self.polls += 1
+            rate_limited = False
+            try:
+                response = await get_http_client("wavespeed").get(prediction.result_url, headers=prediction.headers)
+                if response.status_code == 200:
+                    status, video_url, error, progress = parse_wavespeed_result(response.json())
+                    if self._settle(prediction, status, video_url, error):
+                        return
+                    prediction.progress = progress
+                    logger.info(
+                        f"⏳ Waiting for WaveSpeed {prediction.prediction_id} "
+                        f"(attempt {prediction.attempts}): status={status}, progress={progress}%"
+                    )
+                elif response.status_code == 202:
+                    logger.info(f"⏳ WaveSpeed {prediction.prediction_id} still processing (attempt {prediction.attempts})...")
+                elif response.status_code == 429:
+                    rate_limited = True
+                    logger.warning("⚠️ WaveSpeed polling rate limited, backing off")
+                else:
+                    logger.warning(f"⚠️ Unexpected status code while polling {prediction.prediction_id}: {response.status_code}")
+            except httpx.HTTPError as e:
+                self.http_errors += 1
+                logger.warning(f"⚠️ HTTP error during polling: {e}")
+            except Exception as e:
+                self.http_errors += 1
+                logger.warning(f"⚠️ Invalid WaveSpeed polling response for {prediction.prediction_id}: {e}")
+
+            now = loop.time()
+            interval = self.max_interval if rate_limited else self._next_interval(prediction, now)
+            prediction.next_poll_at = now + interval
+
+    async def aclose(self) -> None:
+        """Arrête la boucle et annule les attentes en cours (arrêt de l'application)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for prediction in list(self._tracked.values()):
+            if not prediction.future.done():
+                prediction.future.cancel()
+        self._tracked.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "tracked": len(self._tracked),
+            "expected_duration": round(self.expected_duration, 1),
+            "polls": self.polls,
+            "batches": self.batches,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "http_errors": self.http_errors,
+            "webhook_enabled": self.webhook_enabled,
+            "callbacks": self.callbacks,
+            "callbacks_unmatched": self.callbacks_unmatched,
+            "callbacks_rejected": self.callbacks_rejected
+        }
+
+
+# Instance globale
+wavespeed_poller = WaveSpeedPoller(
+    expected_duration=WAN25_EXPECTED_CLIP_SECONDS,
+    min_interval=WAN25_POLL_MIN_INTERVAL_SECONDS,
+    max_interval=WAN25_POLL_MAX_INTERVAL_SECONDS,
+    max_concurrency=WAN25_POLL_CONCURRENCY,
+    webhook_url=WAVESPEED_WEBHOOK_URL,
+    webhook_secret=WAVESPEED_WEBHOOK_SECRET,
+    safety_poll_interval=WAN25_WEBHOOK_SAFETY_POLL_SECONDS,
+    output_hosts=WAVESPEED_OUTPUT_HOSTS
+)
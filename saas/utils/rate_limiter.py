@@ -0,0 +1,65 @@
+"""
+Limiteur de débit asynchrone (seau à jetons).
+Utilisé pour respecter le quota de soumission des fournisseurs (WaveSpeed...).
+"""
+
+import asyncio
+import time
+from typing import Any, Dict
+
+
+class AsyncTokenBucket:
+    """
+    Seau à jetons pour asyncio.
+
+    - rate jetons sont ajoutés par seconde, jusqu'à burst jetons
+    - acquire() attend qu'un jeton soit disponible ; les appelants sont servis dans l'ordre
+
+    Non thread-safe : prévu pour être utilisé depuis la boucle d'événements asyncio.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: Jetons ajoutés par seconde (<= 0 : pas de limite)
+            burst: Nombre maximum de jetons accumulés (rafale autorisée)
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+        self.acquired = 0
+        self.waited = 0
+        self.total_wait_seconds = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """Attend et consomme un jeton"""
+        self.acquired += 1
+        if self.rate <= 0:
+            return
+        # Le verrou garantit l'ordre d'arrivée : un seul appelant attend le prochain jeton
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                self.waited += 1
+                self.total_wait_seconds += delay
+                await asyncio.sleep(delay)
+                self._refill()
+            self._tokens -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "total_wait_seconds": round(self.total_wait_seconds, 2)
+        }
@@ -0,0 +1,38 @@
+"""
+Stub local des callbacks WaveSpeed : envoie à l'API un callback de fin de génération,
+comme le ferait WaveSpeed, pour tester le mode webhook sans générer de vidéo.
+
+Usage :
+    python scripts/wavespeed_webhook_stub.py <prediction_id> [video_url]
+        [--url http://localhost:8000/webhooks/wavespeed] [--token SECRET] [--failed]
+
+Le prediction_id est visible dans les logs ("Prediction created: ...") ou dans le
+point de reprise du pipeline.
+"""
+import argparse
+import os
+
+import httpx
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Envoie un callback WaveSpeed simulé")
+    parser.add_argument("prediction_id")
+    parser.add_argument("video_url", nargs="?", default="https://example.com/stub-clip.mp4")
+    parser.add_argument("--url", default="http://localhost:8000/webhooks/wavespeed")
+    parser.add_argument("--token", default=os.getenv("WAVESPEED_WEBHOOK_SECRET"))
+    parser.add_argument("--failed", action="store_true", help="Simule un échec de génération")
+    args = parser.parse_args()
+
+    if args.failed:
+        payload = {"id": args.prediction_id, "status": "failed", "error": "stub failure"}
+    else:
+        payload = {"id": args.prediction_id, "status": "completed", "outputs": [args.video_url]}
+
+    params = {"token": args.token} if args.token else None
+    response = httpx.post(args.url, json=payload, params=params, timeout=10.0)
+    print(f"{'✅' if response.is_success else '❌'} {response.status_code} {response.text}")
+
+
+if __name__ == "__main__":
+    main()